@@ -11,6 +11,7 @@ Compatible with Python 2.7, 3.2, and 3.3.
 
 from __future__ import print_function, unicode_literals, division, absolute_import
 
+import itertools
 import argparse
 import logging
 import sys
@@ -30,7 +31,7 @@ parser.add_argument(
     'file_list',
     type=str,
     metavar='release-path',
-    nargs='+',
+    nargs='*',
     help='file or directory containing the release',
 )
 parser.add_argument(
@@ -68,18 +69,65 @@ parser.add_argument(
     default=config.DELETE_UNWANTED_FILES,
     help='delete files that are not whitelisted by the tracker (such as .rar files)',
 )
+parser.add_argument(
+    '-s',
+    '--staging-dir',
+    metavar='<path>',
+    dest='staging_dir',
+    default=config.STAGING_DIR,
+    help='make the torrent from a hardlinked copy of the release in this directory, leaving the original untouched',
+)
+parser.add_argument(
+    '--catalog',
+    metavar='<path>',
+    default=config.CATALOG_PATH,
+    help='record upload status and info hashes in this catalog (see catalog.py)',
+)
+parser.add_argument(
+    '--from-catalog',
+    dest='catalog_query',
+    choices=('not-uploaded', 'largest-unseeded'),
+    default=None,
+    help='upload the releases returned by this catalog query',
+)
+parser.add_argument(
+    '-l',
+    '--limit',
+    type=int,
+    metavar='<number>',
+    default=None,
+    help='maximum number of releases to take from the catalog query',
+)
 args = parser.parse_args()
 
-
-# Every argument to this script is treated as a path to a release to be uploaded
-release_list = files.get_paths(args.file_list)
-
-if len(release_list) == 0:
-    logging.critical('You must give this script at least one file or directory to process!')
-    sys.exit(1)
+catalog = None
+if args.catalog is not None:
+    try:
+        catalog = files.Catalog(args.catalog)
+    except files.CatalogError as e:
+        logging.warning(e)
+
+# Releases can also come from the catalog
+catalog_paths = []
+if args.catalog_query is not None:
+    if catalog is None:
+        logging.critical('A catalog is required for --from-catalog')
+        sys.exit(1)
+    if args.catalog_query == 'not-uploaded':
+        rows = catalog.not_uploaded(limit=args.limit)
+    else:
+        rows = catalog.largest_unseeded(limit=args.limit)
+    catalog_paths = [row['path'] for row in rows]
+
+# Every argument to this script is treated as a path to a release to be uploaded.  The paths are
+# checked in the background, so the first upload can start before all of them have been looked at.
+release_list = itertools.chain(files.iter_paths(args.file_list), files.iter_paths(catalog_paths))
+release_count = 0
 
 for path in release_list:
 
+    release_count += 1
+
     # Log exceptions but don't raise them; just continue
 
     try:
@@ -94,6 +142,7 @@ for path in release_list:
             take_screenshots=args.take_screens,
             num_screenshots=args.num_screenshots,
             delete_unwanted_files=args.delete_unwanted_files,
+            staging_dir=args.staging_dir,
         )
 
         logging.info('------------------------------------------------------------')
@@ -107,9 +156,21 @@ for path in release_list:
     except uploads.UploadInterruptedError as e:
 
         logging.error(e)
+        if catalog is not None and not args.dry_run:
+            catalog.set_upload_status(path, 'failed')
         continue
 
     except Exception:
 
         logging.exception('An unexpected error occurred. Please report the following information to the developers:')
+        if catalog is not None and not args.dry_run:
+            catalog.set_upload_status(path, 'failed')
         continue
+
+    if catalog is not None and not args.dry_run:
+        catalog.set_upload_status(path, 'uploaded')
+        catalog.add_torrent(path, upload.tracker, upload.torrent.info_hash)
+
+if release_count == 0:
+    logging.critical('You must give this script at least one file or directory to process!')
+    sys.exit(1)
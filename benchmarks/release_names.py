@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures release name parsing throughput: the per-field regexes in files.release
+against the single-pass tokenizer in files.release_names.
+"""
+
+from __future__ import print_function, unicode_literals, division, absolute_import
+
+import multiprocessing
+import argparse
+import random
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import files
+
+
+TITLE_WORDS = ('The', 'Last', 'Night', 'of', 'Red', 'City', 'Man', 'Blue', 'Return', 'House', 'Dark', 'Star')
+TAGS = ('', 'LIMITED.', 'PROPER.', 'REPACK.', 'FESTIVAL.', 'SUBBED.')
+RESOLUTIONS = ('720p.', '1080p.', '')
+SOURCES = ('BluRay', 'Blu-Ray', 'BDRip', 'DVDRip', 'HDTV', 'WEB-DL', 'DVDSCR', 'R5')
+CODECS = ('x264', 'XviD', 'H.264', 'AVC')
+GROUPS = ('CtrlHD', 'DON', 'AMIABLE', 'SPARKS', 'ALLiANCE', 'ViSiON', 'WiKi', 'iNFAMOUS')
+
+
+def generate_names(count, unique_ratio):
+    """
+    Generate plausible release names, with roughly unique_ratio of them distinct.
+    """
+    random.seed(0)
+    unique_count = max(1, int(count * unique_ratio))
+    unique_names = []
+    for __ in range(unique_count):
+        title = '.'.join(random.choice(TITLE_WORDS) for __ in range(random.randint(1, 5)))
+        unique_names.append('{title}.{year}.{tag}{resolution}{source}.{codec}-{group}'.format(
+            title=title,
+            year=random.randint(1950, 2016),
+            tag=random.choice(TAGS),
+            resolution=random.choice(RESOLUTIONS),
+            source=random.choice(SOURCES),
+            codec=random.choice(CODECS),
+            group=random.choice(GROUPS),
+        ))
+    return [random.choice(unique_names) for __ in range(count)]
+
+
+def parse_with_regexes(release_names):
+    release = files.release
+    return [
+        (
+            release.get_title(name),
+            release.get_year(name),
+            release.get_codec(name),
+            release.get_source(name),
+            release.get_resolution(name),
+            release.get_group(name),
+        )
+        for name in release_names
+    ]
+
+
+def measure(label, function, release_names):
+    start = time.time()
+    function(release_names)
+    elapsed = time.time() - start
+    print('{label:<40} {seconds:8.3f} s {rate:12,.0f} names/s'.format(
+        label=label,
+        seconds=elapsed,
+        rate=len(release_names) / elapsed if elapsed else float('inf'),
+    ))
+
+
+def clear_caches():
+    files.release_names._cache.clear()
+    files.release_names._segment_tokens.clear()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Benchmark release name parsing.')
+    parser.add_argument('-n', '--names', type=int, default=200000, help='number of release names to parse')
+    parser.add_argument('-u', '--unique', type=float, default=0.5, help='fraction of distinct names')
+    parser.add_argument('-p', '--processes', type=int, default=multiprocessing.cpu_count(), help='pool size')
+    args = parser.parse_args()
+
+    release_names = generate_names(args.names, args.unique)
+    print('{n:,} names, {u:,} distinct'.format(n=len(release_names), u=len(set(release_names))))
+
+    measure('per-field regexes', parse_with_regexes, release_names)
+
+    clear_caches()
+    measure('tokenizer, 1 process (cold)', files.parse_release_names, release_names)
+    measure('tokenizer, 1 process (memoized)', files.parse_release_names, release_names)
+
+    clear_caches()
+    measure(
+        'tokenizer, {p} processes (cold)'.format(p=args.processes),
+        lambda names: files.parse_release_names(names, processes=args.processes),
+        release_names,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Keeps a catalog of the film releases in a library, and queries it.
+"""
+
+from __future__ import print_function, unicode_literals, division, absolute_import
+
+import argparse
+import logging
+import sys
+
+import files
+import config
+
+files.set_log_file_name('catalog.log')
+
+# Set up the argument parser
+parser = argparse.ArgumentParser(description='Keeps a catalog of the film releases in a library, and queries it.')
+parser.add_argument(
+    '--catalog',
+    metavar='<path>',
+    default=config.CATALOG_PATH,
+    help='path to the catalog database',
+)
+subparsers = parser.add_subparsers(dest='command')
+
+update_parser = subparsers.add_parser('update', help='scan libraries for new or modified releases')
+update_parser.add_argument(
+    'library_list',
+    type=str,
+    metavar='library-path',
+    nargs='+',
+    help='directory containing releases',
+)
+update_parser.add_argument(
+    '-m',
+    '--mediainfo',
+    dest='mediainfo',
+    action='store_true',
+    default=False,
+    help='also store the container, codec, and resolution of each video file',
+)
+
+not_uploaded_parser = subparsers.add_parser('not-uploaded', help='list releases that have not been uploaded')
+largest_parser = subparsers.add_parser('largest-unseeded', help='list the largest releases without a torrent')
+duplicates_parser = subparsers.add_parser('duplicates', help='list releases of the same film')
+duplicates_parser.add_argument('title', help='film title')
+duplicates_parser.add_argument('--year', default=None, help='film year')
+for query_parser in (not_uploaded_parser, largest_parser, duplicates_parser):
+    query_parser.add_argument('-l', '--limit', type=int, default=None, help='maximum number of results')
+
+args = parser.parse_args()
+
+if args.command is None:
+    parser.print_help()
+    sys.exit(1)
+
+if args.catalog is None:
+    logging.critical('Set CATALOG_PATH in config.py, or give the path to the catalog with --catalog.')
+    sys.exit(1)
+
+try:
+    catalog = files.Catalog(args.catalog)
+except files.CatalogError as e:
+    logging.critical(e)
+    sys.exit(1)
+
+if args.command == 'update':
+    for library_path in args.library_list:
+        try:
+            catalog.update(library_path, get_mediainfo=args.mediainfo)
+        except files.CatalogError as e:
+            logging.error(e)
+    sys.exit(0)
+
+if args.command == 'not-uploaded':
+    rows = catalog.not_uploaded(limit=args.limit)
+elif args.command == 'largest-unseeded':
+    rows = catalog.largest_unseeded(limit=args.limit)
+else:
+    rows = catalog.duplicates(args.title, year=args.year)[:args.limit]
+
+for row in rows:
+    print(row['path'])
@@ -35,14 +35,63 @@ FFMPEG_PATH = 'ffmpeg'
 FFPROBE_PATH = 'ffprobe'
 UNRAR_PATH = 'unrar'
 
+# How to run mediainfo: 'cli' runs MEDIAINFO_PATH, 'library' reads files in-process with libmediainfo, and
+# 'auto' uses libmediainfo if it is installed (LIBMEDIAINFO_PATH, or found on the system), or else the CLI
+MEDIAINFO_BACKEND = 'auto'
+LIBMEDIAINFO_PATH = None
+
 # Set this to True if you want to delete files that don't make it into the uploaded torrent.
 # NOTE: If you want to cross-seed, this might not be a good idea.
 DELETE_UNWANTED_FILES = False
 
+# Set this to a directory to build each torrent from a staged copy of the release, containing only the
+# whitelisted files.  Files are hardlinked (or reflinked) where possible, so no data is copied and the
+# original release is left untouched for cross-seeding.  Use a directory on the same filesystem.  The staged
+# copy of an uploaded release is what gets seeded, so it is kept (remove it when you stop seeding); the staged
+# copy of a failed upload is removed.
+STAGING_DIR = None
+
+# Set this to a file (such as '~/.macguffin.sqlite') to keep a catalog of the releases in your library, and
+# record upload status in it (see catalog.py)
+CATALOG_PATH = None
+
+# Probe results and other per-file data are cached here (set to None to disable caching)
+CACHE_DIR = '~/.macguffin_cache'
+
+# An optional file of extra release groups, in the same format as metadata/release_groups.txt
+RELEASE_GROUPS_FILE = None
+
 # How many screenshots to upload by default
 NUM_SCREENSHOTS = 4
 DELETE_SCREENS_AFTER_UPLOAD = True
 
+# Where to take screenshots: 'even' spreads twice as many candidates as needed over the video and keeps the
+# most detailed ones; 'bitrate' takes exactly the number needed from its busiest sections (requires NumPy,
+# and reads through the whole file once)
+SCREENSHOT_TIMESTAMPS = 'even'
+
+# Screenshots (and their image host links) are reused for this many seconds, for up to this many videos
+SCREENSHOT_CACHE_TTL = 7 * 24 * 60 * 60
+SCREENSHOT_CACHE_SIZE = 200
+
+# How many files' mediainfo output and probe results to keep in the cache
+MEDIAINFO_CACHE_SIZE = 5000
+
+# Losslessly recompress screenshots before uploading them (zlib level 1-9; 9 is smallest and slowest)
+OPTIMIZE_SCREENSHOTS = True
+PNG_COMPRESSION_LEVEL = 9
+
+# How many screenshots may be extracted (when ffmpeg is run once per frame) or optimized at once
+# (None means one per CPU)
+SCREENSHOT_WORKERS = None
+
+# Contact sheets: a grid of this many columns and rows of thumbnails, each this many pixels wide, with
+# this many pixels between them
+CONTACT_SHEET_COLUMNS = 4
+CONTACT_SHEET_ROWS = 5
+CONTACT_SHEET_THUMBNAIL_WIDTH = 320
+CONTACT_SHEET_SPACING = 4
+
 ####################################################
 ##  End user-edited sections                      ##
 ####################################################
@@ -53,4 +102,10 @@ if WATCH_DIR is not None:
 if LOG_DIR is not None:
     LOG_DIR = os.path.expanduser(LOG_DIR)
 if COOKIE_DIR is not None:
-    COOKIE_DIR = os.path.expanduser(COOKIE_DIR)
\ No newline at end of file
+    COOKIE_DIR = os.path.expanduser(COOKIE_DIR)
+if CATALOG_PATH is not None:
+    CATALOG_PATH = os.path.expanduser(CATALOG_PATH)
+if CACHE_DIR is not None:
+    CACHE_DIR = os.path.expanduser(CACHE_DIR)
+if STAGING_DIR is not None:
+    STAGING_DIR = os.path.expanduser(STAGING_DIR)
\ No newline at end of file
@@ -3,7 +3,13 @@ from __future__ import print_function, unicode_literals, division, absolute_impo
 from .utils import *
 from .bencode import bencode
 from .nfo import NFO, NFOError
+from .rar import RarArchive, RarMember, RarError
+from .png import write_png, PNGError
+from . import frames
 from .torrent import Torrent, TorrentError
-from .release import Release, ReleaseError
+from .release import Release, ReleaseError, classify_scene
+from .release_names import ParsedReleaseName, parse_release_name, parse_release_names
 from .video_file import VideoFile, VideoFileError
-from .screenshots import Screenshots, ScreenshotsError
\ No newline at end of file
+from .headers import read_video_header, VideoHeader
+from .screenshots import Screenshots, ScreenshotsError
+from .catalog import Catalog, CatalogError
\ No newline at end of file
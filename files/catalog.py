@@ -0,0 +1,300 @@
+from __future__ import print_function, unicode_literals, division, absolute_import
+import logging
+import sqlite3
+import json
+import time
+import os
+
+import files
+import metadata
+import uploads
+
+
+class Catalog(object):
+    """
+    A persistent SQLite catalog of the releases in a library.
+
+    Releases are rescanned only when their modification time changes, so updating a
+    large library is cheap.  Upload status and torrent info hashes are kept across rescans.
+    """
+
+    def __init__(self, path):
+
+        self.path = os.path.abspath(os.path.expanduser(path))
+        try:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.row_factory = sqlite3.Row
+            self.connection.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            msg = 'Could not open catalog "{path}": {error}'
+            raise CatalogError(msg.format(path=self.path, error=e))
+
+    def __repr__(self):
+        return self.path
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, library_path, get_mediainfo=False):
+        """
+        Scan every release directly inside library_path, skipping the ones that have not been modified.
+
+        Returns the number of releases that were (re)scanned and the number that were removed.
+        """
+
+        library_path = os.path.abspath(os.path.expanduser(library_path))
+        if not os.path.isdir(library_path):
+            msg = '"{path}" is not a directory.'
+            raise CatalogError(msg.format(path=library_path))
+
+        # Paths that are not releases are remembered too, so they aren't rescanned every time
+        known = dict(
+            (row['path'], row['mtime'])
+            for row in self.connection.execute(
+                'SELECT path, mtime FROM releases WHERE library = ? '
+                'UNION ALL SELECT path, mtime FROM skipped WHERE library = ?',
+                (library_path, library_path)
+            )
+        )
+
+        scanned = 0
+        seen = set()
+        for entry in sorted(os.listdir(library_path)):
+
+            path = os.path.join(library_path, entry)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            seen.add(path)
+
+            if known.get(path) == mtime:
+                continue
+
+            try:
+                record = self._scan(path, get_mediainfo=get_mediainfo)
+            except files.ReleaseError as e:
+                msg = 'Not cataloging "{path}": {error}'
+                logging.debug(msg.format(path=path, error=e))
+                self.connection.execute('DELETE FROM releases WHERE path = ?', (path,))
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO skipped (path, library, mtime) VALUES (?, ?, ?)',
+                    (path, library_path, mtime)
+                )
+                continue
+
+            record['library'] = library_path
+            record['mtime'] = mtime
+            self._save(record)
+            self.connection.execute('DELETE FROM skipped WHERE path = ?', (path,))
+            scanned += 1
+
+        removed = [path for path in known if path not in seen]
+        for path in removed:
+            self.connection.execute('DELETE FROM releases WHERE path = ?', (path,))
+            self.connection.execute('DELETE FROM skipped WHERE path = ?', (path,))
+            self.connection.execute('DELETE FROM torrents WHERE path = ?', (path,))
+
+        self.connection.commit()
+
+        msg = 'Catalog updated: {scanned} release(s) scanned, {removed} removed'
+        logging.info(msg.format(scanned=scanned, removed=len(removed)))
+
+        return scanned, len(removed)
+
+    @staticmethod
+    def _scan(path, get_mediainfo=False):
+        """
+        Build a catalog record for the release at this path.
+        """
+
+        release = files.Release(path)
+        release.find_video_file()
+
+        mediainfo_summary = None
+        if get_mediainfo and os.path.isfile(release.video_file):
+            technical = Catalog._get_technical(release.video_file)
+            if technical is not None:
+                mediainfo_summary = json.dumps({
+                    'container': technical.container,
+                    'codec': technical.codec,
+                    'width': technical.width,
+                    'height': technical.height,
+                }, sort_keys=True)
+
+        return {
+            'path': release.path,
+            'name': release.name,
+            'title': release.title,
+            'normalized_title': uploads.normalize_title(release.title),
+            'year': release.year,
+            'codec': release.codec,
+            'source': release.source,
+            'resolution': release.resolution,
+            'release_group': release.group,
+            'size': release.size,
+            'video_file': release.video_file,
+            'mediainfo': mediainfo_summary,
+            'scanned': time.time(),
+        }
+
+    @staticmethod
+    def _get_technical(path):
+        """
+        Get the container, codec, and resolution of a video file from its headers, which only takes a few
+        small reads, or else from mediainfo.  Returns None if neither can tell.
+        """
+
+        header = files.read_video_header(path)
+        if header is not None and header.is_complete:
+            return header
+
+        try:
+            mediainfo = metadata.Mediainfo(path=path)
+            mediainfo.parse()
+            mediainfo.get_info()
+        except metadata.MediainfoError as e:
+            msg = 'Could not get mediainfo for "{path}": {error}'
+            logging.debug(msg.format(path=path, error=e))
+            return None
+        return mediainfo
+
+    def _save(self, record):
+        """
+        Insert or update a release record, keeping its upload status.
+        """
+        columns = sorted(record.keys())
+        assignments = ', '.join('{column} = :{column}'.format(column=column) for column in columns)
+        cursor = self.connection.execute(
+            'UPDATE releases SET {assignments} WHERE path = :path'.format(assignments=assignments),
+            record
+        )
+        if cursor.rowcount == 0:
+            self.connection.execute(
+                'INSERT INTO releases ({columns}) VALUES ({values})'.format(
+                    columns=', '.join(columns),
+                    values=', '.join(':' + column for column in columns),
+                ),
+                record
+            )
+
+    def set_upload_status(self, path, status):
+        """
+        Record the outcome of an upload (for example 'uploaded' or 'failed') for the release at this path.
+        A release that hasn't been scanned yet gets a row of its own, which the next update() fills in.
+        """
+        path = os.path.abspath(os.path.expanduser(path))
+        cursor = self.connection.execute('UPDATE releases SET upload_status = ? WHERE path = ?', (status, path))
+        if cursor.rowcount == 0:
+            self.connection.execute(
+                'INSERT INTO releases (path, library, name, upload_status) VALUES (?, ?, ?, ?)',
+                (path, os.path.dirname(path), os.path.basename(path), status)
+            )
+        self.connection.commit()
+
+    def add_torrent(self, path, tracker, info_hash):
+        """
+        Record the info hash of a torrent made from the release at this path.
+        """
+        path = os.path.abspath(os.path.expanduser(path))
+        self.connection.execute(
+            'INSERT OR REPLACE INTO torrents (path, tracker, info_hash, created) VALUES (?, ?, ?, ?)',
+            (path, '{tracker}'.format(tracker=tracker), info_hash, time.time())
+        )
+        self.connection.commit()
+
+    def get(self, path):
+        """
+        Return the record for the release at this path, or None.
+        """
+        path = os.path.abspath(os.path.expanduser(path))
+        return self.connection.execute('SELECT * FROM releases WHERE path = ?', (path,)).fetchone()
+
+    def info_hashes(self, path):
+        """
+        Return a dictionary of tracker name to info hash for the release at this path.
+        """
+        path = os.path.abspath(os.path.expanduser(path))
+        rows = self.connection.execute('SELECT tracker, info_hash FROM torrents WHERE path = ?', (path,))
+        return dict((row['tracker'], row['info_hash']) for row in rows)
+
+    def not_uploaded(self, limit=None):
+        """
+        Releases that have not been uploaded yet.
+        """
+        return self._query(
+            "SELECT * FROM releases WHERE upload_status IS NULL OR upload_status != 'uploaded' ORDER BY path",
+            limit=limit
+        )
+
+    def duplicates(self, title, year=None):
+        """
+        Releases of the same film, matched on normalized title (and year, if given).
+        """
+        if year is None:
+            return self._query(
+                'SELECT * FROM releases WHERE normalized_title = ? ORDER BY year, size DESC',
+                (uploads.normalize_title(title),)
+            )
+        return self._query(
+            'SELECT * FROM releases WHERE normalized_title = ? AND year = ? ORDER BY size DESC',
+            (uploads.normalize_title(title), str(year))
+        )
+
+    def largest_unseeded(self, limit=None):
+        """
+        The largest releases that no torrent has been made for yet.
+        """
+        return self._query(
+            'SELECT * FROM releases WHERE path NOT IN (SELECT path FROM torrents) ORDER BY size DESC',
+            limit=limit
+        )
+
+    def _query(self, sql, parameters=(), limit=None):
+        if limit is not None:
+            sql += ' LIMIT {limit:d}'.format(limit=limit)
+        return self.connection.execute(sql, parameters).fetchall()
+
+
+class CatalogError(Exception):
+    pass
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS releases (
+    path TEXT PRIMARY KEY,
+    library TEXT,
+    mtime REAL,
+    scanned REAL,
+    name TEXT,
+    title TEXT,
+    normalized_title TEXT,
+    year TEXT,
+    codec INTEGER,
+    source INTEGER,
+    resolution TEXT,
+    release_group TEXT,
+    size INTEGER,
+    video_file TEXT,
+    mediainfo TEXT,
+    upload_status TEXT
+);
+CREATE INDEX IF NOT EXISTS releases_library ON releases (library);
+CREATE INDEX IF NOT EXISTS releases_title ON releases (normalized_title, year);
+CREATE INDEX IF NOT EXISTS releases_size ON releases (size);
+CREATE INDEX IF NOT EXISTS releases_status ON releases (upload_status);
+
+CREATE TABLE IF NOT EXISTS torrents (
+    path TEXT,
+    tracker TEXT,
+    info_hash TEXT,
+    created REAL,
+    PRIMARY KEY (path, tracker)
+);
+
+CREATE TABLE IF NOT EXISTS skipped (
+    path TEXT PRIMARY KEY,
+    library TEXT,
+    mtime REAL
+);
+'''
@@ -0,0 +1,158 @@
+from __future__ import print_function, unicode_literals, division, absolute_import
+
+# NumPy is optional; without it, screenshots are scored by their PNG file size instead
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def split_frames(data, width, height):
+    """
+    Split a buffer of raw rgb24 frames into a list of (height, width, 3) uint8 arrays.
+    """
+    frame_size = width * height * 3
+    count = len(data) // frame_size
+    frames = numpy.frombuffer(data, dtype=numpy.uint8, count=count * frame_size)
+    return list(frames.reshape((count, height, width, 3)))
+
+
+def to_grayscale(frames):
+    """
+    Convert a list of RGB frames into one (count, height, width) float32 array of luma values.
+
+    The frames are converted one at a time, so only one of them is ever held in floating point RGB.
+    """
+    if not frames:
+        return numpy.zeros((0, 0, 0), dtype=numpy.float32)
+    (height, width, channels) = frames[0].shape
+    weights = numpy.array(LUMA_WEIGHTS, dtype=numpy.float32)
+    gray = numpy.empty((len(frames), height, width), dtype=numpy.float32)
+    for (index, frame) in enumerate(frames):
+        gray[index] = frame.dot(weights)
+    return gray
+
+
+def laplacian_variance(gray):
+    """
+    Score the amount of detail in each frame of a to_grayscale() array by the variance of its Laplacian.
+
+    Flat frames (fades, black frames, blurry shots) score close to zero.
+    """
+    scores = []
+    for frame in gray:
+        laplacian = (
+            4 * frame[1:-1, 1:-1]
+            - frame[:-2, 1:-1]
+            - frame[2:, 1:-1]
+            - frame[1:-1, :-2]
+            - frame[1:-1, 2:]
+        )
+        scores.append(float(laplacian.var()))
+    return scores
+
+
+def difference_hashes(gray, hash_size=8):
+    """
+    Compute a difference hash (dHash) of each frame of a to_grayscale() array, as a (count, hash_size,
+    hash_size) array of booleans.
+
+    Each frame is shrunk to hash_size + 1 by hash_size blocks of average luma, and every bit records
+    whether a block is brighter than its left neighbour.  Frames that look alike have hashes that
+    differ in only a few bits.
+    """
+    (count, height, width) = gray.shape
+    block_height = height // hash_size
+    block_width = width // (hash_size + 1)
+    gray = gray[:, :block_height * hash_size, :block_width * (hash_size + 1)]
+    small = gray.reshape((count, hash_size, block_height, hash_size + 1, block_width)).mean(axis=(2, 4))
+    return small[:, :, 1:] > small[:, :, :-1]
+
+
+def hash_distances(hashes):
+    """
+    Return the matrix of Hamming distances between every pair of hashes.
+    """
+    flat = hashes.reshape((len(hashes), -1))
+    return (flat[:, None, :] != flat[None, :, :]).sum(axis=2)
+
+
+def is_duplicate(frame_hash, hashes, max_distance=None):
+    """
+    Check whether a hash is within max_distance bits (DUPLICATE_DISTANCE by default) of any of a list of hashes.
+    """
+    if max_distance is None:
+        max_distance = DUPLICATE_DISTANCE
+    return any((frame_hash != other).sum() <= max_distance for other in hashes)
+
+
+def select_distinct(scores, hashes, count, max_distance=None):
+    """
+    Return the indexes of up to count frames, best score first, skipping any frame whose hash is within
+    max_distance bits (DUPLICATE_DISTANCE by default) of a frame that was already selected.
+    """
+    if max_distance is None:
+        max_distance = DUPLICATE_DISTANCE
+    distances = hash_distances(hashes)
+    selected = []
+    for index in sorted(range(len(scores)), key=lambda i: scores[i], reverse=True):
+        if len(selected) == count:
+            break
+        if any(distances[index, other] <= max_distance for other in selected):
+            continue
+        selected.append(index)
+    return selected
+
+
+def tile(frames, columns, spacing=0):
+    """
+    Arrange equally sized RGB frames in a grid, left to right and top to bottom, with spacing black
+    pixels between and around them.  Returns one (height, width, 3) uint8 array.
+    """
+    (height, width, channels) = frames[0].shape
+    rows = -(-len(frames) // columns)
+    sheet = numpy.zeros(
+        (rows * (height + spacing) + spacing, columns * (width + spacing) + spacing, channels),
+        dtype=numpy.uint8,
+    )
+    for (index, frame) in enumerate(frames):
+        (row, column) = divmod(index, columns)
+        top = spacing + row * (height + spacing)
+        left = spacing + column * (width + spacing)
+        sheet[top:top + height, left:left + width] = frame
+    return sheet
+
+
+def select_peaks(profile, count, window=5, margin=0.05):
+    """
+    Choose count time codes (in whole seconds) in the busiest parts of a bitrate profile (bytes per second).
+
+    The profile is smoothed over a few seconds, the start and end (opening and closing credits) are
+    skipped, and the rest is split into count equal sections.  The time code with the highest smoothed
+    bitrate is taken from each section, so the shots stay spread over the whole film.
+    """
+
+    rates = numpy.asarray(profile, dtype=numpy.float64)
+    if count <= 0 or len(rates) < count:
+        return []
+
+    if window > 1 and len(rates) >= window:
+        rates = numpy.convolve(rates, numpy.ones(window) / window, mode='same')
+
+    first = int(len(rates) * margin)
+    last = len(rates) - first
+    if last - first < count:
+        (first, last) = (0, len(rates))
+
+    boundaries = numpy.linspace(first, last, count + 1).astype(numpy.int64)
+    return [
+        int(start + numpy.argmax(rates[start:end]))
+        for (start, end) in zip(boundaries[:-1], boundaries[1:])
+    ]
+
+
+# Frames whose 64-bit difference hashes differ in this many bits or fewer are near-duplicates
+DUPLICATE_DISTANCE = 10
+
+# ITU-R BT.601 luma coefficients
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
@@ -0,0 +1,326 @@
+from __future__ import print_function, unicode_literals, division, absolute_import
+import logging
+import struct
+import io
+import re
+
+from metadata import Containers, Codecs
+from .matroska import read_tracks, find_first_block, MatroskaError, EBML_MAGIC, VIDEO_TRACK_TYPE
+
+
+class VideoHeader(object):
+    """
+    The technical details of a video file that can be read from its container headers, without mediainfo:
+    the container, the codec, the width and height, and the encoder's settings.
+
+    Like metadata.Mediainfo (after get_info()), it has container, codec, width, height, and
+    encoding_settings attributes.  Any of them may be None if the headers don't say.
+    """
+
+    __slots__ = ('container', 'codec_id', 'width', 'height', 'writing_library', 'encoding_settings')
+
+    def __init__(self, container, codec_id=None, width=None, height=None):
+        self.container = container
+        self.codec_id = codec_id
+        self.width = width
+        self.height = height
+        self.writing_library = None
+        self.encoding_settings = dict()
+
+    def __repr__(self):
+        msg = 'VideoHeader(container={container}, codec_id={codec_id}, {width}x{height}, {library})'
+        return msg.format(
+            container=self.container,
+            codec_id=self.codec_id,
+            width=self.width,
+            height=self.height,
+            library=self.writing_library,
+        )
+
+    @property
+    def is_complete(self):
+        """
+        Whether the headers gave the container, codec, width, and height.
+        """
+        return self.container is not None and self.codec is not None and bool(self.width and self.height)
+
+    @property
+    def codec(self):
+        """
+        The codec, decided the same way as Mediainfo.get_info(), by the writing library.  Without one,
+        the codec is unknown: H.264 from another encoder looks the same as an x264 encode whose signature
+        wasn't found, so that is left to mediainfo.
+        """
+        if self.writing_library is not None:
+            library = self.writing_library.lower()
+            if library.startswith('x264'):
+                return Codecs.X264
+            if library.startswith('xvid'):
+                return Codecs.XVID
+        return None
+
+
+def read_video_header(path):
+    """
+    Read the technical details of a Matroska, MP4, or AVI file from its headers.  Only a few small
+    blocks of the file are read: the headers themselves, and the start of the first video frame (where
+    x264 and XviD write their names and settings).  Returns a VideoHeader, or None if the file can't be
+    read this way.
+
+    Instead of a path, a seekable binary file object can be given (such as a RarMember's).
+    """
+    try:
+        if hasattr(path, 'read'):
+            return _read_header(path)
+        with io.open(path, mode='rb') as f:
+            return _read_header(f)
+    except (IOError, OSError, MatroskaError, struct.error) as e:
+        msg = 'Could not read the headers of "{path}": {error}'
+        logging.debug(msg.format(path=getattr(path, 'name', path), error=e))
+    return None
+
+
+def _read_header(f):
+    f.seek(0)
+    magic = f.read(12)
+    if magic[:4] == EBML_MAGIC:
+        return _read_matroska(f)
+    if magic[4:8] in MP4_FIRST_BOXES:
+        return _read_mp4(f)
+    if magic[:4] == b'RIFF' and magic[8:12] == b'AVI ':
+        return _read_avi(f)
+    return None
+
+
+def _read_matroska(f):
+    (doc_type, tracks, first_cluster) = read_tracks(f)
+
+    # Like mediainfo, only plain Matroska is the MKV container (WebM is left as None)
+    header = VideoHeader(MATROSKA_DOC_TYPES.get(doc_type.lower()))
+    video_track = next((track for track in tracks if track['type'] == VIDEO_TRACK_TYPE), None)
+    if video_track is None:
+        return header
+    header.codec_id = video_track['codec_id']
+    header.width = video_track['width']
+    header.height = video_track['height']
+
+    # Audio and subtitle blocks can come first, so find the video track's first block
+    if first_cluster is not None and video_track['number'] is not None:
+        block = find_first_block(f, first_cluster, video_track['number'])
+        if block is not None:
+            _find_encoder(f, block[0], header, block[1])
+    return header
+
+
+def _read_mp4(f):
+    f.seek(0, io.SEEK_END)
+    file_size = f.tell()
+
+    moov = _find_box(f, 0, file_size, b'moov')
+    if moov is None:
+        return None
+
+    header = VideoHeader(Containers.MP4)
+    for trak in _iter_boxes(f, moov[0], moov[1]):
+        if trak[2] != b'trak':
+            continue
+        mdia = _find_box(f, trak[0], trak[1], b'mdia')
+        if mdia is None:
+            continue
+
+        # The handler says what kind of track this is
+        hdlr = _find_box(f, mdia[0], mdia[1], b'hdlr')
+        if hdlr is None:
+            continue
+        f.seek(hdlr[0] + 8)
+        if f.read(4) != b'vide':
+            continue
+
+        stbl = _find_path(f, mdia, (b'minf', b'stbl'))
+        if stbl is None:
+            continue
+
+        # The first sample description holds the codec and the frame size
+        stsd = _find_box(f, stbl[0], stbl[1], b'stsd')
+        if stsd is not None:
+            f.seek(stsd[0] + 8)
+            entry = f.read(36)
+            if len(entry) == 36:
+                header.codec_id = entry[4:8].decode('ascii', 'replace')
+                (header.width, header.height) = struct.unpack('>HH', entry[32:36])
+
+        # The first chunk offset is where the first video frame is
+        for (box_type, offset_format) in ((b'stco', '>I'), (b'co64', '>Q')):
+            chunk_offsets = _find_box(f, stbl[0], stbl[1], box_type)
+            if chunk_offsets is None:
+                continue
+            f.seek(chunk_offsets[0] + 4)
+            data = f.read(4 + struct.calcsize(offset_format))
+            if len(data) == 4 + struct.calcsize(offset_format) and struct.unpack('>I', data[:4])[0] > 0:
+                _find_encoder(f, struct.unpack(offset_format, data[4:])[0], header)
+            break
+
+        return header
+
+    return header
+
+
+def _read_avi(f):
+    f.seek(0, io.SEEK_END)
+    file_size = f.tell()
+
+    header = VideoHeader(Containers.AVI)
+    for (chunk_start, chunk_end, chunk_id, list_type) in _iter_chunks(f, 12, file_size):
+        if chunk_id != b'LIST':
+            continue
+
+        if list_type == b'hdrl':
+            # The whole header list is small; read it at once
+            f.seek(chunk_start)
+            _parse_avi_header_list(f.read(chunk_end - chunk_start), header)
+
+        elif list_type == b'movi':
+            # Audio chunks can come first, so find the first video chunk
+            frame = _find_avi_frame(f, chunk_start, chunk_end)
+            if frame is not None:
+                _find_encoder(f, frame[0], header, frame[1])
+            break
+
+    return header
+
+
+def _parse_avi_header_list(data, header):
+    position = 0
+    in_video_stream = False
+    while position + 8 <= len(data):
+        (chunk_id, size) = struct.unpack('<4sI', data[position:position + 8])
+        chunk_data = data[position + 8:position + 8 + size]
+
+        if chunk_id == b'LIST':
+            # Descend into the stream lists
+            position += 12
+            continue
+
+        if chunk_id == b'avih' and len(chunk_data) >= 40:
+            (header.width, header.height) = struct.unpack('<II', chunk_data[32:40])
+        elif chunk_id == b'strh' and len(chunk_data) >= 4:
+            in_video_stream = chunk_data[:4] == b'vids'
+        elif chunk_id == b'strf' and in_video_stream and len(chunk_data) >= 20 and header.codec_id is None:
+            (width, height) = struct.unpack('<ii', chunk_data[4:12])
+            (header.width, header.height) = (width, abs(height))
+            header.codec_id = chunk_data[16:20].decode('ascii', 'replace').strip('\x00 ')
+
+        position += 8 + size + (size & 1)
+
+
+def _find_avi_frame(f, start, end):
+    """
+    Return (offset, size) of the data of the first video chunk ("00dc", "01db", ...) in a movie list
+    (or in its "rec " lists), or None.
+    """
+    for (chunk_start, chunk_end, chunk_id, list_type) in _iter_chunks(f, start, end):
+        if chunk_id == b'LIST' and list_type == b'rec ':
+            frame = _find_avi_frame(f, chunk_start, chunk_end)
+            if frame is not None:
+                return frame
+        elif chunk_id[2:] in (b'dc', b'db') and chunk_end > chunk_start:
+            return chunk_start, chunk_end - chunk_start
+    return None
+
+
+def _find_encoder(f, offset, header, size=None):
+    """
+    Look for an encoder's signature at the start of the first video frame, and set the writing
+    library (and encoding settings) of the header, the way mediainfo reports them.
+    """
+    f.seek(offset)
+    data = f.read(min(size, ENCODER_SCAN_SIZE) if size is not None else ENCODER_SCAN_SIZE)
+
+    start = data.find(b'x264 - core')
+    if start >= 0:
+        end = data.find(b'\x00', start)
+        signature = data[start:end if end >= 0 else len(data)].decode('ascii', 'replace')
+
+        # "x264 - core 148 r2643 5c65704 - H.264/MPEG-4 AVC codec - ... - options: cabac=1 ref=5 ..."
+        parts = signature.split(' - ')
+        header.writing_library = ' - '.join(parts[:2])
+        (before, delimiter, options) = signature.partition('options: ')
+        for option in options.split():
+            (key, delimiter, value) = option.partition('=')
+            header.encoding_settings[key] = value
+        return
+
+    match = re.search(br'XviD(\d+)', data)
+    if match is not None:
+        header.writing_library = 'XviD {build}'.format(build=int(match.group(1)))
+
+
+def _iter_boxes(f, start, end):
+    """
+    Yield (data start, data end, type) for each MP4 box between two offsets, reading only the box headers.
+    """
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        data = f.read(16)
+        if len(data) < 8:
+            return
+        (size, box_type) = struct.unpack('>I4s', data[:8])
+        header_size = 8
+        if size == 1:
+            if len(data) < 16:
+                return
+            size = struct.unpack('>Q', data[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size:
+            return
+        yield position + header_size, min(position + size, end), box_type
+        position += size
+
+
+def _find_box(f, start, end, box_type):
+    for (data_start, data_end, found_type) in _iter_boxes(f, start, end):
+        if found_type == box_type:
+            return data_start, data_end
+    return None
+
+
+def _find_path(f, box, path):
+    for box_type in path:
+        box = _find_box(f, box[0], box[1], box_type)
+        if box is None:
+            return None
+    return box
+
+
+def _iter_chunks(f, start, end):
+    """
+    Yield (data start, data end, ID, list type) for each RIFF chunk between two offsets.  For LIST
+    chunks, the data starts after the list type.
+    """
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        data = f.read(12)
+        if len(data) < 8:
+            return
+        (chunk_id, size) = struct.unpack('<4sI', data[:8])
+        if chunk_id == b'LIST' and len(data) == 12:
+            yield position + 12, min(position + 8 + size, end), chunk_id, data[8:12]
+        else:
+            yield position + 8, min(position + 8 + size, end), chunk_id, None
+        position += 8 + size + (size & 1)
+
+
+# How far into the first video frame to look for the encoder's signature (it comes before the picture)
+ENCODER_SCAN_SIZE = 16384
+
+# Matroska DocTypes that are one of our containers
+MATROSKA_DOC_TYPES = {
+    'matroska': Containers.MKV,
+}
+
+# Box types an MP4 file can start with
+MP4_FIRST_BOXES = (b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide')
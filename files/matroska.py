@@ -0,0 +1,433 @@
+from __future__ import print_function, unicode_literals, division, absolute_import
+import struct
+import io
+
+
+def read_cues(f):
+    """
+    Read the keyframe times (in seconds) of the first video track from the Cues element of a Matroska file.
+
+    f is a seekable binary file object.  Only the headers at the start of the segment and the Cues
+    element itself are read; the clusters are skipped.  Returns a sorted list, or None if the file
+    has no usable Cues.
+    """
+
+    (segment_start, segment_end) = _find_segment(f)
+
+    timecode_scale = DEFAULT_TIMECODE_SCALE
+    video_track = None
+    cues_position = None
+
+    # Walk the top-level elements up to the first cluster, noting where the Cues are
+    position = segment_start
+    while position < segment_end:
+        f.seek(position)
+        header = _read_element_header(f)
+        if header is None:
+            break
+        (element_id, size, data_start) = header
+
+        if element_id == SEEK_HEAD_ID:
+            seek_position = _read_seek_head(f, data_start, size).get(CUES_ID)
+            if seek_position is not None and cues_position is None:
+                cues_position = segment_start + seek_position
+
+        elif element_id == INFO_ID:
+            for (child_id, child_size, child_start) in _iter_children(f, data_start, size):
+                if child_id == TIMECODE_SCALE_ID:
+                    f.seek(child_start)
+                    timecode_scale = _uint(f.read(child_size))
+
+        elif element_id == TRACKS_ID:
+            video_track = _find_video_track(f, data_start, size)
+
+        elif element_id == CUES_ID:
+            cues_position = position
+            break
+
+        elif element_id == CLUSTER_ID:
+            break
+
+        if size is None:
+            break
+        position = data_start + size
+
+    if cues_position is None:
+        return None
+
+    f.seek(cues_position)
+    header = _read_element_header(f)
+    if header is None or header[0] != CUES_ID or header[1] is None:
+        return None
+    (element_id, size, data_start) = header
+
+    # Read the whole element at once; Cues are small compared to the file
+    f.seek(data_start)
+    data = f.read(size)
+
+    keyframes = set()
+    for (cue_id, cue_start, cue_end) in _iter_buffer_children(data, 0, len(data)):
+        if cue_id != CUE_POINT_ID:
+            continue
+        cue_time = None
+        tracks = []
+        for (child_id, child_start, child_end) in _iter_buffer_children(data, cue_start, cue_end):
+            if child_id == CUE_TIME_ID:
+                cue_time = _uint(data[child_start:child_end])
+            elif child_id == CUE_TRACK_POSITIONS_ID:
+                for (grandchild_id, grandchild_start, grandchild_end) in _iter_buffer_children(data, child_start, child_end):
+                    if grandchild_id == CUE_TRACK_ID:
+                        tracks.append(_uint(data[grandchild_start:grandchild_end]))
+        if cue_time is None:
+            continue
+        if video_track is not None and tracks and video_track not in tracks:
+            continue
+        keyframes.add(cue_time * timecode_scale / 1000000000)
+
+    if not keyframes:
+        return None
+    return sorted(keyframes)
+
+
+def read_tracks(f):
+    """
+    Read the document type and the tracks of a Matroska file, from the headers at the start of the segment.
+
+    Returns (doc type, tracks, offset of the first cluster), where tracks is a list of dictionaries with
+    'number', 'type', 'codec_id', 'width' and 'height' (for video tracks).  The offset is None if no
+    cluster was found before the end of the headers.
+    """
+
+    doc_type = _read_doc_type(f)
+    (segment_start, segment_end) = _find_segment(f)
+
+    tracks = []
+    first_cluster = None
+    position = segment_start
+    while position < segment_end:
+        f.seek(position)
+        header = _read_element_header(f)
+        if header is None:
+            break
+        (element_id, size, data_start) = header
+
+        if element_id == TRACKS_ID and size is not None:
+            f.seek(data_start)
+            data = f.read(size)
+            for (entry_id, entry_start, entry_end) in _iter_buffer_children(data, 0, len(data)):
+                if entry_id == TRACK_ENTRY_ID:
+                    tracks.append(_parse_track_entry(data, entry_start, entry_end))
+
+        elif element_id == CLUSTER_ID:
+            first_cluster = position
+            break
+
+        if size is None:
+            break
+        position = data_start + size
+
+    return doc_type, tracks, first_cluster
+
+
+def find_first_block(f, cluster_position, track_number):
+    """
+    Find the first frame of a track, in the clusters from a given offset on.
+
+    Returns (offset, size) of the data of the first SimpleBlock or Block of the track, after its block
+    header, or None if none of the first few clusters has one.
+    """
+
+    position = cluster_position
+    for __ in range(FIRST_BLOCK_CLUSTERS):
+        f.seek(position)
+        header = _read_element_header(f)
+        if header is None or header[0] != CLUSTER_ID:
+            return None
+        (element_id, size, data_start) = header
+
+        # A cluster of unknown size ends where the next one starts
+        end = data_start + size if size is not None else None
+        child_position = data_start
+        while end is None or child_position < end:
+            f.seek(child_position)
+            child = _read_element_header(f)
+            if child is None or child[1] is None:
+                return None
+            (child_id, child_size, child_start) = child
+            if child_id == CLUSTER_ID:
+                break
+
+            block = None
+            if child_id == SIMPLE_BLOCK_ID:
+                block = _find_block_data(f, child_start, child_size, track_number)
+            elif child_id == BLOCK_GROUP_ID:
+                for (grandchild_id, grandchild_size, grandchild_start) in _iter_children(f, child_start, child_size):
+                    if grandchild_id == BLOCK_ID:
+                        block = _find_block_data(f, grandchild_start, grandchild_size, track_number)
+                        break
+            if block is not None:
+                return block
+
+            child_position = child_start + child_size
+
+        position = end if end is not None else child_position
+
+    return None
+
+
+def is_matroska(f):
+    """
+    Check for the EBML magic number at the start of a binary file object.
+    """
+    f.seek(0)
+    return f.read(4) == EBML_MAGIC
+
+
+def _find_segment(f):
+    """
+    Return the start and end offsets of the data of the first Segment element.
+    """
+    f.seek(0)
+    header = _read_element_header(f)
+    if header is None or header[0] != EBML_ID:
+        raise MatroskaError('Not a Matroska file (no EBML header).')
+    (element_id, size, data_start) = header
+
+    f.seek(data_start + size)
+    header = _read_element_header(f)
+    if header is None or header[0] != SEGMENT_ID:
+        raise MatroskaError('Not a Matroska file (no Segment after the EBML header).')
+    (element_id, size, data_start) = header
+
+    if size is None:
+        f.seek(0, io.SEEK_END)
+        return data_start, f.tell()
+    return data_start, data_start + size
+
+
+def _read_seek_head(f, data_start, size):
+    """
+    Return a dictionary of element ID -> position (relative to the segment data) from a SeekHead.
+    """
+    positions = dict()
+    for (seek_id, seek_size, seek_start) in _iter_children(f, data_start, size):
+        if seek_id != SEEK_ID:
+            continue
+        f.seek(seek_start)
+        data = f.read(seek_size)
+        target_id = None
+        target_position = None
+        for (child_id, child_start, child_end) in _iter_buffer_children(data, 0, len(data)):
+            if child_id == SEEK_ID_ID:
+                target_id = _uint(data[child_start:child_end])
+            elif child_id == SEEK_POSITION_ID:
+                target_position = _uint(data[child_start:child_end])
+        if target_id is not None and target_position is not None:
+            positions[target_id] = target_position
+    return positions
+
+
+def _read_doc_type(f):
+    """
+    Return the DocType ('matroska' or 'webm') from the EBML header.
+    """
+    f.seek(0)
+    header = _read_element_header(f)
+    if header is None or header[0] != EBML_ID or header[1] is None:
+        raise MatroskaError('Not a Matroska file (no EBML header).')
+    (element_id, size, data_start) = header
+    f.seek(data_start)
+    data = f.read(size)
+    for (child_id, child_start, child_end) in _iter_buffer_children(data, 0, len(data)):
+        if child_id == DOC_TYPE_ID:
+            return data[child_start:child_end].rstrip(b'\x00').decode('ascii', 'replace')
+    return 'matroska'
+
+
+def _parse_track_entry(data, start, end):
+    track = {
+        'number': None,
+        'type': None,
+        'codec_id': None,
+        'width': None,
+        'height': None,
+    }
+    for (child_id, child_start, child_end) in _iter_buffer_children(data, start, end):
+        if child_id == TRACK_NUMBER_ID:
+            track['number'] = _uint(data[child_start:child_end])
+        elif child_id == TRACK_TYPE_ID:
+            track['type'] = _uint(data[child_start:child_end])
+        elif child_id == CODEC_ID_ID:
+            track['codec_id'] = data[child_start:child_end].rstrip(b'\x00').decode('ascii', 'replace')
+        elif child_id == VIDEO_ID:
+            for (video_id, video_start, video_end) in _iter_buffer_children(data, child_start, child_end):
+                if video_id == PIXEL_WIDTH_ID:
+                    track['width'] = _uint(data[video_start:video_end])
+                elif video_id == PIXEL_HEIGHT_ID:
+                    track['height'] = _uint(data[video_start:video_end])
+    return track
+
+
+def _find_video_track(f, data_start, size):
+    """
+    Return the track number of the first video track in a Tracks element, or None.
+    """
+    for (entry_id, entry_size, entry_start) in _iter_children(f, data_start, size):
+        if entry_id != TRACK_ENTRY_ID:
+            continue
+        f.seek(entry_start)
+        data = f.read(entry_size)
+        track_number = None
+        track_type = None
+        for (child_id, child_start, child_end) in _iter_buffer_children(data, 0, len(data)):
+            if child_id == TRACK_NUMBER_ID:
+                track_number = _uint(data[child_start:child_end])
+            elif child_id == TRACK_TYPE_ID:
+                track_type = _uint(data[child_start:child_end])
+        if track_type == VIDEO_TRACK_TYPE:
+            return track_number
+    return None
+
+
+def _find_block_data(f, data_start, size, track_number):
+    """
+    Return (offset, size) of the frame data of a (Simple)Block if it belongs to a track, or None.
+    """
+    f.seek(data_start)
+    data = f.read(min(size, 8))
+    try:
+        (block_track, position) = _parse_vint(data, 0)
+    except IndexError:
+        return None
+    if block_track != track_number:
+        return None
+
+    # The track number is followed by a 16-bit timecode and the flags
+    position += 3
+    if position > size:
+        return None
+    return data_start + position, size - position
+
+
+def _iter_children(f, data_start, size):
+    """
+    Yield (element ID, size, data offset) for each child of an element, reading the headers from the file.
+    """
+    position = data_start
+    end = data_start + size
+    while position < end:
+        f.seek(position)
+        header = _read_element_header(f)
+        if header is None or header[1] is None:
+            return
+        yield header
+        position = header[2] + header[1]
+
+
+def _iter_buffer_children(data, start, end):
+    """
+    Yield (element ID, data start, data end) for each element in data[start:end].
+    """
+    position = start
+    while position < end:
+        try:
+            (element_id, position) = _parse_vint(data, position, keep_marker=True)
+            (size, position) = _parse_vint(data, position)
+        except IndexError:
+            return
+        if size is None or position + size > end:
+            return
+        yield element_id, position, position + size
+        position += size
+
+
+def _read_element_header(f):
+    """
+    Read an element ID and size from the current position.  Returns (ID, size, data offset), or None at EOF.
+
+    The size is None for elements of unknown size.
+    """
+    start = f.tell()
+    data = f.read(12)
+    try:
+        (element_id, position) = _parse_vint(data, 0, keep_marker=True)
+        (size, position) = _parse_vint(data, position)
+    except IndexError:
+        return None
+    return element_id, size, start + position
+
+
+def _parse_vint(data, position, keep_marker=False):
+    """
+    Parse an EBML variable-length integer.  Returns (value, new position).
+
+    IDs keep their length marker bits; sizes with every value bit set mean "unknown" and are returned as None.
+    """
+    first = bytearray(data[position:position + 1])[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not (first & mask):
+        length += 1
+        mask >>= 1
+    if length > 8:
+        raise MatroskaError('Invalid EBML variable-length integer.')
+
+    raw = bytearray(data[position:position + length])
+    if len(raw) < length:
+        raise IndexError
+    value = raw[0] if keep_marker else raw[0] & (mask - 1)
+    for byte in raw[1:]:
+        value = (value << 8) | byte
+
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = None
+    return value, position + length
+
+
+def _uint(data):
+    value = 0
+    for byte in bytearray(data):
+        value = (value << 8) | byte
+    return value
+
+
+class MatroskaError(Exception):
+    pass
+
+
+EBML_MAGIC = struct.pack('>I', 0x1A45DFA3)
+
+EBML_ID = 0x1A45DFA3
+DOC_TYPE_ID = 0x4282
+SEGMENT_ID = 0x18538067
+SEEK_HEAD_ID = 0x114D9B74
+SEEK_ID = 0x4DBB
+SEEK_ID_ID = 0x53AB
+SEEK_POSITION_ID = 0x53AC
+INFO_ID = 0x1549A966
+TIMECODE_SCALE_ID = 0x2AD7B1
+TRACKS_ID = 0x1654AE6B
+TRACK_ENTRY_ID = 0xAE
+TRACK_NUMBER_ID = 0xD7
+TRACK_TYPE_ID = 0x83
+CODEC_ID_ID = 0x86
+VIDEO_ID = 0xE0
+PIXEL_WIDTH_ID = 0xB0
+PIXEL_HEIGHT_ID = 0xBA
+CLUSTER_ID = 0x1F43B675
+BLOCK_GROUP_ID = 0xA0
+BLOCK_ID = 0xA1
+SIMPLE_BLOCK_ID = 0xA3
+CUES_ID = 0x1C53BB6B
+CUE_POINT_ID = 0xBB
+CUE_TIME_ID = 0xB3
+CUE_TRACK_POSITIONS_ID = 0xB7
+CUE_TRACK_ID = 0xF7
+
+VIDEO_TRACK_TYPE = 1
+
+# How many clusters to look through for the first frame of a track
+FIRST_BLOCK_CLUSTERS = 4
+
+# Nanoseconds per timecode unit, unless the Info element says otherwise
+DEFAULT_TIMECODE_SCALE = 1000000
@@ -0,0 +1,222 @@
+from __future__ import print_function, unicode_literals, division, absolute_import
+import struct
+import zlib
+import io
+
+from metadata.cache import _replace
+
+# NumPy is optional; without it, PNGs are recompressed but keep their original filters
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def write_png(path, pixels, width, height, compression_level=6):
+    """
+    Write 8-bit RGB pixel data (height rows of width * 3 bytes, top to bottom) to a PNG file.
+    """
+
+    stride = width * 3
+    pixels = memoryview(pixels).tobytes() if not isinstance(pixels, bytes) else pixels
+    if len(pixels) != stride * height:
+        msg = 'Expected {expected} bytes of pixel data for {width}x{height}, got {actual}'
+        raise PNGError(msg.format(expected=stride * height, width=width, height=height, actual=len(pixels)))
+
+    # Every scanline starts with its filter type; 0 means unfiltered
+    scanlines = b''.join(
+        b'\x00' + pixels[offset:offset + stride]
+        for offset in range(0, stride * height, stride)
+    )
+
+    header = struct.pack('>IIBBBBB', width, height, 8, COLOR_TYPE_RGB, 0, 0, 0)
+    with io.open(path, mode='wb') as f:
+        f.write(PNG_SIGNATURE)
+        f.write(_chunk(b'IHDR', header))
+        f.write(_chunk(b'IDAT', zlib.compress(scanlines, compression_level)))
+        f.write(_chunk(b'IEND', b''))
+
+
+def optimize_png(path, compression_level=9):
+    """
+    Losslessly shrink a PNG file in place, and return its (old size, new size).
+
+    Metadata chunks (text, timestamps, EXIF) are dropped, the scanline filters are re-chosen row by row
+    (if NumPy is installed and the image is 8-bit RGB or RGBA), and the image data is recompressed with
+    a few zlib strategies.  The file is only rewritten if the result is smaller.
+    """
+
+    (old_size, chunks, scanlines, pixels, channels) = _read_png(path)
+    if pixels is not None:
+        scanlines = _filter_adaptive(pixels, channels)
+
+    compressed = min((_compress(scanlines, compression_level, strategy) for strategy in STRATEGIES), key=len)
+
+    output = bytearray(PNG_SIGNATURE)
+    wrote_image_data = False
+    for (chunk_type, chunk_data) in chunks:
+        if chunk_type == b'IDAT':
+            if not wrote_image_data:
+                output.extend(_chunk(b'IDAT', compressed))
+                wrote_image_data = True
+        elif chunk_type in KEPT_CHUNKS:
+            output.extend(_chunk(chunk_type, chunk_data))
+
+    if len(output) >= old_size:
+        return old_size, old_size
+
+    temporary_path = path + '.tmp'
+    with io.open(temporary_path, mode='wb') as f:
+        f.write(output)
+    _replace(temporary_path, path)
+    return old_size, len(output)
+
+
+def _read_png(path):
+    """
+    Read a PNG file, and return (file size, chunks, decompressed scanlines, pixels, channels per pixel).
+    The pixels are unfiltered (see _unfilter()) if NumPy is installed and the image is 8-bit RGB or RGBA;
+    otherwise they are None.  Raises PNGError if the file is damaged.
+    """
+
+    with io.open(path, mode='rb') as f:
+        data = f.read()
+
+    chunks = read_chunks(data)
+    if not chunks or chunks[0][0] != b'IHDR':
+        msg = '"{path}" does not start with an IHDR chunk.'
+        raise PNGError(msg.format(path=path))
+
+    try:
+        header = struct.unpack('>IIBBBBB', chunks[0][1])
+        (width, height, bit_depth, color_type, compression, filter_method, interlace) = header
+        image_data = b''.join(chunk_data for (chunk_type, chunk_data) in chunks if chunk_type == b'IDAT')
+        scanlines = zlib.decompress(image_data)
+
+        pixels = None
+        channels = CHANNELS.get(color_type)
+        if numpy is not None and bit_depth == 8 and channels is not None and interlace == 0:
+            pixels = _unfilter(scanlines, width * channels, height, channels)
+
+    except (struct.error, zlib.error, ValueError) as e:
+        # A truncated IDAT or a bad IHDR leaves too little data for the size the header gives
+        msg = 'Could not read "{path}": {error}'
+        raise PNGError(msg.format(path=path, error=e))
+
+    return len(data), chunks, scanlines, pixels, channels
+
+
+def read_chunks(data):
+    """
+    Split the contents of a PNG file into a list of (chunk type, chunk data).
+    """
+    if data[:8] != PNG_SIGNATURE:
+        raise PNGError('Not a PNG file.')
+
+    chunks = []
+    position = 8
+    while position + 8 <= len(data):
+        (length, chunk_type) = struct.unpack('>I4s', data[position:position + 8])
+        chunks.append((chunk_type, data[position + 8:position + 8 + length]))
+        position += 12 + length
+        if chunk_type == b'IEND':
+            break
+    return chunks
+
+
+def _compress(scanlines, compression_level, strategy):
+    compressor = zlib.compressobj(compression_level, zlib.DEFLATED, 15, 9, strategy)
+    return compressor.compress(scanlines) + compressor.flush()
+
+
+def _unfilter(scanlines, stride, height, bytes_per_pixel):
+    """
+    Undo the scanline filters, and return the raw pixels as a (height, stride) uint8 array.
+
+    Returns None if any row uses the Average or Paeth filter.  Those can't be undone without a loop over
+    every byte, and an image that uses them has had its filters chosen carefully already.
+    """
+    lines = numpy.frombuffer(scanlines, dtype=numpy.uint8, count=(stride + 1) * height).reshape((height, stride + 1))
+    pixels = numpy.zeros((height, stride), dtype=numpy.uint8)
+    previous = numpy.zeros(stride, dtype=numpy.uint8)
+
+    for y in range(height):
+        filter_type = lines[y, 0]
+        line = lines[y, 1:]
+
+        if filter_type == FILTER_NONE:
+            pixels[y] = line
+        elif filter_type == FILTER_SUB:
+            pixels[y] = line.reshape((-1, bytes_per_pixel)).cumsum(axis=0, dtype=numpy.uint8).reshape(-1)
+        elif filter_type == FILTER_UP:
+            pixels[y] = line + previous
+        elif filter_type in (FILTER_AVERAGE, FILTER_PAETH):
+            return None
+        else:
+            raise PNGError('Unknown filter type {filter_type}'.format(filter_type=filter_type))
+
+        previous = pixels[y]
+
+    return pixels
+
+
+def _filter_adaptive(pixels, bytes_per_pixel):
+    """
+    Filter every row with each of the five filter types, and keep the one with the smallest sum of
+    absolute (signed) values, the usual heuristic for what compresses best.  Returns the scanlines.
+    """
+    (height, stride) = pixels.shape
+    x = pixels.astype(numpy.int16)
+
+    a = numpy.zeros_like(x)
+    a[:, bytes_per_pixel:] = x[:, :-bytes_per_pixel]
+    b = numpy.zeros_like(x)
+    b[1:] = x[:-1]
+    c = numpy.zeros_like(x)
+    c[1:, bytes_per_pixel:] = x[:-1, :-bytes_per_pixel]
+
+    p = a + b - c
+    pa = numpy.abs(p - a)
+    pb = numpy.abs(p - b)
+    pc = numpy.abs(p - c)
+    paeth = numpy.where((pa <= pb) & (pa <= pc), a, numpy.where(pb <= pc, b, c))
+
+    filtered = numpy.stack([x, x - a, x - b, x - ((a + b) >> 1), x - paeth]).astype(numpy.uint8)
+    costs = numpy.abs(filtered.view(numpy.int8).astype(numpy.int32)).sum(axis=2)
+    choices = costs.argmin(axis=0)
+
+    scanlines = numpy.empty((height, stride + 1), dtype=numpy.uint8)
+    scanlines[:, 0] = choices
+    scanlines[:, 1:] = filtered[choices, numpy.arange(height)]
+    return scanlines.tobytes()
+
+
+def _chunk(chunk_type, data):
+    checksum = zlib.crc32(chunk_type + data) & 0xffffffff
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', checksum)
+
+
+class PNGError(Exception):
+    pass
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+COLOR_TYPE_RGB = 2
+
+# Channels per pixel, for the color types whose filters can be re-chosen
+CHANNELS = {
+    2: 3,  # RGB
+    6: 4,  # RGBA
+}
+
+FILTER_NONE = 0
+FILTER_SUB = 1
+FILTER_UP = 2
+FILTER_AVERAGE = 3
+FILTER_PAETH = 4
+
+# zlib strategies to try when recompressing
+STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+
+# Chunks that affect how the image looks; everything else (text, timestamps, EXIF, ...) is dropped
+KEPT_CHUNKS = (b'IHDR', b'PLTE', b'tRNS', b'gAMA', b'cHRM', b'sRGB', b'iCCP', b'sBIT', b'IEND')
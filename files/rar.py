@@ -0,0 +1,489 @@
+from __future__ import print_function, unicode_literals, division, absolute_import
+import os
+import io
+import re
+import struct
+import logging
+
+
+class RarArchive(object):
+    """
+    Parses the block headers of a (possibly multi-volume) RAR archive, without extracting anything.
+
+    Only members that were added with the "store" method (-m0) can be read, since their data sits
+    uncompressed and contiguous inside the volumes.  Both the RAR 4.x and RAR 5.0 formats are supported.
+    """
+
+    def __init__(self, path):
+
+        path = os.path.abspath(os.path.expanduser(path))
+        if not os.path.isfile(path):
+            msg = '"{path}" is not a file.'
+            raise RarError(msg.format(path=path))
+
+        self.path = path
+        self.volumes = []
+        self.members = []
+
+        # Members are collected by name, so split files can be stitched together across volumes
+        members_by_name = dict()
+
+        volume_path = first_volume(path)
+        while volume_path is not None:
+
+            msg = 'Reading RAR volume headers: {file}'
+            logging.debug(msg.format(file=os.path.basename(volume_path)))
+            self.volumes.append(volume_path)
+
+            (blocks, is_continued) = read_volume(volume_path)
+            for block in blocks:
+                member = members_by_name.get(block.name)
+                if member is None:
+                    member = RarMember(
+                        name=block.name,
+                        size=block.unpacked_size,
+                        is_stored=block.is_stored,
+                        is_encrypted=block.is_encrypted,
+                        is_directory=block.is_directory,
+                        base_path=os.path.dirname(self.path),
+                    )
+                    members_by_name[block.name] = member
+                    self.members.append(member)
+                member.segments.append((volume_path, block.data_offset, block.packed_size))
+
+            # Stop when the last file in this volume isn't split into the next one
+            if not is_continued:
+                break
+            volume_path = next_volume(volume_path)
+            if volume_path is None:
+                msg = 'The next volume after "{path}" is missing.'
+                raise RarError(msg.format(path=self.volumes[-1]))
+
+    def __repr__(self):
+        return self.path
+
+    def find_member(self, extensions=None):
+        """
+        Return the largest readable member with one of the given extensions, or None.
+        """
+        candidates = []
+        for member in self.members:
+            if not member.is_readable:
+                continue
+            if extensions is not None and os.path.splitext(member.name)[1].lower() not in extensions:
+                continue
+            candidates.append((member.size, member.name, member))
+        if not candidates:
+            return None
+        return sorted(candidates, reverse=True)[0][2]
+
+
+class RarMember(object):
+    """
+    A single file inside a RAR archive, and the byte ranges of the volumes that hold its data.
+    """
+
+    def __init__(self, name, size, is_stored, is_encrypted, is_directory, base_path):
+        self.name = name
+        self.size = size
+        self.is_stored = is_stored
+        self.is_encrypted = is_encrypted
+        self.is_directory = is_directory
+        self.segments = []
+
+        # The path this member would have if it were extracted next to the archive
+        self.path = os.path.join(base_path, *name.split('/'))
+
+    def __repr__(self):
+        return self.path
+
+    @property
+    def is_readable(self):
+        """
+        Stored, unencrypted files whose segments add up to the full file size can be read in place.
+        """
+        if not self.is_stored or self.is_encrypted or self.is_directory:
+            return False
+        return sum(length for (volume_path, offset, length) in self.segments) == self.size
+
+    def open(self):
+        """
+        Return a seekable, read-only file object for this member.
+        """
+        if not self.is_readable:
+            msg = '"{name}" is compressed or encrypted, and must be extracted before it can be read.'
+            raise RarError(msg.format(name=self.name))
+        return io.BufferedReader(RarMemberFile(self), buffer_size=1048576)
+
+    def ffmpeg_url(self):
+        """
+        Build an input URL that lets ffmpeg and ffprobe read (and seek within) this member directly.
+
+        The "subfile" protocol exposes a byte range of one volume, and "concat" chains the ranges together.
+        """
+        if not self.is_readable:
+            msg = '"{name}" is compressed or encrypted, and must be extracted before it can be read.'
+            raise RarError(msg.format(name=self.name))
+        if len(self.segments) == 1:
+            (volume_path, offset, length) = self.segments[0]
+            return 'subfile,,start,{start},end,{end},,:{path}'.format(
+                start=offset,
+                end=offset + length,
+                path=volume_path,
+            )
+        parts = [
+            'subfile,,start,{start},end,{end},,:{path}'.format(start=offset, end=offset + length, path=volume_path)
+            for (volume_path, offset, length) in self.segments
+        ]
+        return 'concat:' + '|'.join(parts)
+
+
+class RarMemberFile(io.RawIOBase):
+    """
+    Raw file object spanning the data segments of a stored RAR member.
+    """
+
+    def __init__(self, member):
+        super(RarMemberFile, self).__init__()
+        self.member = member
+        self.name = member.path
+        self._position = 0
+        self._file = None
+        self._file_path = None
+
+        # Offset of each segment within the member, so seeks can find the right volume with a bisection
+        self._starts = []
+        start = 0
+        for (volume_path, offset, length) in member.segments:
+            self._starts.append(start)
+            start += length
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.member.size + offset
+        else:
+            raise ValueError('Invalid whence ({whence})'.format(whence=whence))
+        if position < 0:
+            raise ValueError('Negative seek position {position}'.format(position=position))
+        self._position = position
+        return self._position
+
+    def readinto(self, buffer):
+        if self._position >= self.member.size:
+            return 0
+
+        # Find the segment containing the current position
+        index = len(self._starts) - 1
+        low = 0
+        while low < index:
+            middle = (low + index + 1) // 2
+            if self._starts[middle] <= self._position:
+                low = middle
+            else:
+                index = middle - 1
+        (volume_path, offset, length) = self.member.segments[low]
+        segment_position = self._position - self._starts[low]
+
+        # Read no further than the end of this segment; the caller will come back for the rest
+        size = min(len(buffer), length - segment_position)
+        if self._file_path != volume_path:
+            if self._file is not None:
+                self._file.close()
+            self._file = io.open(volume_path, mode='rb')
+            self._file_path = volume_path
+        self._file.seek(offset + segment_position)
+        data = self._file.read(size)
+        if not data:
+            msg = 'Unexpected end of volume "{path}"'
+            raise RarError(msg.format(path=volume_path))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._file_path = None
+        super(RarMemberFile, self).close()
+
+
+class _FileBlock(object):
+    """
+    The fields we care about from a RAR file header.
+    """
+
+    def __init__(self, name, packed_size, unpacked_size, data_offset, is_stored, is_encrypted, is_directory):
+        self.name = name
+        self.packed_size = packed_size
+        self.unpacked_size = unpacked_size
+        self.data_offset = data_offset
+        self.is_stored = is_stored
+        self.is_encrypted = is_encrypted
+        self.is_directory = is_directory
+
+
+def read_volume(volume_path):
+    """
+    Returns a list of file blocks in the volume, and whether the last one continues in the next volume.
+    """
+    with io.open(volume_path, mode='rb') as f:
+        signature = f.read(8)
+        if signature.startswith(RAR5_SIGNATURE):
+            return _read_rar5_volume(f, volume_path)
+        elif signature.startswith(RAR4_SIGNATURE):
+            f.seek(len(RAR4_SIGNATURE))
+            return _read_rar4_volume(f, volume_path)
+        else:
+            msg = '"{path}" is not a RAR archive.'
+            raise RarError(msg.format(path=volume_path))
+
+
+def _read_rar4_volume(f, volume_path):
+
+    blocks = []
+    is_continued = False
+
+    while True:
+        block_start = f.tell()
+        header = f.read(7)
+        if len(header) < 7:
+            break
+        (crc, block_type, flags, header_size) = struct.unpack('<HBHH', header)
+        if header_size < 7:
+            msg = 'Corrupt block header at offset {offset} of "{path}"'
+            raise RarError(msg.format(offset=block_start, path=volume_path))
+
+        add_size = 0
+        if block_type == 0x73:
+            # Archive header
+            if flags & 0x0080:
+                msg = '"{path}" has encrypted headers.'
+                raise RarError(msg.format(path=volume_path))
+
+        elif block_type == 0x74:
+            # File header
+            fields = f.read(header_size - 7)
+            (packed_size, unpacked_size, host_os, file_crc, file_time, version, method, name_size,
+             attributes) = struct.unpack('<IIBIIBBHI', fields[:25])
+            position = 25
+            if flags & 0x0100:
+                (high_packed_size, high_unpacked_size) = struct.unpack('<II', fields[position:position + 8])
+                packed_size += high_packed_size << 32
+                unpacked_size += high_unpacked_size << 32
+                position += 8
+            name = fields[position:position + name_size]
+            if flags & 0x0200:
+                # Unicode names are stored as "ascii\0encoded", and the ascii part is good enough for a lookup
+                name = name.split(b'\x00')[0]
+                name = name.decode('utf-8', 'replace')
+            else:
+                name = name.decode('latin-1')
+
+            blocks.append(_FileBlock(
+                name=name.replace('\\', '/'),
+                packed_size=packed_size,
+                unpacked_size=unpacked_size,
+                data_offset=block_start + header_size,
+                is_stored=(method == 0x30),
+                is_encrypted=bool(flags & 0x0004),
+                is_directory=(flags & 0x00E0 == 0x00E0),
+            ))
+            is_continued = bool(flags & 0x0002)
+            add_size = packed_size
+
+        elif block_type == 0x7B:
+            # End of archive
+            break
+
+        elif flags & 0x8000:
+            f.seek(block_start + 7)
+            add_size = struct.unpack('<I', f.read(4))[0]
+
+        f.seek(block_start + header_size + add_size)
+
+    return blocks, is_continued
+
+
+def _read_vint(data, position):
+    """
+    Decode a RAR 5.0 variable-length integer, returning the value and the position after it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+def _read_rar5_volume(f, volume_path):
+
+    blocks = []
+    is_continued = False
+
+    while True:
+        block_start = f.tell()
+
+        # CRC32, then the header size as a vint of at most 3 bytes
+        prefix = bytearray(f.read(7))
+        if len(prefix) < 5:
+            break
+        (header_size, position) = _read_vint(prefix, 4)
+        header_start = block_start + position
+        f.seek(header_start)
+        header = bytearray(f.read(header_size))
+        if len(header) < header_size:
+            break
+
+        (block_type, position) = _read_vint(header, 0)
+        (flags, position) = _read_vint(header, position)
+        extra_size = 0
+        data_size = 0
+        if flags & 0x0001:
+            (extra_size, position) = _read_vint(header, position)
+        if flags & 0x0002:
+            (data_size, position) = _read_vint(header, position)
+        data_offset = header_start + header_size
+
+        if block_type == 4:
+            msg = '"{path}" has encrypted headers.'
+            raise RarError(msg.format(path=volume_path))
+
+        elif block_type == 2:
+            (file_flags, position) = _read_vint(header, position)
+            (unpacked_size, position) = _read_vint(header, position)
+            (attributes, position) = _read_vint(header, position)
+            if file_flags & 0x0002:
+                position += 4
+            if file_flags & 0x0004:
+                position += 4
+            (compression, position) = _read_vint(header, position)
+            (host_os, position) = _read_vint(header, position)
+            (name_size, position) = _read_vint(header, position)
+            name = bytes(header[position:position + name_size]).decode('utf-8', 'replace')
+
+            # Encryption is recorded as record type 1 in the extra area
+            is_encrypted = False
+            extra_position = header_size - extra_size
+            while extra_position < header_size:
+                (record_size, next_position) = _read_vint(header, extra_position)
+                (record_type, __) = _read_vint(header, next_position)
+                if record_type == 1:
+                    is_encrypted = True
+                extra_position = next_position + record_size
+
+            blocks.append(_FileBlock(
+                name=name,
+                packed_size=data_size,
+                unpacked_size=unpacked_size,
+                data_offset=data_offset,
+                is_stored=((compression >> 7) & 0x07 == 0),
+                is_encrypted=is_encrypted,
+                is_directory=bool(file_flags & 0x0001),
+            ))
+            is_continued = bool(flags & 0x0010)
+
+        elif block_type == 5:
+            # End of archive
+            break
+
+        f.seek(data_offset + data_size)
+
+    return blocks, is_continued
+
+
+def first_volume(path):
+    """
+    Given any volume of a RAR set, return the path of its first volume.
+    """
+    (directory, file_name) = os.path.split(path)
+
+    match = NEW_VOLUME_REGEX.match(file_name)
+    if match:
+        number = '1'.zfill(len(match.group(2)))
+        candidate = os.path.join(directory, '{base}.part{n}.rar'.format(base=match.group(1), n=number))
+        return candidate if os.path.isfile(candidate) else path
+
+    match = OLD_VOLUME_REGEX.match(file_name)
+    if match:
+        for extension in ('.rar', '.RAR'):
+            candidate = os.path.join(directory, match.group(1) + extension)
+            if os.path.isfile(candidate):
+                return candidate
+
+    return path
+
+
+def next_volume(path):
+    """
+    Return the path of the volume following this one, or None if it does not exist.
+    """
+    (directory, file_name) = os.path.split(path)
+
+    match = NEW_VOLUME_REGEX.match(file_name)
+    if match:
+        number = str(int(match.group(2)) + 1).zfill(len(match.group(2)))
+        candidates = ['{base}.part{n}{ext}'.format(base=match.group(1), n=number, ext=match.group(3))]
+
+    else:
+        (base, extension) = os.path.splitext(file_name)
+        if extension.lower() == '.rar':
+            candidates = [base + '.r00', base + '.R00']
+        else:
+            match = OLD_VOLUME_REGEX.match(file_name)
+            if not match:
+                return None
+            # .r00 ... .r99 are followed by .s00 ... .s99, and so on
+            letter = match.group(2)
+            number = int(match.group(3)) + 1
+            if number > 99:
+                letter = chr(ord(letter) + 1)
+                number = 0
+            candidates = ['{base}.{letter}{n:02d}'.format(base=match.group(1), letter=letter, n=number)]
+
+    for candidate in candidates:
+        candidate = os.path.join(directory, candidate)
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def is_first_volume(file_name):
+    """
+    Returns True if the file name looks like the first volume of a RAR set.
+    """
+    match = NEW_VOLUME_REGEX.match(file_name)
+    if match:
+        return int(match.group(2)) == 1
+    return file_name.lower().endswith('.rar')
+
+
+class RarError(Exception):
+    pass
+
+
+RAR4_SIGNATURE = b'Rar!\x1a\x07\x00'
+RAR5_SIGNATURE = b'Rar!\x1a\x07\x01\x00'
+
+# name.part01.rar, name.part02.rar, ...
+NEW_VOLUME_REGEX = re.compile(r'(.*)\.part(\d+)(\.rar)$', re.IGNORECASE)
+
+# name.rar, name.r00, name.r01, ..., name.r99, name.s00, ...
+OLD_VOLUME_REGEX = re.compile(r'(.*)\.([r-z])(\d{2})$', re.IGNORECASE)
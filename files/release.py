@@ -1,5 +1,6 @@
 from __future__ import print_function, unicode_literals, division, absolute_import
 import os
+import shutil
 import logging
 import re
 
@@ -76,8 +77,13 @@ class Release(object):
             raise ReleaseError('No path or release name provided!')
 
         self.edition = 'Theatrical'
-        self.is_scene = None
+        self._is_scene = None
+        self._is_scene_resolved = False
         self.video_file = None
+        self.rar_member = None
+        self.original_path = self.path
+        self.original_base_path = self.base_path
+        self.staged_path = None
         self.size = 0
 
         self.title = None
@@ -96,6 +102,33 @@ class Release(object):
         else:
             return self.name
 
+    @property
+    def is_scene(self):
+        """
+        True for a Scene release, False for P2P, or None if unknown.
+
+        This is resolved the first time it is needed, since it may have to ask predb.me.
+        """
+        if not self._is_scene_resolved:
+            self.is_scene = self._classify_scene(uploads.check_predb)
+        return self._is_scene
+
+    @is_scene.setter
+    def is_scene(self, value):
+        self._is_scene = value
+        self._is_scene_resolved = True
+
+    def _classify_scene(self, check_predb):
+        """
+        Decide Scene or P2P based on release group, using check_predb(name) for unknown groups.
+        """
+        if self.group in metadata.scene_groups or check_predb(self.name):
+            return True
+        elif self.group in metadata.p2p_groups:
+            return False
+        else:
+            return None
+
     def get_size(self):
         """
         Get the human readable size of this release.
@@ -119,8 +152,11 @@ class Release(object):
         Parse out the title, year, codec, source media, and resolution from the release name.
         """
 
+        # Tokenize the release name once, and pick out every field
+        parsed = files.parse_release_name(self.name)
+
         # Get title from release name
-        self.title = get_title(self.name)
+        self.title = parsed.title
         if self.title is not None:
             msg = 'Title: {title}'
             logging.debug(msg.format(title=self.title))
@@ -129,7 +165,7 @@ class Release(object):
             raise ReleaseError(msg.format(name=self.name))
 
         # Get year from release name
-        self.year = get_year(self.name)
+        self.year = parsed.year
         if self.year is not None:
             msg = 'Year: {year}'
             logging.debug(msg.format(year=self.year))
@@ -138,7 +174,7 @@ class Release(object):
             logging.warning(msg.format(name=self.name))
 
         # Get codec from release name
-        self.codec = get_codec(self.name)
+        self.codec = parsed.codec
         if self.codec is not None:
             msg = 'Codec: {codec}'
             logging.debug(msg.format(codec=self.codec))
@@ -147,13 +183,13 @@ class Release(object):
             raise ReleaseError(msg.format(name=self.name))
 
         # Get source media from release name
-        self.source = get_source(self.name)
+        self.source = parsed.source
         if self.source is None:
             msg = 'Unable to parse source from release name "{name}"'
             raise ReleaseError(msg.format(name=self.name))
 
         # Get resolution from release name
-        self.resolution = get_resolution(self.name)
+        self.resolution = parsed.resolution
         if self.resolution is not None:
             msg = 'Resolution: {resolution}'
             logging.debug(msg.format(resolution=self.resolution))
@@ -161,7 +197,7 @@ class Release(object):
             self.resolution = 'Standard Def'
 
         # Get group name from release name
-        self.group = get_group(self.name)
+        self.group = parsed.group
         if self.group is not None:
             msg = 'Release group: {group}'
             logging.debug(msg.format(group=self.group))
@@ -169,14 +205,6 @@ class Release(object):
             msg = 'Unable to parse release group from release name "{name}"'
             logging.debug(msg.format(name=self.name))
 
-        # Decide Scene or P2P based on release group
-        if self.group in metadata.scene_groups or uploads.check_predb(self.name):
-            self.is_scene = True
-        elif self.group in metadata.p2p_groups:
-            self.is_scene = False
-        else:
-            self.is_scene = None
-
     def find_unwanted_files(self, extension_whitelist=None):
         """
         Get a list of all files in this release with extensions that are not whitelisted.
@@ -226,7 +254,109 @@ class Release(object):
                 except OSError:
                     pass
 
-    def unrar(self, destination_base_path=None):
+    def stage(self, staging_base_path, extension_whitelist=None):
+        """
+        Build a tree of only the whitelisted files under staging_base_path, and point this release at it.
+
+        Files are hardlinked or reflinked where the filesystem allows it (and copied otherwise), and RAR
+        archives are extracted into the staged tree, so the original release is left untouched for seeding.
+
+        The staged tree is what a torrent made from this release will seed, so it is left in place; the
+        caller owns it, and can remove it with unstage() when it isn't needed any more.
+        """
+
+        if self.path is None:
+            return
+
+        staging_base_path = os.path.abspath(os.path.expanduser(staging_base_path))
+        staged_path = os.path.join(staging_base_path, self.folder_name)
+        if staged_path == self.path:
+            msg = 'The staging directory "{path}" is the same as the release directory.'
+            raise ReleaseError(msg.format(path=staging_base_path))
+
+        msg = 'Staging release in "{path}"'
+        logging.info(msg.format(path=staged_path))
+
+        # From here on, unstage() can clean up, even if staging fails part of the way through
+        self.original_path = self.path
+        self.original_base_path = self.base_path
+        self.staged_path = staged_path
+
+        if self.is_single_file:
+            sources = [(self.path, staged_path)]
+        else:
+            sources = []
+            for (dir_path, dir_names, file_names) in os.walk(self.path, onerror=report_listdir_error):
+                for file_name in file_names:
+                    file_extension = os.path.splitext(file_name)[1].lower()
+                    if extension_whitelist is not None and file_extension not in extension_whitelist:
+                        continue
+                    path = os.path.join(dir_path, file_name)
+                    sources.append((path, os.path.join(staged_path, os.path.relpath(path, self.path))))
+
+        for (source_path, destination_path) in sources:
+
+            destination_dir = os.path.dirname(destination_path)
+            if not os.path.isdir(destination_dir):
+                os.makedirs(destination_dir)
+
+            # Replace whatever an earlier run left behind; unlinking a link never touches the original
+            if os.path.lexists(destination_path):
+                os.unlink(destination_path)
+
+            try:
+                method = files.link_or_copy(source_path, destination_path)
+            except files.FileUtilsError as e:
+                raise ReleaseError(e)
+            msg = 'Staged "{file}" ({method})'
+            logging.debug(msg.format(file=os.path.relpath(destination_path, staging_base_path), method=method))
+
+        if not self.is_single_file:
+
+            # Extract into the staged tree, never overwriting files that are linked to the originals
+            self.unrar(destination_base_path=staged_path, overwrite=False)
+
+            # Everything in the staged tree belongs to us, so unwanted extracted files can go
+            for (dir_path, dir_names, file_names) in os.walk(staged_path, onerror=report_listdir_error):
+                for file_name in file_names:
+                    file_extension = os.path.splitext(file_name)[1].lower()
+                    if extension_whitelist is not None and file_extension not in extension_whitelist:
+                        os.unlink(os.path.join(dir_path, file_name))
+
+        self.path = staged_path
+        self.base_path = staging_base_path
+        self.rar_member = None
+        self.video_file = None
+        self.size = 0
+
+    def unstage(self):
+        """
+        Delete the staged tree built by stage(), and point this release back at the original files.
+        Deleting the links never touches the originals.
+        """
+
+        if self.staged_path is None:
+            return
+
+        msg = 'Removing staged release "{path}"'
+        logging.info(msg.format(path=self.staged_path))
+        try:
+            if os.path.isdir(self.staged_path) and not os.path.islink(self.staged_path):
+                shutil.rmtree(self.staged_path)
+            elif os.path.lexists(self.staged_path):
+                os.unlink(self.staged_path)
+        except OSError as e:
+            msg = 'Could not remove staged release "{path}": {error}'
+            logging.warning(msg.format(path=self.staged_path, error=e))
+
+        self.path = self.original_path
+        self.base_path = self.original_base_path
+        self.staged_path = None
+        self.rar_member = None
+        self.video_file = None
+        self.size = 0
+
+    def unrar(self, destination_base_path=None, overwrite=True):
         """
         Extract all RAR archives present in the release to the specified destination.
         """
@@ -258,7 +388,7 @@ class Release(object):
                     msg = 'Extracting "{file}"'
                     logging.info(msg.format(file=os.path.join(sub_path, file_name)))
                     try:
-                        extracted_files = files.unrar(rar_file_path, destination_path)
+                        extracted_files = files.unrar(rar_file_path, destination_path, overwrite=overwrite)
                     except files.FileUtilsError as e:
                         raise ReleaseError(e)
                     else:
@@ -272,11 +402,10 @@ class Release(object):
 
         nfo_files = []
 
-        for (dir_path, dir_names, file_names) in os.walk(self.path, onerror=report_listdir_error):
+        for (dir_path, dir_names, file_entries) in files.scan_tree(self.path, onerror=report_listdir_error):
 
-            for file_name in file_names:
+            for (file_name, file_size, mtime) in file_entries:
                 path = os.path.join(dir_path, file_name)
-                file_size = os.path.getsize(path)
 
                 if file_name.endswith('.nfo'):
                     nfo_files.append((file_size, path))
@@ -313,20 +442,51 @@ class Release(object):
                 self.container = metadata.Containers.AVI
             return
 
+        # Start over, in case the release has changed (been extracted, for example) since the last time
         video_files = []
+        rar_files = []
+        rar_size = 0
+        self.rar_member = None
+        self.size = 0
 
-        for (dir_path, dir_names, file_names) in os.walk(self.path, onerror=report_listdir_error):
+        for (dir_path, dir_names, file_entries) in files.scan_tree(self.path, onerror=report_listdir_error):
 
-            for file_name in file_names:
+            for (file_name, file_size, mtime) in file_entries:
                 path = os.path.join(dir_path, file_name)
-                file_size = os.path.getsize(path)
 
                 file_extension = os.path.splitext(path)[1]
                 if file_extension in VIDEO_EXTENSION_WHITELIST:
                     video_files.append((file_size, path))
 
+                # Keep track of RAR volumes, in case the video file has not been extracted
+                if files.rar.NEW_VOLUME_REGEX.match(file_name) or files.rar.OLD_VOLUME_REGEX.match(file_name) \
+                        or file_extension.lower() == '.rar':
+                    rar_size += file_size
+                    if files.rar.is_first_volume(file_name):
+                        rar_files.append(path)
+
                 self.size += file_size
 
+        if not video_files and rar_files:
+
+            # Read the video file directly out of a store-only RAR archive
+            for rar_file in sorted(rar_files):
+                try:
+                    member = files.RarArchive(rar_file).find_member(extensions=VIDEO_EXTENSION_WHITELIST)
+                except files.RarError as e:
+                    msg = 'Could not read RAR archive "{file}": {error}'
+                    logging.debug(msg.format(file=rar_file, error=e))
+                    continue
+                if member is not None and (self.rar_member is None or member.size > self.rar_member.size):
+                    self.rar_member = member
+
+            if self.rar_member is not None:
+                # The archived video file replaces its volumes in the release
+                self.size += self.rar_member.size - rar_size
+                video_files.append((self.rar_member.size, self.rar_member.path))
+                msg = 'Reading main video file from RAR archive without extracting it: {file_name}'
+                logging.debug(msg.format(file_name=self.rar_member.name))
+
         if video_files:
 
             self.video_file = sorted(video_files, reverse=True)[0][1]
@@ -344,6 +504,20 @@ class Release(object):
             raise ReleaseError('Could not find video file!')
 
 
+def classify_scene(releases, max_threads=8):
+    """
+    Resolve is_scene for many releases at once, checking predb.me for all of the unknown groups concurrently.
+    """
+
+    releases = [release for release in releases if not release._is_scene_resolved]
+    categories = metadata.release_groups.categorize([release.group for release in releases])
+    names = [release.name for (release, category) in zip(releases, categories) if category != 'scene']
+    predb_results = uploads.check_predb_batch(names, max_threads=max_threads)
+
+    for release in releases:
+        release.is_scene = release._classify_scene(lambda name: predb_results.get(name, False))
+
+
 def get_title(release_name):
     """
     Parse the release name and return the film's title.  If no title is found, return None.
@@ -363,7 +537,7 @@ def get_year(release_name):
     if year is None:
         return None
     else:
-        return year.group().strip('.').lstrip('(').rstrip(')')
+        return year.group().strip('.').strip('-').lstrip('(').rstrip(')')
 
 
 def get_codec(release_name):
@@ -434,12 +608,19 @@ VIDEO_EXTENSION_WHITELIST = (
 )
 
 
+# Keyword patterns for each field of the release name (shared with the batch parser in files.release_names)
+YEAR_PATTERN = r'\(?(?:19|20)[0-9]{2}\)?'
+NON_TITLE_PATTERN = YEAR_PATTERN + r'|480p|576p|720p|1080p|1080i|NTSC|PAL|STV|PPF|R5|DVDSCR|SCREENER|DVDRip|BDRip|LIMITED|COMPLETE|PROPER|REPACK|RERiP|TS|TELESYNC|CAM|FESTIVAL|SUBBED'
+SOURCE_PATTERN = r'NTSC|PAL|R[56C]|TS|CAM|TELESYNC|SCREENER|DVDSCR|BDRip|Blu\-?Ray|HDDVD|DVDRip|DVDR?|HDTV|WEB-DL|WEBRip|DTheater|TVRip'
+FORMAT_PATTERN = r'XViD|x264|DVDR|VIDEO_TS|H\.?264|MPEG2|AVC'
+RESOLUTION_PATTERN = r'1080p|1080i|720p|480p|576p'
+
 # Regular expressions for parsing the release name
-NON_TITLE_REGEX = re.compile(r'\.(?:\(?(?:19|20)[0-9]{2}\)?|480p|576p|720p|1080p|1080i|NTSC|PAL|STV|PPF|R5|DVDSCR|SCREENER|DVDRip|BDRip|LIMITED|COMPLETE|PROPER|REPACK|RERiP|TS|TELESYNC|CAM|FESTIVAL|SUBBED)\..*', re.IGNORECASE)
-YEAR_REGEX = re.compile(r'\.(\(?(?:19|20)[0-9]{2}\)?)(\.|\-|$)')
-SOURCE_REGEX = re.compile(r'\.(NTSC|PAL|R[56C]|TS|CAM|TELESYNC|SCREENER|DVDSCR|BDRip|Blu\-?Ray|HDDVD|DVDRip|DVDR?|HDTV|WEB-DL|WEBRip|DTheater|TVRip)(\.|\-|$)', re.IGNORECASE)
-FORMAT_REGEX = re.compile(r'\.(XViD|x264|DVDR|VIDEO_TS|H\.?264|MPEG2|AVC)(\-|\.|$)', re.IGNORECASE)
-RESOLUTION_REGEX = re.compile(r'\.(1080p|1080i|720p|480p|576p)(\.|\-|$)', re.IGNORECASE)
+NON_TITLE_REGEX = re.compile(r'\.(?:' + NON_TITLE_PATTERN + r')\..*', re.IGNORECASE)
+YEAR_REGEX = re.compile(r'\.(' + YEAR_PATTERN + r')(\.|\-|$)')
+SOURCE_REGEX = re.compile(r'\.(' + SOURCE_PATTERN + r')(\.|\-|$)', re.IGNORECASE)
+FORMAT_REGEX = re.compile(r'\.(' + FORMAT_PATTERN + r')(\-|\.|$)', re.IGNORECASE)
+RESOLUTION_REGEX = re.compile(r'\.(' + RESOLUTION_PATTERN + r')(\.|\-|$)', re.IGNORECASE)
 GROUP_REGEX = re.compile(r'\-([^\.]*)$')
 
 
@@ -0,0 +1,195 @@
+from __future__ import print_function, unicode_literals, division, absolute_import
+from collections import namedtuple
+import multiprocessing
+import re
+
+from .release import (
+    YEAR_PATTERN,
+    NON_TITLE_PATTERN,
+    SOURCE_PATTERN,
+    FORMAT_PATTERN,
+    RESOLUTION_PATTERN,
+    SOURCE,
+    CODEC,
+)
+
+
+# The fields parsed from a release name.  Codec and source are Codecs/Sources enum values, as in Release.
+ParsedReleaseName = namedtuple('ParsedReleaseName', 'name title year codec source resolution group')
+
+
+def parse_release_name(release_name):
+    """
+    Parse every field out of a release name in a single pass, and return a ParsedReleaseName.
+
+    The results are identical to get_title(), get_year(), get_codec(), get_source(), get_resolution(),
+    and get_group() in files.release, but the name is only split once, each distinct segment is
+    classified once, and repeated names are memoized.
+    """
+
+    parsed = _cache.get(release_name)
+    if parsed is not None:
+        return parsed
+
+    title = None
+    year = None
+    codec = None
+    source = None
+    resolution = None
+
+    segments = release_name.split('.')
+    last_index = len(segments) - 1
+
+    # Walk the dot-separated segments once; only the first token of each category counts
+    found = set()
+    index = 1
+    while index <= last_index:
+        segment = segments[index]
+        index += 1
+
+        # "H.264" is the only keyword that spans a dot
+        if segment in ('H', 'h') and index <= last_index:
+            following = segments[index]
+            if following == '264' or following.startswith('264-'):
+                segment = segment + '.' + following
+                index += 1
+
+        try:
+            classified = _segment_tokens[segment]
+        except KeyError:
+            classified = _classify(segment)
+        if classified is None:
+            continue
+        (token, categories) = classified
+        categories = categories - found
+        if not categories:
+            continue
+
+        # Title keywords must be followed by a dot, not by a dash or the end of the name
+        if NON_TITLE_TOKEN in categories and token == segment and index <= last_index:
+            title = ' '.join(segments[:index - 1])
+            found.add(NON_TITLE_TOKEN)
+        if YEAR_TOKEN in categories:
+            year = token.lstrip('(').rstrip(')')
+        if FORMAT_TOKEN in categories:
+            codec = CODEC.get(token.lower())
+        if SOURCE_TOKEN in categories:
+            source = SOURCE.get(token.lower())
+        if RESOLUTION_TOKEN in categories:
+            resolution = token.lower()
+        found.update(categories - NON_TITLE_CATEGORY)
+
+    if title is None:
+        title = release_name
+    title = title.replace('.', ' ')
+    if title.strip() == '':
+        title = None
+
+    # The group name starts at the first dash after the last dot
+    last_part = release_name.rpartition('.')[2]
+    dash = last_part.find('-')
+    if dash < 0:
+        group = None
+    else:
+        group = last_part[dash:].strip('-')
+
+    parsed = ParsedReleaseName(release_name, title, year, codec, source, resolution, group)
+
+    if len(_cache) >= CACHE_SIZE:
+        _cache.clear()
+    _cache[release_name] = parsed
+
+    return parsed
+
+
+def parse_release_names(release_names, processes=None, chunk_size=5000):
+    """
+    Parse a list of release names, returning a list of ParsedReleaseName in the same order.
+
+    Duplicate names are parsed only once.  If processes is greater than 1 and there is more than one
+    chunk of work, the names are split into chunks and parsed on a process pool.
+    """
+
+    results = dict()
+    unique_names = []
+    for name in release_names:
+        if name in results:
+            continue
+        parsed = _cache.get(name)
+        results[name] = parsed
+        if parsed is None:
+            unique_names.append(name)
+
+    if processes is not None and processes > 1 and len(unique_names) > chunk_size:
+        chunks = [unique_names[i:i + chunk_size] for i in range(0, len(unique_names), chunk_size)]
+        pool = multiprocessing.Pool(processes)
+        try:
+            for chunk in pool.imap(_parse_chunk, chunks):
+                for parsed in chunk:
+                    results[parsed.name] = parsed
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for name in unique_names:
+            results[name] = parse_release_name(name)
+
+    return [results[name] for name in release_names]
+
+
+def _parse_chunk(release_names):
+    """
+    Pool worker for parse_release_names().
+    """
+    return [parse_release_name(name) for name in release_names]
+
+
+def _classify(segment):
+    """
+    Find the keyword token at the start of a segment, and remember it along with the fields it can belong to.
+
+    A token is either the whole segment, or the part of it before a dash.  Returns (token, categories) or None.
+    """
+    classified = None
+    candidates = [segment]
+    dash = segment.find('-')
+    while dash >= 0:
+        candidates.append(segment[:dash])
+        dash = segment.find('-', dash + 1)
+
+    for token in candidates:
+        categories = frozenset(
+            category
+            for (category, regex) in CATEGORY_REGEXES
+            if regex.match(token)
+        )
+        if categories:
+            classified = (token, categories)
+            break
+
+    if len(_segment_tokens) >= CACHE_SIZE:
+        _segment_tokens.clear()
+    _segment_tokens[segment] = classified
+    return classified
+
+
+# Token categories, one per field regex in files.release
+NON_TITLE_TOKEN = 'non_title'
+YEAR_TOKEN = 'year'
+SOURCE_TOKEN = 'source'
+FORMAT_TOKEN = 'format'
+RESOLUTION_TOKEN = 'resolution'
+NON_TITLE_CATEGORY = frozenset([NON_TITLE_TOKEN])
+
+CATEGORY_REGEXES = (
+    (NON_TITLE_TOKEN, re.compile(r'(?:' + NON_TITLE_PATTERN + r')$', re.IGNORECASE)),
+    (YEAR_TOKEN, re.compile(r'(?:' + YEAR_PATTERN + r')$')),
+    (SOURCE_TOKEN, re.compile(r'(?:' + SOURCE_PATTERN + r')$', re.IGNORECASE)),
+    (FORMAT_TOKEN, re.compile(r'(?:' + FORMAT_PATTERN + r')$', re.IGNORECASE)),
+    (RESOLUTION_TOKEN, re.compile(r'(?:' + RESOLUTION_PATTERN + r')$', re.IGNORECASE)),
+)
+
+# Memoized results, keyed by release name and by segment
+CACHE_SIZE = 200000
+_cache = dict()
+_segment_tokens = dict()
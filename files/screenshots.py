@@ -1,10 +1,21 @@
 from __future__ import print_function, unicode_literals, division, absolute_import
+import multiprocessing
 import subprocess
+import threading
 import tempfile
 import logging
+import time
+import sys
 import os
+from multiprocessing.pool import ThreadPool
+
+if sys.version_info[0] < 3:
+    import Queue as queue
+else:
+    import queue
 
 import files
+import metadata
 import image_hosts
 import config
 
@@ -19,10 +30,16 @@ class Screenshots(object):
             raise ScreenshotsError(e)
 
         self.bbcode = ''
+        self.bbcode_links = []
         self.links = []
         self.files = []
         self.uploaded = False
 
+        # The screenshot cache entry for the last set of screenshots taken, and how to take them again
+        self._cache_key = None
+        self._cached_uploads = dict()
+        self._take_arguments = None
+
     def verify(self):
         """
         Check to see if the output files exist.
@@ -41,9 +58,25 @@ class Screenshots(object):
                 os.unlink(path)
         self.files = []
 
-    def take(self, num_screenshots):
+    def take(self, num_screenshots, single_process=True, workers=None, score_in_memory=True, timestamps=None,
+             use_cache=True):
         """
         Generate screenshots with ffmpeg
+
+        The time codes are either spread evenly over the video ('even'), with twice as many candidates as
+        needed, or taken from its busiest parts ('bitrate'), in which case exactly num_screenshots are
+        taken.  The default is config.SCREENSHOT_TIMESTAMPS.
+
+        If score_in_memory is True and NumPy is installed, the candidate frames are decoded into memory,
+        scored by their amount of detail, and only the best ones are saved as PNG files.  Candidates that
+        look almost the same as a better one are rejected.
+
+        Otherwise every candidate is saved as a PNG, and the largest files are kept.  If single_process
+        is True, every frame is extracted by one ffmpeg invocation; otherwise ffmpeg is run once per frame,
+        on a pool of at most 'workers' threads (config.SCREENSHOT_WORKERS, or the number of CPUs, by default).
+
+        If use_cache is True, screenshots already taken (and uploaded) from the same video, with the same
+        timestamp strategy and resolution, are reused.
         """
 
         if self.files and self.verify():
@@ -52,92 +85,711 @@ class Screenshots(object):
 
         self.files = []
 
+        playback_resolution = self._set_cache_key(num_screenshots, timestamps)
+        self._take_arguments = (num_screenshots, single_process, workers, score_in_memory, timestamps)
+        if use_cache and self._load_from_cache():
+            return
+
+        frames = self._prepare(num_screenshots, timestamps)
+        num_screens_taken = len(frames)
+
+        msg = 'Taking {n} screenshots...'
+        logging.info(msg.format(n=num_screens_taken))
+
+        if num_screens_taken == num_screenshots:
+            score_in_memory = False
+        if score_in_memory and files.frames.numpy is not None:
+            self.files = self._take_in_memory(frames, num_screenshots, playback_resolution)
+            assert self.verify()
+            self._save_to_cache()
+            return
+
+        if single_process:
+            self._extract_frames(frames, playback_resolution)
+        else:
+            self._extract_frames_in_parallel(frames, playback_resolution, workers)
+
+        self.files = [path for (time_code, path) in frames]
+
+        assert len(self.files) == num_screens_taken
+        assert self.verify()
+
+        msg = 'Selecting the best {n} screenshots...'
+        logging.info(msg.format(n=num_screenshots))
+
+        # Sort the screenshots by file size (a decent approximation of the amount of detail they contain)
+        sized_screens = sorted([(os.path.getsize(path), path) for path in self.files])
+
+        # Delete the smallest ones
+        num_deleted = len(sized_screens) - num_screenshots
+        for (size, path) in sized_screens[:num_deleted]:
+            os.unlink(path)
+
+        # Keep the rest
+        self.files = [path for (size, path) in sized_screens[num_deleted:]]
+        self._save_to_cache()
+
+    def take_and_upload(self, num_screenshots, image_host=image_hosts.ImageBam, delete_after_upload=True,
+                        timestamps=None, optimize=None, use_cache=True):
+        """
+        Take screenshots and upload them as they are produced.
+
+        Candidate frames are read from ffmpeg one at a time.  The best distinct frame of each group of
+        candidates is saved, optimized, and queued for upload right away, so extraction and uploading
+        overlap.  Without NumPy, this is the same as take() followed by upload().
+
+        image_host is either an image host class, or an instance shared with other sets of screenshots.
+        """
+
+        if files.frames.numpy is None:
+            logging.debug('NumPy is not installed; taking all screenshots before uploading them.')
+            self.take(num_screenshots, timestamps=timestamps, use_cache=use_cache)
+            self.upload(image_host=image_host, delete_after_upload=delete_after_upload, optimize=optimize)
+            return
+
+        self.files = []
+        playback_resolution = self._set_cache_key(num_screenshots, timestamps)
+
+        self._take_arguments = (num_screenshots, True, None, True, timestamps)
+        if use_cache and self._load_from_cache():
+            self.upload(image_host=image_host, delete_after_upload=delete_after_upload, optimize=optimize)
+            return
+
+        frames = self._prepare(num_screenshots, timestamps)
+
+        if optimize is None:
+            optimize = config.OPTIMIZE_SCREENSHOTS
+
+        (image_host, image_host_name) = get_image_host(image_host)
+
+        # The upload thread takes (number, path) pairs off the queue until it gets None
+        upload_queue = queue.Queue()
+        uploaded = dict()
+        errors = []
+
+        def upload_worker():
+            while True:
+                item = upload_queue.get()
+                if item is None:
+                    return
+                if errors:
+                    continue
+                (number, path) = item
+                try:
+                    if optimize:
+                        files.png.optimize_png(path, compression_level=config.PNG_COMPRESSION_LEVEL)
+                    uploaded[number] = image_host.upload_image(path, number)
+                except Exception as e:
+                    # Anything else (like an image host page that changed) would end this thread silently
+                    logging.debug(e, exc_info=True)
+                    errors.append(e)
+
+        upload_thread = threading.Thread(target=files.inherit_log_buffer(upload_worker))
+        upload_thread.daemon = True
+        upload_thread.start()
+
+        msg = 'Taking {n} screenshots, and uploading the best {wanted} to {host}...'
+        logging.info(msg.format(n=len(frames), wanted=num_screenshots, host=image_host))
+
+        # Keep the best distinct frame out of each group of consecutive candidates
+        group_size = max(len(frames) // num_screenshots, 1)
+        group = []
+        accepted_hashes = []
+        finished = False
+        try:
+            time_codes = [time_code for (time_code, path) in frames]
+            for (index, frame) in enumerate(self._iter_frames(time_codes, playback_resolution)):
+                if errors:
+                    break
+                group.append(index)
+                group.append(frame)
+                if len(group) < 2 * group_size and index < len(frames) - 1:
+                    continue
+
+                (indexes, group_frames) = (group[0::2], group[1::2])
+                group = []
+                gray = files.frames.to_grayscale(group_frames)
+                scores = files.frames.laplacian_variance(gray)
+                hashes = files.frames.difference_hashes(gray)
+                for position in sorted(range(len(indexes)), key=lambda i: scores[i], reverse=True):
+                    if files.frames.is_duplicate(hashes[position], accepted_hashes):
+                        continue
+                    accepted_hashes.append(hashes[position])
+                    (time_code, path) = frames[indexes[position]]
+                    frame = group_frames[position]
+                    files.png.write_png(path, frame.tobytes(), width=frame.shape[1], height=frame.shape[0])
+                    self.files.append(path)
+                    upload_queue.put((len(self.files), path))
+                    break
+            finished = True
+        finally:
+            upload_queue.put(None)
+            upload_thread.join()
+
+            # Don't leave the screenshots written so far behind
+            if not finished or errors:
+                self.delete()
+
+        if errors:
+            raise ScreenshotsError(errors[0])
+
+        if len(self.files) < num_screenshots:
+            msg = 'Only {n} of the candidate frames are distinct; uploaded {n} screenshots instead of {wanted}'
+            logging.warning(msg.format(n=len(self.files), wanted=num_screenshots))
+
+        # Log from this thread, so the messages stay with the rest of this file's output
+        self.links = [uploaded[number][0] for number in sorted(uploaded)]
+        for link in self.links:
+            logging.info(link)
+        self.bbcode_links = [uploaded[number][1] for number in sorted(uploaded)]
+        self.bbcode = ''.join(self.bbcode_links)
+        self.uploaded = True
+
+        # Remember the upload, so a retry doesn't have to do it again
+        self._cached_uploads[image_host_name] = {
+            'links': list(self.links),
+            'bbcode_links': list(self.bbcode_links),
+            'bbcode': self.bbcode,
+        }
+        self._save_to_cache()
+
+        if delete_after_upload:
+            self.delete()
+
+    def take_comparison(self, others, num_screenshots, timestamps=None, workers=None):
+        """
+        Take screenshots of this video and of other encodes of the same film, at the same time codes.
+
+        others is a list of Screenshots objects for the other encodes.  One set of time codes is planned
+        from this video, and every input is handled by its own ffmpeg process, all in parallel, each one
+        seeking with its own keyframes.  Afterwards, the files of every Screenshots object line up:
+        files[i] of each one shows time code i.  No candidates are thrown away, since the best frame of
+        one encode isn't necessarily the best frame of another.
+        """
+
+        inputs = [self] + list(others)
+        time_codes = self.plan(num_screenshots, timestamps, candidates=1)
+
+        msg = 'Taking {n} screenshots of each of {count} videos, at {time_codes}...'
+        logging.info(msg.format(n=len(time_codes), count=len(inputs), time_codes=time_codes))
+
+        # Don't want to overwrite the wrong files in /tmp, so prefix with a random string
+        unique_string = files.utils.generate_id()
+
+        def take_input(job):
+            (input_index, screenshots) = job
+            frames = []
+            for (i, time_code) in enumerate(time_codes):
+                output_file = '{unique_string}_{input_index}_{index:03d}_{time_code}.png'.format(
+                    unique_string=unique_string,
+                    input_index=input_index,
+                    index=i,
+                    time_code=time_code,
+                )
+                frames.append((time_code, os.path.join(tempfile.gettempdir(), output_file)))
+            try:
+                playback_resolution = screenshots.video_file.get_playback_resolution()
+                screenshots.video_file.get_keyframes()
+                screenshots._extract_frames(frames, playback_resolution)
+            except (ScreenshotsError, files.VideoFileError) as e:
+                for (time_code, path) in frames:
+                    if os.path.isfile(path):
+                        os.unlink(path)
+                return screenshots, '{error}'.format(error=e)
+            screenshots.files = [path for (time_code, path) in frames]
+            screenshots._cache_key = None
+            screenshots._take_arguments = None
+            return screenshots, None
+
+        for screenshots in inputs:
+            screenshots.delete()
+
+        pool = ThreadPool(count_workers(workers, len(inputs)))
+        try:
+            results = pool.map(files.inherit_log_buffer(take_input), enumerate(inputs))
+        finally:
+            pool.close()
+            pool.join()
+
+        errors = [(screenshots, error) for (screenshots, error) in results if error is not None]
+        if errors:
+            for screenshots in inputs:
+                screenshots.delete()
+            msg = 'Could not take comparison screenshots of {failed} of {total} videos:\n{errors}'
+            raise ScreenshotsError(msg.format(
+                failed=len(errors),
+                total=len(inputs),
+                errors='\n'.join(
+                    '{path}: {error}'.format(path=screenshots.video_file.path, error=error)
+                    for (screenshots, error) in errors
+                ),
+            ))
+
+        return time_codes
+
+    def upload_comparison(self, others, image_host=image_hosts.ImageBam, delete_after_upload=True, optimize=None):
+        """
+        Upload the matched sets of screenshots taken by take_comparison() with one image host session, and
+        return BBCode with one line per time code, holding that frame from every video in order.
+        """
+
+        inputs = [self] + list(others)
+        (image_host, image_host_name) = get_image_host(image_host)
+        for screenshots in inputs:
+            screenshots.upload(image_host=image_host, delete_after_upload=delete_after_upload, optimize=optimize)
+
+        lines = []
+        for index in range(max(len(screenshots.bbcode_links) for screenshots in inputs)):
+            line = ''
+            for screenshots in inputs:
+                if index < len(screenshots.bbcode_links):
+                    line += screenshots.bbcode_links[index]
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def take_contact_sheet(self, columns=None, rows=None, thumbnail_width=None, path=None):
+        """
+        Make a contact sheet: a grid of small, evenly spaced frames from the whole video, in one PNG file.
+
+        The video is decoded once, keyframes only, and scaled down on the way; every frame at or just
+        after the next evenly spaced time code is kept in that same pass.  The frames are tiled with
+        NumPy, so it must be installed.  Returns the path of the PNG file.
+        """
+
+        if files.frames.numpy is None:
+            raise ScreenshotsError('NumPy is required to make a contact sheet.')
+
+        columns = columns or config.CONTACT_SHEET_COLUMNS
+        rows = rows or config.CONTACT_SHEET_ROWS
+        thumbnail_width = thumbnail_width or config.CONTACT_SHEET_THUMBNAIL_WIDTH
+        count = columns * rows
+
+        try:
+            duration = self.video_file.get_duration()
+            playback_resolution = self.video_file.get_playback_resolution()
+            probe = self.video_file.probe()
+        except files.VideoFileError as e:
+            raise ScreenshotsError(e)
+
+        if playback_resolution is not None:
+            (width, height) = [int(n) for n in playback_resolution.split('x')]
+        else:
+            (width, height) = (probe['width'], probe['height'])
+        if not (width and height and duration):
+            raise ScreenshotsError('Could not get the frame size and duration of the video.')
+
+        # Keep the aspect ratio, with an even height
+        thumbnail_height = max(int(round(thumbnail_width * height / width / 2)) * 2, 2)
+
+        # Take a frame from the middle of each of 'count' equal sections of the video
+        step = duration / count
+        select = 'gte(t,{start:.3f}+selected_n*{step:.3f})'.format(start=step / 2, step=step)
+
+        command = '"{ffmpeg}" -loglevel error -skip_frame nokey -i "{input_file}"'.format(
+            ffmpeg=config.FFMPEG_PATH,
+            input_file=self.video_file.input_url,
+        )
+        command += ' -map 0:v:0 -vf "select=\'{select}\',scale={width}:{height}" -vsync vfr'.format(
+            select=select,
+            width=thumbnail_width,
+            height=thumbnail_height,
+        )
+        command += ' -frames:v {count} -f rawvideo -pix_fmt rgb24 -'.format(count=count)
+
+        msg = 'Making a {columns}x{rows} contact sheet...'
+        logging.info(msg.format(columns=columns, rows=rows))
+
+        thumbnails = list(read_raw_frames(command, thumbnail_width, thumbnail_height, count))
+        if not thumbnails:
+            raise ScreenshotsError('Could not read any frames for the contact sheet.')
+
+        sheet = files.frames.tile(thumbnails, columns, spacing=config.CONTACT_SHEET_SPACING)
+
+        if path is None:
+            output_file = '{unique_string}_contact_sheet.png'.format(unique_string=files.utils.generate_id())
+            path = os.path.join(tempfile.gettempdir(), output_file)
+        files.png.write_png(path, sheet.tobytes(), width=sheet.shape[1], height=sheet.shape[0])
+        return path
+
+    def _set_cache_key(self, num_screenshots, timestamps=None):
+        """
+        Set the cache key for a set of screenshots, and return the playback resolution.  The key doesn't
+        need the time codes, which are always planned the same way for the same video, so a cached set
+        can be found before the keyframes are indexed and the time codes are planned.
+        """
+
+        if timestamps is None:
+            timestamps = config.SCREENSHOT_TIMESTAMPS
+
         # Get video's playback resolution, if it differs from the stored resolution
         try:
             playback_resolution = self.video_file.get_playback_resolution()
         except files.VideoFileError as e:
             raise ScreenshotsError(e)
 
-        # Get video duration in ms
-        duration = self.video_file.get_duration()
+        try:
+            self._cache_key = ['screenshots', self.video_file.identity(), timestamps, playback_resolution, num_screenshots]
+        except OSError as e:
+            raise ScreenshotsError(e)
 
-        # Do some magic to make seeking both fast and frame-accurate
-        gop_duration = self.video_file.get_gop_duration()
+        return playback_resolution
 
-        # Take twice as many shots as we'll need, so we can keep the best ones
-        num_screens_taken = num_screenshots * 2
+    def _prepare(self, num_screenshots, timestamps=None):
+        """
+        Plan a set of screenshots, and return a list of (time code, output path).
+        """
 
-        # We'll be taking a shot every 'step' seconds
-        step = duration / (num_screens_taken + 1)
+        # Build the keyframe index once, before any frames are extracted
+        try:
+            self.video_file.get_keyframes()
+        except files.VideoFileError as e:
+            raise ScreenshotsError(e)
+
+        # Screenshots will be taken at these time codes (in seconds)
+        time_codes = self.plan(num_screenshots, timestamps)
 
         # Don't want to overwrite the wrong files in /tmp, so prefix with a random string
         unique_string = files.utils.generate_id()
 
-        msg = 'Taking {n} screenshots...'
-        logging.info(msg.format(n=num_screens_taken))
+        frames = []
+        for (i, time_code) in enumerate(time_codes):
+            output_file = '{unique_string}_{index:03d}_{time_code}.png'.format(
+                unique_string=unique_string,
+                index=i,
+                time_code=time_code,
+            )
+            frames.append((time_code, os.path.join(tempfile.gettempdir(), output_file)))
+
+        return frames
+
+    def _load_from_cache(self):
+        """
+        Reuse the cached screenshots for the current cache key, if there are any.  Returns True on a hit.
 
-        for i in range(num_screens_taken):
-            # Screenshot will be taken at this time code (in seconds)
-            time_code = int(step * (i + 1))
+        Uploads are reused even if the local files are gone; the files are only needed to upload to
+        an image host that the screenshots haven't been uploaded to yet.
+        """
 
-            # Overwrite files
-            command = '"{ffmpeg}" -y'.format(ffmpeg=config.FFMPEG_PATH)
+        entry = SCREENSHOT_CACHE.get(self._cache_key)
+        if entry is None:
+            return False
 
-            # Fast seek to some point before the time code
-            if time_code > gop_duration:
-                command += ' -ss {seconds}'.format(seconds=(time_code - gop_duration))
+        paths = entry.get('files', [])
+        uploads = entry.get('uploads', dict())
+        files_exist = bool(paths) and all(os.path.isfile(path) for path in paths)
+        if not (files_exist or uploads):
+            return False
 
-            # Video file
-            command += ' -i "{input_file}"'.format(input_file=self.video_file.path)
+        self.files = paths if files_exist else []
+        self._cached_uploads = uploads
+
+        msg = 'Reusing {n} cached screenshot(s){uploaded}'
+        logging.info(msg.format(
+            n=len(paths),
+            uploaded=' (uploaded to {hosts})'.format(hosts=', '.join(sorted(uploads))) if uploads else '',
+        ))
+        return True
+
+    def _save_to_cache(self):
+        if self._cache_key is None:
+            return
+        SCREENSHOT_CACHE.set(self._cache_key, {'files': self.files, 'uploads': self._cached_uploads})
+
+    def plan(self, num_screenshots, timestamps=None, candidates=2):
+        """
+        Return the time codes (in whole seconds) to take candidate screenshots at.
+
+        When the time codes are spread evenly, there are 'candidates' time codes per screenshot.
+        """
 
-            # Accurate seek to the time code
-            if time_code > gop_duration:
-                command += ' -ss {seconds}'.format(seconds=gop_duration)
+        if timestamps is None:
+            timestamps = config.SCREENSHOT_TIMESTAMPS
+
+        if timestamps == 'bitrate':
+            if files.frames.numpy is None:
+                logging.warning('NumPy is not installed; spreading screenshots evenly instead.')
             else:
-                command += ' -ss {seconds}'.format(seconds=time_code)
+                try:
+                    profile = self.video_file.get_bitrate_profile()
+                except files.VideoFileError as e:
+                    raise ScreenshotsError(e)
+                time_codes = files.frames.select_peaks(profile, num_screenshots)
+                if time_codes:
+                    msg = 'Taking screenshots in the highest-bitrate sections: {time_codes}'
+                    logging.debug(msg.format(time_codes=time_codes))
+                    return time_codes
+                logging.warning('Could not get a bitrate profile; spreading screenshots evenly instead.')
+
+        elif timestamps != 'even':
+            msg = 'Unknown screenshot timestamp strategy: {strategy}'
+            raise ScreenshotsError(msg.format(strategy=timestamps))
+
+        # Get video duration in seconds
+        try:
+            duration = self.video_file.get_duration()
+        except files.VideoFileError as e:
+            raise ScreenshotsError(e)
+
+        # Take more shots than we'll need (twice as many, by default), so we can keep the best ones
+        num_screens_taken = num_screenshots * candidates
+
+        # We'll be taking a shot every 'step' seconds
+        step = duration / (num_screens_taken + 1)
+
+        return [int(step * (i + 1)) for i in range(num_screens_taken)]
+
+    def _take_in_memory(self, frames, num_screenshots, playback_resolution=None):
+        """
+        Decode the candidate frames into memory, and save the num_screenshots most detailed ones as PNG files.
+
+        Returns the paths of the saved files, in time code order.
+        """
+
+        raw_frames = list(self._iter_frames([time_code for (time_code, path) in frames], playback_resolution))
+
+        msg = 'Selecting the best {n} screenshots...'
+        logging.info(msg.format(n=num_screenshots))
+
+        # Rank by detail, and reject near-duplicates of better frames (e.g. from long static scenes)
+        gray = files.frames.to_grayscale(raw_frames)
+        scores = files.frames.laplacian_variance(gray)
+        hashes = files.frames.difference_hashes(gray)
+        selected = sorted(files.frames.select_distinct(scores, hashes, num_screenshots))
+        if len(selected) < num_screenshots:
+            msg = 'Only {n} of the candidate frames are distinct; saving {n} screenshots instead of {wanted}'
+            logging.warning(msg.format(n=len(selected), wanted=num_screenshots))
+
+        for index in selected:
+            (time_code, path) = frames[index]
+            frame = raw_frames[index]
+            msg = 'Saving screenshot at {time_code}s (detail score {score:.1f})'
+            logging.debug(msg.format(time_code=time_code, score=scores[index]))
+            files.png.write_png(path, frame.tobytes(), width=frame.shape[1], height=frame.shape[0])
+
+        return [frames[index][1] for index in selected]
+
+    def _iter_frames(self, time_codes, playback_resolution=None):
+        """
+        Decode one frame per time code with a single ffmpeg process, and yield them as RGB arrays as
+        soon as each one arrives.
+
+        The frames are trimmed out of each seeked input inside the filter graph, concatenated, and
+        piped to us as raw video, so nothing is written to disk.
+        """
+
+        try:
+            seek_points = [self.video_file.get_seek_point(time_code) for time_code in time_codes]
+            probe = self.video_file.probe()
+        except files.VideoFileError as e:
+            raise ScreenshotsError(e)
+
+        if playback_resolution is not None:
+            (width, height) = [int(n) for n in playback_resolution.split('x')]
+        else:
+            (width, height) = (probe['width'], probe['height'])
+        if not (width and height):
+            raise ScreenshotsError('Could not get the frame size of the video.')
+
+        command = '"{ffmpeg}" -loglevel error'.format(ffmpeg=config.FFMPEG_PATH)
+
+        for seek_point in seek_points:
+
+            # Fast seek to the keyframe before the time code
+            if seek_point > 0:
+                command += ' -ss {seconds:.3f}'.format(seconds=seek_point)
+
+            # Video file
+            command += ' -i "{input_file}"'.format(input_file=self.video_file.input_url)
+
+        # Accurate seek from the keyframe to the time code, and keep one frame from there
+        filters = []
+        for (index, time_code) in enumerate(time_codes):
+            filters.append(
+                '[{index}:v:0]trim=start={seconds:.3f},setpts=PTS-STARTPTS,trim=end_frame=1[f{index}]'.format(
+                    index=index,
+                    seconds=max(time_code - seek_points[index], 0),
+                )
+            )
+        graph = ';'.join(filters) + ';' + ''.join('[f{index}]'.format(index=i) for i in range(len(time_codes)))
+        graph += 'concat=n={n}:v=1:a=0,scale={width}:{height}[out]'.format(n=len(time_codes), width=width, height=height)
+
+        command += ' -filter_complex "{graph}" -map "[out]" -f rawvideo -pix_fmt rgb24 -'.format(graph=graph)
+
+        count = 0
+        for frame in read_raw_frames(command, width, height, len(time_codes)):
+            count += 1
+            yield frame
+
+        if count != len(time_codes):
+            msg = 'Expected {expected} frames from ffmpeg, got {actual}'
+            raise ScreenshotsError(msg.format(expected=len(time_codes), actual=count))
+
+    def _extract_frames(self, frames, playback_resolution=None):
+        """
+        Save one PNG per (time_code, path) pair, using a single ffmpeg process.
+
+        Each time code gets its own input, fast-seeked to the keyframe before it, and its own output,
+        which decodes accurately up to the time code.  Each input still opens its own demuxer and
+        decoder; only the process launch (and ffmpeg's own start-up) is shared.
+        """
+
+        # Do some magic to make seeking both fast and frame-accurate
+        try:
+            seek_points = [self.video_file.get_seek_point(time_code) for (time_code, path) in frames]
+        except files.VideoFileError as e:
+            raise ScreenshotsError(e)
+
+        # Overwrite files
+        command = '"{ffmpeg}" -y'.format(ffmpeg=config.FFMPEG_PATH)
+
+        for seek_point in seek_points:
+
+            # Fast seek to the keyframe before the time code
+            if seek_point > 0:
+                command += ' -ss {seconds:.3f}'.format(seconds=seek_point)
+
+            # Video file
+            command += ' -i "{input_file}"'.format(input_file=self.video_file.input_url)
+
+        for (index, (time_code, path)) in enumerate(frames):
 
-            # Set output path
-            output_file = '{unique_string}_{time_code}.png'.format(unique_string=unique_string, time_code=time_code)
-            tmp = tempfile.gettempdir()
-            path = os.path.join(tmp, output_file)
+            # Take the video stream of this frame's input
+            command += ' -map {index}:v:0'.format(index=index)
+
+            # Accurate seek from the keyframe to the time code
+            command += ' -ss {seconds:.3f}'.format(seconds=max(time_code - seek_points[index], 0))
 
             # Set the output resolution for videos that get stretched during playback
             if playback_resolution is not None:
                 command += ' -s {resolution}'.format(resolution=playback_resolution)
 
             # Take one frame, and save it to the output path
-            command += ' -vframes 1 {output_file}'.format(output_file=path)
+            command += ' -vframes 1 "{output_file}"'.format(output_file=path)
 
-            logging.debug(command)
-            try:
-                subprocess.check_output(command, stderr=subprocess.STDOUT, shell=True)
-            except subprocess.CalledProcessError as e:
-                msg = 'Error while taking screenshots: {error_string}'
-                raise ScreenshotsError(msg.format(error_string=e.output.decode(encoding='utf-8')))
+        logging.debug(command)
+        try:
+            subprocess.check_output(command, stderr=subprocess.STDOUT, shell=True)
+        except subprocess.CalledProcessError as e:
+            msg = 'Error while taking screenshots: {error_string}'
+            raise ScreenshotsError(msg.format(error_string=e.output.decode(encoding='utf-8')))
 
-            self.files.append(path)
+    def _extract_frames_in_parallel(self, frames, playback_resolution=None, workers=None):
+        """
+        Run one ffmpeg process per frame on a bounded pool of threads.
 
-        assert len(self.files) == num_screens_taken
-        assert self.verify()
+        Every frame is attempted, even if some of them fail.  If any do, the frames that were
+        saved are deleted, and a ScreenshotsError listing every failure is raised.
+        """
 
-        msg = 'Selecting the best {n} screenshots...'
-        logging.info(msg.format(n=num_screenshots))
+        workers = count_workers(workers, len(frames))
 
-        # Sort the screenshots by file size (a decent approximation of the amount of detail they contain)
-        sized_screens = sorted([(os.path.getsize(path), path) for path in self.files])
+        msg = 'Running {workers} ffmpeg process(es) at a time'
+        logging.debug(msg.format(workers=workers))
 
-        # Delete the smaller half of the set
-        for (size, path) in sized_screens[:num_screenshots]:
-            os.unlink(path)
+        def extract_frame(frame):
+            try:
+                self._extract_frames([frame], playback_resolution)
+            except ScreenshotsError as e:
+                return frame, '{error}'.format(error=e)
+            return frame, None
 
-        # Keep the rest
-        self.files = [path for (size, path) in sized_screens[num_screenshots:]]
+        pool = ThreadPool(workers)
+        try:
+            results = pool.map(files.inherit_log_buffer(extract_frame), frames)
+        finally:
+            pool.close()
+            pool.join()
+
+        errors = [(time_code, error) for ((time_code, path), error) in results if error is not None]
+        if errors:
+            for (time_code, path) in frames:
+                if os.path.isfile(path):
+                    os.unlink(path)
+            msg = '{failed} of {total} screenshots failed:\n{errors}'
+            raise ScreenshotsError(
+                msg.format(
+                    failed=len(errors),
+                    total=len(frames),
+                    errors='\n'.join('{time_code}s: {error}'.format(time_code=t, error=e) for (t, e) in errors),
+                ),
+                errors=errors,
+            )
+
+    def optimize(self, workers=None):
+        """
+        Losslessly recompress the local screenshot files in parallel, to cut down the upload time.
+
+        Returns the number of bytes saved.
+        """
 
-    def upload(self, image_host=image_hosts.ImageBam, delete_after_upload=True):
+        if not self.files:
+            return 0
+
+        workers = count_workers(workers, len(self.files))
+
+        msg = 'Optimizing {n} screenshots...'
+        logging.info(msg.format(n=len(self.files)))
+        start_time = time.time()
+
+        def optimize_file(path):
+            try:
+                return files.png.optimize_png(path, compression_level=config.PNG_COMPRESSION_LEVEL)
+            except (files.PNGError, IOError, OSError) as e:
+                msg = 'Could not optimize "{path}": {error}'
+                logging.warning(msg.format(path=path, error=e))
+                size = os.path.getsize(path)
+                return size, size
+
+        pool = ThreadPool(workers)
+        try:
+            sizes = pool.map(files.inherit_log_buffer(optimize_file), self.files)
+        finally:
+            pool.close()
+            pool.join()
+
+        old_size = sum(old for (old, new) in sizes)
+        new_size = sum(new for (old, new) in sizes)
+        saved = old_size - new_size
+
+        msg = 'Saved {saved:.2f} MiB of {total:.2f} MiB ({percent:.1f}%) in {seconds:.1f} seconds'
+        logging.info(msg.format(
+            saved=saved / 1048576,
+            total=old_size / 1048576,
+            percent=(100 * saved / old_size) if old_size else 0,
+            seconds=time.time() - start_time,
+        ))
+
+        return saved
+
+    def upload(self, image_host=image_hosts.ImageBam, delete_after_upload=True, optimize=None):
         """
         Upload local screenshot files to an image host.
+
+        image_host is either an image host class, or an instance to share one session between several
+        sets of screenshots.
         """
 
+        # These screenshots might already be on this image host
+        image_host_name = image_host.__name__ if isinstance(image_host, type) else type(image_host).__name__
+        cached_upload = self._cached_uploads.get(image_host_name)
+        if cached_upload is not None:
+            msg = 'Using screenshots already uploaded to {host}'
+            logging.info(msg.format(host=image_host_name))
+            self.links = list(cached_upload['links'])
+            self.bbcode_links = list(cached_upload.get('bbcode_links', []))
+            self.bbcode = cached_upload['bbcode']
+            self.uploaded = True
+            for link in self.links:
+                logging.info(link)
+            if delete_after_upload:
+                self.delete()
+            return
+
+        # The files of cached screenshots might have been deleted after they went to another host
+        if not self.files and self._take_arguments is not None:
+            (num_screenshots, single_process, workers, score_in_memory, timestamps) = self._take_arguments
+            self.take(num_screenshots, single_process, workers, score_in_memory, timestamps, use_cache=False)
+
         # Check to make sure the files we expect to exist actually do exist
         if not self.verify():
             raise ScreenshotsError('Could not upload screenshots; the files do not exist!')
@@ -147,33 +799,142 @@ class Screenshots(object):
             logging.warning('There are no screenshots to upload!')
             return
 
-        # Upload
-        assert issubclass(image_host, image_hosts.BaseImageHost)
-        image_host = image_host()
+        # Smaller files upload faster
+        if optimize is None:
+            optimize = config.OPTIMIZE_SCREENSHOTS
+        if optimize:
+            self.optimize()
+
+        # Upload.  A host instance may be shared with other threads, so its link lists can't be trusted
+        # after a batch upload; upload the files one by one instead, keeping the links that come back.
+        shared = not isinstance(image_host, type)
+        (image_host, image_host_name) = get_image_host(image_host)
         try:
-            self.uploaded = image_host.upload(self.files)
+            if shared:
+                uploads = [image_host.upload_image(path, number) for (number, path) in enumerate(self.files, 1)]
+                self.uploaded = True
+            else:
+                self.uploaded = image_host.upload(self.files)
+                uploads = list(zip(image_host.urls, image_host.bbcode_links))
         except image_hosts.ImageHostError as e:
             raise ScreenshotsError(e)
 
         # If the upload was successful, get links and bbcode, then delete the local files
         if self.uploaded is True:
 
-            assert image_host.urls
-            assert image_host.bbcode_links
+            assert uploads
 
-            # Get image URLs
-            for link in image_host.urls:
+            self.links = []
+            self.bbcode_links = []
+            self.bbcode = ''
+
+            for (link, bbcode_link) in uploads:
                 logging.info(link)
                 self.links.append(link)
-
-            # Get BBCode
-            for bbcode_link in image_host.bbcode_links:
+                self.bbcode_links.append(bbcode_link)
                 self.bbcode += bbcode_link
 
+            # Remember the upload, so a retry doesn't have to do it again
+            self._cached_uploads[image_host_name] = {
+                'links': list(self.links),
+                'bbcode_links': list(self.bbcode_links),
+                'bbcode': self.bbcode,
+            }
+            self._save_to_cache()
+
             # Delete local files
             if delete_after_upload:
                 self.delete()
 
 
+def read_raw_frames(command, width, height, max_frames=None):
+    """
+    Run an ffmpeg command that writes rgb24 video to stdout, and yield each frame as soon as it arrives.
+
+    Once max_frames have been read, ffmpeg is stopped.  Error output goes to a temporary file, so it
+    can't fill up a pipe and stall the process.
+    """
+    logging.debug(command)
+    frame_size = width * height * 3
+    count = 0
+    with tempfile.TemporaryFile() as error_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=error_file, shell=True)
+        try:
+            while max_frames is None or count < max_frames:
+                data = process.stdout.read(frame_size)
+                if len(data) < frame_size:
+                    break
+                count += 1
+                yield files.frames.split_frames(data, width, height)[0]
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+        # Killing ffmpeg after the last frame we wanted isn't an error
+        if process.returncode != 0 and (max_frames is None or count < max_frames):
+            error_file.seek(0)
+            msg = 'Error while taking screenshots: {error_string}'
+            raise ScreenshotsError(msg.format(error_string=error_file.read().decode(encoding='utf-8')))
+
+
+def get_image_host(image_host):
+    """
+    Return an image host instance and the name of its class, from either an image host class (which is
+    instantiated) or an instance that is shared between several sets of screenshots.
+    """
+    if not isinstance(image_host, type):
+        assert isinstance(image_host, image_hosts.BaseImageHost)
+        return image_host, type(image_host).__name__
+
+    assert issubclass(image_host, image_hosts.BaseImageHost)
+    try:
+        return image_host(), image_host.__name__
+    except image_hosts.ImageHostError as e:
+        raise ScreenshotsError(e)
+
+
+def count_workers(workers, jobs):
+    """
+    Return how many threads to use for a number of jobs: the given number of workers, or
+    config.SCREENSHOT_WORKERS, or the number of CPUs, but no more than there are jobs.
+    """
+    if workers is None:
+        workers = config.SCREENSHOT_WORKERS
+    if workers is None:
+        try:
+            workers = multiprocessing.cpu_count()
+        except NotImplementedError:
+            workers = 1
+    return max(1, min(workers, jobs))
+
+
+def delete_cached_files(entry):
+    """
+    Delete the files of a screenshot cache entry that expired or was evicted.  Its uploads stay where
+    they are.
+    """
+    for path in entry.get('files', []):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+# Screenshots taken and uploaded, by video file identity, timestamp strategy, and resolution
+SCREENSHOT_CACHE = metadata.DiskCache(
+    'screenshots',
+    ttl=config.SCREENSHOT_CACHE_TTL,
+    max_entries=config.SCREENSHOT_CACHE_SIZE,
+    on_evict=delete_cached_files,
+)
+
+
 class ScreenshotsError(Exception):
-    pass
\ No newline at end of file
+
+    def __init__(self, message='', errors=None):
+        super(ScreenshotsError, self).__init__(message)
+
+        # (time code, error message) for each frame that could not be extracted
+        self.errors = errors if errors is not None else []
@@ -30,6 +30,11 @@ class Torrent(object):
         if release.size == 0:
             raise TorrentError('Cannot make torrent; release size is zero bytes!')
 
+        # The torrent can only list files that exist, or the client would have nothing to seed
+        if getattr(release, 'rar_member', None) is not None:
+            msg = 'Cannot make torrent; "{name}" has to be extracted from the RAR archive first.'
+            raise TorrentError(msg.format(name=release.rar_member.name))
+
         self.piece_size = self._select_piece_size(self.release.size)
         self.announce_url = self.tracker.announce_url
         self.extension_whitelist = self.tracker.FILE_EXTENSION_WHITELIST
@@ -49,6 +54,7 @@ class Torrent(object):
         # Create and write the torrent file
         metainfo = self._create_metainfo_dict()
         bencoded_metainfo = files.bencode(metainfo)
+        self.info_hash = hashlib.sha1(files.bencode(metainfo['info'])).hexdigest()
         with io.open(self.path, mode='wb') as f:
             f.write(bencoded_metainfo)
 
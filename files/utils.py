@@ -3,10 +3,20 @@ import os
 import sys
 import string
 import random
+import shutil
 import hashlib
 import logging
+import functools
+import atexit
+import threading
 import subprocess
 from io import StringIO
+from multiprocessing.pool import ThreadPool
+
+if sys.version_info[0] < 3:
+    import Queue as queue
+else:
+    import queue
 
 import config
 
@@ -26,12 +36,168 @@ def get_paths(args):
     Returns expanded, absolute paths for all valid paths in a list of arguments.
     """
     assert isinstance(args, list)
-    valid_paths = []
-    for path in args:
-        abs_path = valid_path(path)
-        if abs_path is not None:
-            valid_paths.append(abs_path)
-    return valid_paths
+    return list(iter_paths(args))
+
+
+def iter_paths(args, max_threads=16):
+    """
+    Yields expanded, absolute paths for all valid paths in a list of arguments, in order.
+
+    The paths are checked on a thread pool, so slow network mounts don't hold up the first results.
+    """
+    if len(args) < 2:
+        for path in args:
+            abs_path = valid_path(path)
+            if abs_path is not None:
+                yield abs_path
+        return
+
+    pool = ThreadPool(min(max_threads, len(args)))
+    try:
+        for abs_path in pool.imap(valid_path, args):
+            if abs_path is not None:
+                yield abs_path
+    finally:
+        pool.close()
+        pool.join()
+
+
+def scan_tree(root_path, max_threads=8, onerror=None):
+    """
+    Walk a directory tree, listing directories concurrently on a thread pool.
+
+    Yields (dir_path, dir_names, file_entries) for each directory as soon as it has been listed, where
+    file_entries is a list of (file_name, size, mtime) tuples.  Every entry of a directory is stat'ed
+    by the same worker, in one batch.  Directories are yielded in no particular order, and symbolic
+    links to directories are not followed (like os.walk).  If onerror is given, it is called with the
+    OSError for any directory that cannot be listed.
+
+    The top directory is listed in this thread, so a tree without subdirectories (like most releases)
+    never touches the pool, which is shared by every scan with the same number of threads.
+    """
+
+    try:
+        (dir_names, file_entries) = _list_directory(root_path)
+    except OSError as e:
+        if onerror is not None:
+            onerror(e)
+        return
+    subdir_paths = [
+        os.path.join(root_path, dir_name) for dir_name in dir_names
+        if not os.path.islink(os.path.join(root_path, dir_name))
+    ]
+
+    if not subdir_paths:
+        yield root_path, dir_names, file_entries
+        return
+
+    results = queue.Queue()
+    lock = threading.Lock()
+    outstanding = [len(subdir_paths)]
+    cancelled = [False]
+    finished = object()
+
+    def list_directory(dir_path):
+        try:
+            # The caller stopped early, so don't list the rest of the tree
+            if cancelled[0]:
+                return
+            try:
+                dir_names, file_entries = _list_directory(dir_path)
+            except OSError as e:
+                results.put(e)
+            else:
+                with lock:
+                    outstanding[0] += len(dir_names)
+                for dir_name in dir_names:
+                    subdir_path = os.path.join(dir_path, dir_name)
+                    if not os.path.islink(subdir_path):
+                        pool.apply_async(list_directory, (subdir_path,))
+                    else:
+                        with lock:
+                            outstanding[0] -= 1
+                results.put((dir_path, dir_names, file_entries))
+        finally:
+            with lock:
+                outstanding[0] -= 1
+                if outstanding[0] == 0:
+                    results.put(finished)
+
+    pool = _get_scan_pool(max_threads)
+    try:
+        for subdir_path in subdir_paths:
+            pool.apply_async(list_directory, (subdir_path,))
+        yield root_path, dir_names, file_entries
+        while True:
+            result = results.get()
+            if result is finished:
+                break
+            if isinstance(result, OSError):
+                if onerror is not None:
+                    onerror(result)
+                continue
+            yield result
+    finally:
+        cancelled[0] = True
+
+
+def _get_scan_pool(max_threads):
+    """
+    Return the thread pool that scan_tree() uses for this number of threads, starting it the first time.
+    """
+    with _scan_pools_lock:
+        if max_threads not in _scan_pools:
+            _scan_pools[max_threads] = ThreadPool(max_threads)
+        return _scan_pools[max_threads]
+
+
+@atexit.register
+def _stop_scan_pools():
+    with _scan_pools_lock:
+        for pool in _scan_pools.values():
+            pool.terminate()
+        _scan_pools.clear()
+
+
+def _list_directory(dir_path):
+    """
+    List a directory, and stat all of its entries.  Returns (dir_names, file_entries).
+    """
+    dir_names = []
+    file_entries = []
+
+    scandir = getattr(os, 'scandir', None)
+    if scandir is not None:
+        entries = scandir(dir_path)
+        try:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        dir_names.append(entry.name)
+                    else:
+                        stat_result = entry.stat()
+                        file_entries.append((entry.name, stat_result.st_size, stat_result.st_mtime))
+                except OSError:
+                    continue
+        finally:
+            # The iterator holds the directory open until it is closed (Python 3.6 and later)
+            close = getattr(entries, 'close', None)
+            if close is not None:
+                close()
+
+    else:
+        for name in os.listdir(dir_path):
+            path = os.path.join(dir_path, name)
+            try:
+                if os.path.isdir(path):
+                    dir_names.append(name)
+                else:
+                    stat_result = os.stat(path)
+                    file_entries.append((name, stat_result.st_size, stat_result.st_mtime))
+            except OSError:
+                continue
+
+    return dir_names, file_entries
 
 
 def split_path(path):
@@ -93,7 +259,7 @@ def list_contents(rar_file_path):
     return contents
 
 
-def unrar(rar_file_path, destination_dir=None):
+def unrar(rar_file_path, destination_dir=None, overwrite=True):
     """
     Get a list of the archive's contents, then extract the archive and return the list.
     """
@@ -108,8 +274,13 @@ def unrar(rar_file_path, destination_dir=None):
     extracted_files = []
 
     # Extract the archive
-    command = '"{unrar}" x -o+ -- "{file}" "{destination}"'
-    command = command.format(unrar=config.UNRAR_PATH, file=rar_file_path, destination=destination_dir)
+    command = '"{unrar}" x {overwrite} -- "{file}" "{destination}"'
+    command = command.format(
+        unrar=config.UNRAR_PATH,
+        overwrite='-o+' if overwrite else '-o-',
+        file=rar_file_path,
+        destination=destination_dir,
+    )
     logging.debug(command)
 
     try:
@@ -125,7 +296,7 @@ def unrar(rar_file_path, destination_dir=None):
 
         # Recursively extract until there are no RAR files left
         if path.endswith('.rar'):
-            extracted_files += unrar(path)
+            extracted_files += unrar(path, overwrite=overwrite)
         else:
             extracted_files.append(path)
 
@@ -133,6 +304,59 @@ def unrar(rar_file_path, destination_dir=None):
     return extracted_files
 
 
+def link_or_copy(source_path, destination_path):
+    """
+    Make the file at source_path appear at destination_path without duplicating its data, if possible.
+
+    Tries a hardlink first, then a reflink (copy-on-write clone), and finally falls back to a regular copy.
+    Returns the method that was used: 'hardlink', 'reflink', or 'copy'.
+    """
+
+    try:
+        os.link(source_path, destination_path)
+        return 'hardlink'
+    except (OSError, AttributeError):
+        pass
+
+    if reflink(source_path, destination_path):
+        return 'reflink'
+
+    try:
+        shutil.copy2(source_path, destination_path)
+    except (IOError, OSError) as e:
+        msg = 'Could not copy "{source}" to "{destination}": {error}'
+        raise FileUtilsError(msg.format(source=source_path, destination=destination_path, error=e))
+    return 'copy'
+
+
+def reflink(source_path, destination_path):
+    """
+    Clone a file with the FICLONE ioctl (Btrfs, XFS, and friends).  Returns True on success.
+    """
+
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    # FICLONE = _IOW(0x94, 9, int)
+    ficlone = 0x40049409
+
+    try:
+        with open(source_path, 'rb') as source:
+            with open(destination_path, 'wb') as destination:
+                fcntl.ioctl(destination.fileno(), ficlone, source.fileno())
+    except (IOError, OSError):
+        try:
+            os.unlink(destination_path)
+        except OSError:
+            pass
+        return False
+
+    shutil.copystat(source_path, destination_path)
+    return True
+
+
 def sha1(data):
     """
     Return the SHA-1 hash of the given data.
@@ -181,5 +405,100 @@ def set_log_file_name(file_name):
     logging.debug('System platform: {platform}'.format(platform=sys.platform))
 
 
+class LogBuffer(logging.Filter):
+    """
+    Holds back the log records of threads that have called begin(), so that each thread's output can be
+    written out in one piece by end(), instead of interleaving with the output of other threads.  Work
+    that such a thread hands to other threads (wrapped by inherit_log_buffer()) is held back with it.
+
+    The buffer is installed as a filter on every handler of the root logger.
+    """
+
+    def __init__(self):
+        super(LogBuffer, self).__init__()
+        self.buffers = dict()
+        self.lock = threading.Lock()
+        for handler in logging.getLogger('').handlers:
+            handler.addFilter(self)
+
+    def filter(self, record):
+        records = self.buffers.get(_log_owners.get(record.thread, record.thread))
+        if records is None:
+            return True
+
+        # Every handler sees the same record, but it only needs to be kept once
+        if getattr(record, 'log_buffer', None) is not self:
+            record.log_buffer = self
+            records.append(record)
+        return False
+
+    def begin(self):
+        """
+        Start holding back the log records of the current thread.
+        """
+        self.buffers[threading.current_thread().ident] = []
+
+    def end(self):
+        """
+        Write out the log records held back for the current thread, all together.
+        """
+        current = threading.current_thread().ident
+        records = self.buffers.pop(current, [])
+
+        # Thread idents are reused, so forget the threads that worked for this one
+        for (ident, owner) in list(_log_owners.items()):
+            if owner == current:
+                _log_owners.pop(ident, None)
+
+        # The records have already been through the filters; emitting them directly keeps them from
+        # being held back again
+        handlers = logging.getLogger('').handlers
+        with self.lock:
+            for record in records:
+                for handler in handlers:
+                    if record.levelno >= handler.level:
+                        handler.acquire()
+                        try:
+                            handler.emit(record)
+                        finally:
+                            handler.release()
+
+    def remove(self):
+        for handler in logging.getLogger('').handlers:
+            handler.removeFilter(self)
+
+
+def inherit_log_buffer(function):
+    """
+    Wrap a function that will run on another thread (such as a thread pool's worker), so that its log
+    records are held back by a LogBuffer together with those of the thread that wrapped it.
+    """
+    current = threading.current_thread().ident
+    owner = _log_owners.get(current, current)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        ident = threading.current_thread().ident
+        previous = _log_owners.get(ident)
+        _log_owners[ident] = owner
+        try:
+            return function(*args, **kwargs)
+        finally:
+            if previous is None:
+                _log_owners.pop(ident, None)
+            else:
+                _log_owners[ident] = previous
+
+    return wrapper
+
+
 class FileUtilsError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+# Thread pools shared by every scan_tree(), by number of threads
+_scan_pools = dict()
+_scan_pools_lock = threading.Lock()
+
+# The threads doing work for another thread (see inherit_log_buffer), and the thread they work for
+_log_owners = dict()
\ No newline at end of file
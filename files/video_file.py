@@ -1,10 +1,18 @@
 from __future__ import print_function, unicode_literals, division, absolute_import
 import os
 import re
+import io
+import json
+import math
+import bisect
 import logging
+import tempfile
 import subprocess
 
 import config
+from metadata import DiskCache, file_identity, Mediainfo, MediainfoError, libmediainfo
+from .rar import RarArchive, RarError, NEW_VOLUME_REGEX, OLD_VOLUME_REGEX
+from .matroska import read_cues, is_matroska, MatroskaError
 
 
 class VideoFile(object):
@@ -18,12 +26,38 @@ class VideoFile(object):
     def __init__(self, path):
 
         path = os.path.expanduser(path)
+        file_name = os.path.basename(path)
         file_extension = os.path.splitext(path)[1]
-        if (not os.path.isfile(path)) or (file_extension not in self.VALID_EXTENSIONS):
+
+        # The stored (uncompressed) video file inside a RAR archive can be read without extracting it
+        self.rar_member = None
+        if os.path.isfile(path) and (
+            file_extension.lower() == '.rar' or NEW_VOLUME_REGEX.match(file_name) or OLD_VOLUME_REGEX.match(file_name)
+        ):
+            try:
+                self.rar_member = RarArchive(path).find_member(extensions=self.VALID_EXTENSIONS)
+            except RarError as e:
+                raise VideoFileError(e)
+            if self.rar_member is None:
+                msg = '{path} does not contain a stored (uncompressed) video file.'
+                raise VideoFileError(msg.format(path=path))
+            self.path = self.rar_member.path
+            self.input_url = self.rar_member.ffmpeg_url()
+            msg = 'Reading video file from RAR archive: {name}'
+            logging.debug(msg.format(name=self.rar_member.name))
+
+        elif (not os.path.isfile(path)) or (file_extension not in self.VALID_EXTENSIONS):
             raise VideoFileError('{path} is not a valid video file.'.format(path=path))
 
-        self.path = os.path.abspath(path)
+        else:
+            self.path = os.path.abspath(path)
+            self.input_url = self.path
+
         self.screenshots = []
+        self._probe = None
+        self._keyframes = None
+        self._bitrate_profile = None
+        self._packet_scan = None
 
     def __repr__(self):
         return self.path
@@ -37,22 +71,195 @@ class VideoFile(object):
     def delete_screenshots(self):
         pass
 
-    def get_duration(self):
+    def probe(self):
         """
-        Get video duration in seconds.
+        Describe the video file with a single structured probe, and return a dictionary with the keys:
+             - duration: duration in seconds
+             - fps:      frame rate of the video stream
+             - width:    stored width of the video stream
+             - height:   stored height of the video stream
+             - sar:      sample (pixel) aspect ratio, as a float
+             - dar:      display aspect ratio, as a float
+             - keyint:   maximum keyframe interval in frames, from the x264 settings
+             - streams:  a list of dictionaries with 'type', 'format', and 'language' for every stream
+
+        Values that could not be found are None.  The result is memoized on this object, and cached on
+        disk until the file changes.
+        """
+
+        if self._probe is not None:
+            return self._probe
+
+        try:
+            key = self.identity()
+        except OSError as e:
+            raise VideoFileError(e)
+
+        probe = PROBE_CACHE.get(key)
+        if probe is None:
+
+            # The mediainfo command can only read real files, so RAR archive members are read by
+            # libmediainfo (from the volumes) if it is installed, or else by ffprobe
+            try:
+                probe = self._probe_with_mediainfo()
+            except VideoFileError as e:
+                msg = 'Probing "{path}" with ffprobe instead: {error}'
+                logging.info(msg.format(path=self.path, error=e))
+                probe = self._probe_with_ffprobe()
+
+            PROBE_CACHE.set(key, probe)
+
+        else:
+            msg = 'Using cached probe of "{path}"'
+            logging.debug(msg.format(path=self.path))
+
+        self._probe = probe
+        return probe
+
+    def identity(self):
+        """
+        A cache key that changes whenever the video file (or any RAR volume it is stored in) changes.
+        """
+        if self.rar_member is not None:
+            volumes = []
+            for (volume_path, offset, length) in self.rar_member.segments:
+                if volume_path not in volumes:
+                    volumes.append(volume_path)
+            return ['rar', self.rar_member.name] + [file_identity(volume_path) for volume_path in volumes]
+        return ['file'] + file_identity(self.path)
+
+    def _probe_with_mediainfo(self):
+        """
+        Probe the file with metadata.Mediainfo, which shares its cached output with uploads.
         """
 
-        command = '"{mediainfo}" "--Inform=Video;%Duration%" "{file}"'
-        command = command.format(mediainfo=config.MEDIAINFO_PATH, file=self.path)
+        try:
+            if self.rar_member is None:
+                tracks = Mediainfo(path=self.path).tracks
+            elif config.MEDIAINFO_BACKEND != 'cli' and libmediainfo.is_available():
+                f = self.rar_member.open()
+                try:
+                    tracks = Mediainfo.from_file_object(f, self.rar_member.size, self.rar_member.name).tracks
+                finally:
+                    f.close()
+            else:
+                raise MediainfoError('libmediainfo is needed to read files inside RAR archives.')
+        except (MediainfoError, RarError) as e:
+            msg = 'Could not probe file with mediainfo: {error}'
+            raise VideoFileError(msg.format(error=e))
+
+        probe = {
+            'duration': None,
+            'fps': None,
+            'width': None,
+            'height': None,
+            'sar': None,
+            'dar': None,
+            'keyint': None,
+            'streams': [],
+        }
+
+        for track in tracks:
+            track_type = track.type
+
+            if track_type == 'General':
+                probe['duration'] = track.duration
+                continue
+
+            probe['streams'].append({
+                'type': track_type.lower() if track_type else None,
+                'format': track.get('Format'),
+                'language': track.get('Language'),
+            })
+
+            # Only the first video stream matters
+            if track_type != 'Video' or probe['width'] is not None:
+                continue
+
+            if track.duration is not None:
+                probe['duration'] = track.duration
+            probe['fps'] = track.frame_rate
+            probe['width'] = track.width
+            probe['height'] = track.height
+            probe['sar'] = track.pixel_aspect_ratio
+            probe['dar'] = track.display_aspect_ratio
+
+            probe['keyint'] = to_number(track.encoding_settings.get('keyint'), int)
+
+        if probe['duration'] is None:
+            msg = 'Could not get duration from mediainfo for "{path}"'
+            raise VideoFileError(msg.format(path=self.path))
+
+        return probe
+
+    def _probe_with_ffprobe(self):
+        """
+        Probe the file (or RAR archive member) with one run of ffprobe's JSON writer.
+
+        ffprobe does not report x264 settings, so 'keyint' is always None.
+        """
+
+        command = '"{ffprobe}" -v error -print_format json -show_format -show_streams "{url}"'
+        command = command.format(ffprobe=config.FFPROBE_PATH, url=self.input_url)
+        logging.debug(command)
         try:
             output = subprocess.check_output(command, stderr=subprocess.STDOUT, shell=True)
         except subprocess.CalledProcessError as e:
-            msg = 'Could not get duration from mediainfo: {error_string}'
+            msg = 'Error using ffprobe:\n{error_string}'
             raise VideoFileError(msg.format(error_string=e.output.decode(encoding='utf-8')))
-        else:
-            duration = int(float(output.decode(encoding='utf-8')))
 
-        duration /= float(1000)
+        try:
+            info = json.loads(output.decode(encoding='utf-8'))
+        except ValueError:
+            msg = 'Could not parse JSON output from ffprobe: {output}'
+            raise VideoFileError(msg.format(output=output.decode(encoding='utf-8')))
+
+        probe = {
+            'duration': to_number(info.get('format', {}).get('duration')),
+            'fps': None,
+            'width': None,
+            'height': None,
+            'sar': None,
+            'dar': None,
+            'keyint': None,
+            'streams': [],
+        }
+
+        for stream in info.get('streams', []):
+            stream_type = stream.get('codec_type')
+            if stream_type == 'subtitle':
+                stream_type = 'text'
+
+            probe['streams'].append({
+                'type': stream_type,
+                'format': stream.get('codec_name'),
+                'language': stream.get('tags', {}).get('language'),
+            })
+
+            # Only the first video stream matters
+            if stream_type != 'video' or probe['width'] is not None:
+                continue
+
+            probe['fps'] = to_ratio(stream.get('avg_frame_rate')) or to_ratio(stream.get('r_frame_rate'))
+            probe['width'] = stream.get('width')
+            probe['height'] = stream.get('height')
+            probe['sar'] = to_ratio(stream.get('sample_aspect_ratio'))
+            probe['dar'] = to_ratio(stream.get('display_aspect_ratio'))
+            if probe['duration'] is None:
+                probe['duration'] = to_number(stream.get('duration'))
+
+        if probe['duration'] is None:
+            msg = 'Could not get duration from ffprobe: {output}'
+            raise VideoFileError(msg.format(output=output.decode(encoding='utf-8')))
+
+        return probe
+
+    def get_duration(self):
+        """
+        Get video duration in seconds.
+        """
+
+        duration = self.probe()['duration']
         msg = 'Video duration: {n} seconds'
         logging.debug(msg.format(n=duration))
         return duration
@@ -64,34 +271,175 @@ class VideoFile(object):
              http://ffmpeg.org/trac/ffmpeg/wiki/Seeking%20with%20FFmpeg#Fastandaccurateseeking
         """
 
-        encoding_settings = dict()
-        command = '"{mediainfo}" "--Inform=Video;%Encoded_Library_Settings%" "{file}"'
-        command = command.format(mediainfo=config.MEDIAINFO_PATH, file=self.path)
+        probe = self.probe()
+        key_frame_interval = probe['keyint']
 
-        try:
-            output = subprocess.check_output(command, stderr=subprocess.STDOUT, shell=True)
-        except subprocess.CalledProcessError as e:
-            output = e.output.decode(encoding='utf-8')
-            msg = 'Could not get encoding settings from mediainfo: {error_string}'
-            logging.debug(msg.format(error_string=output))
-        else:
-            output = output.decode(encoding='utf-8').split(' / ')
-            for setting in output:
-                if '=' not in setting:
-                    continue
-                (key, delimiter, value) = setting.partition('=')
-                encoding_settings[key] = value
-
-        key_frame_interval = encoding_settings.get('keyint')
-
-        if key_frame_interval is not None:
-            # Get GOP size in seconds, assuming 25fps (Note: x264 default will be 10 seconds)
-            gop_duration = int(key_frame_interval) // 25
-        else:
+        if key_frame_interval is None:
             # Assume GOP size of 30 seconds, to be safe
-            gop_duration = 30
+            return 30
+
+        # Get GOP size in seconds, assuming 25fps if the frame rate is unknown (Note: x264 default will be 10 seconds)
+        fps = probe['fps'] or 25
+        return int(math.ceil(key_frame_interval / fps))
 
-        return gop_duration
+    def get_keyframes(self):
+        """
+        Return a sorted list of the times (in seconds) of the video stream's keyframes.
+
+        The index is read from the Matroska Cues when there are any, or else from a packet-level
+        ffprobe scan (which reads the file, but decodes nothing).  It is memoized on this object,
+        and cached on disk until the file changes.  Returns an empty list if no index could be built
+        (which isn't cached on disk, so it is tried again next time).
+        """
+
+        if self._keyframes is not None:
+            return self._keyframes
+
+        try:
+            key = self.identity()
+        except OSError as e:
+            raise VideoFileError(e)
+
+        keyframes = KEYFRAME_CACHE.get(key)
+        if keyframes is None:
+            keyframes = self._read_cues()
+            if keyframes is None:
+                keyframes = self._scan_packets()[0]
+            if keyframes:
+                KEYFRAME_CACHE.set(key, keyframes)
+
+        msg = 'Keyframe index: {n} keyframes'
+        logging.debug(msg.format(n=len(keyframes)))
+
+        self._keyframes = keyframes
+        return keyframes
+
+    def _read_cues(self):
+        """
+        Read the keyframe index from the Matroska Cues, or return None.
+        """
+        try:
+            if self.rar_member is not None:
+                f = self.rar_member.open()
+            else:
+                f = io.open(self.path, mode='rb')
+        except (IOError, OSError, RarError) as e:
+            raise VideoFileError(e)
+
+        with f:
+            try:
+                if not is_matroska(f):
+                    return None
+                keyframes = read_cues(f)
+            except (MatroskaError, IOError, OSError) as e:
+                msg = 'Could not read Matroska Cues from "{path}": {error}'
+                logging.debug(msg.format(path=self.path, error=e))
+                return None
+
+        if keyframes is not None:
+            keyframes = [round(time_code, 3) for time_code in keyframes]
+        return keyframes
+
+    def get_bitrate_profile(self):
+        """
+        Return the number of bytes of video data in each second of the video stream, as a list.
+
+        The sizes come from a packet-level ffprobe scan, which reads the file but decodes nothing.
+        The profile is memoized on this object, and cached on disk until the file changes.
+        Returns an empty list if the scan fails (which isn't cached on disk, so it is tried again
+        next time).
+        """
+
+        if self._bitrate_profile is not None:
+            return self._bitrate_profile
+
+        try:
+            key = self.identity()
+        except OSError as e:
+            raise VideoFileError(e)
+
+        profile = BITRATE_CACHE.get(key)
+        if profile is None:
+            profile = self._scan_packets()[1]
+            if profile:
+                BITRATE_CACHE.set(key, profile)
+
+        self._bitrate_profile = profile
+        return profile
+
+    def _scan_packets(self):
+        """
+        Read the flags, times, and sizes of the first video stream's packets, without decoding anything.
+
+        Returns (keyframe times, bytes per second).  Both the keyframe index and the bitrate profile
+        come from the same scan, so it is only run once per object.
+        """
+
+        if self._packet_scan is not None:
+            return self._packet_scan
+
+        command = (
+            '"{ffprobe}" -v error -select_streams v:0 -print_format json '
+            '-show_entries packet=pts_time,dts_time,size,flags:format=start_time "{url}"'
+        )
+        command = command.format(ffprobe=config.FFPROBE_PATH, url=self.input_url)
+        logging.debug(command)
+
+        # Warnings go to a temporary file, so they can't get into the JSON output (or fill up a pipe)
+        with tempfile.TemporaryFile() as error_file:
+            try:
+                output = subprocess.check_output(command, stderr=error_file, shell=True)
+                info = json.loads(output.decode(encoding='utf-8'))
+            except subprocess.CalledProcessError:
+                error_file.seek(0)
+                msg = 'Could not scan packets with ffprobe: {error_string}'
+                logging.debug(msg.format(error_string=error_file.read().decode(encoding='utf-8', errors='replace')))
+                return [], []
+            except ValueError:
+                logging.debug('Could not parse JSON output from ffprobe.')
+                return [], []
+
+        # Seek positions given to ffmpeg are relative to the start time
+        start_time = to_number(info.get('format', {}).get('start_time')) or 0
+
+        keyframes = set()
+        profile = []
+        for packet in info.get('packets', []):
+            time_code = to_number(packet.get('pts_time'))
+            if time_code is None:
+                time_code = to_number(packet.get('dts_time'))
+            if time_code is None:
+                continue
+            time_code = max(time_code - start_time, 0)
+
+            second = int(time_code)
+            if second >= len(profile):
+                profile.extend([0] * (second + 1 - len(profile)))
+            profile[second] += to_number(packet.get('size'), int) or 0
+
+            if 'K' in packet.get('flags', ''):
+                keyframes.add(round(time_code, 3))
+
+        self._packet_scan = (sorted(keyframes), profile)
+        return self._packet_scan
+
+    def get_seek_point(self, time_code):
+        """
+        Return the time of the last keyframe at or before time_code, so that ffmpeg can jump straight to it
+        and decode only the frames in between.
+
+        Without a keyframe index, fall back to going back one GOP duration from time_code.
+        """
+
+        keyframes = self.get_keyframes()
+        if keyframes:
+            index = bisect.bisect_right(keyframes, time_code) - 1
+            return keyframes[index] if index >= 0 else 0
+
+        gop_duration = self.get_gop_duration()
+        if time_code > gop_duration:
+            return time_code - gop_duration
+        return 0
 
     def get_playback_resolution(self):
         """
@@ -99,37 +447,18 @@ class VideoFile(object):
         know the resulting resolution so we can take screenshots at the right AR.
         """
 
-        command = '"{ffprobe}" "{file}"'.format(ffprobe=config.FFPROBE_PATH, file=self.path)
-
-        # Get a description of the video stream from ffprobe
-        logging.debug(command)
-        try:
-            output = subprocess.check_output(command, stderr=subprocess.STDOUT, shell=True)
-        except subprocess.CalledProcessError as e:
-            msg = 'Error using ffprobe:\n{error_string}'
-            raise VideoFileError(msg.format(error_string=e.output.decode(encoding='utf-8')))
-        else:
-            output = output.decode(encoding='utf-8')
-
-        # The stream description will be in one of the following formats. (Also, "PAR" might appear as "SAR")
-        #   Stream #0.0(eng): Video: h264 (High), yuv420p, 700x548 [PAR 64:45 DAR 2240:1233], PAR 199:140 DAR 995:548, 25 fps, 25 tbr, 1k tbn, 50 tbc (default)
-        #   Stream #0.0(eng): Video: h264 (High), yuv420p, 1280x532, PAR 1:1 DAR 320:133, 23.98 fps, 23.98 tbr, 1k tbn, 47.95 tbc (default)
-        match = re.search(r'(\d+)x(\d+) \[[SP]AR \d+:\d+ DAR (\d+):(\d+)\]', output)
-        if match is None:
-            match = re.search(r'(\d+)x(\d+), [SP]AR \d+:\d+ DAR (\d+):(\d+)', output)
-        if match is None:
+        probe = self.probe()
+        stored_width = probe['width']
+        stored_height = probe['height']
+        dar = probe['dar']
+        if not (stored_width and stored_height and dar):
             return None
 
-        stored_width = int(match.group(1))
-        stored_height = int(match.group(2))
-        dar_x = int(match.group(3))
-        dar_y = int(match.group(4))
-
-        # Ignore DAR if 1:1
-        if dar_x == dar_y:
+        # Square pixels
+        if probe['sar'] is not None and abs(probe['sar'] - 1) < 0.001:
             return None
 
-        playback_width = int((stored_height * dar_x) // dar_y)
+        playback_width = int(round(stored_height * dar))
 
         # Ignore if we are within 1 pixel already
         if abs(playback_width - stored_width) <= 1:
@@ -145,5 +474,39 @@ class VideoFile(object):
         return playback_resolution
 
 
+def to_number(value, number_type=float):
+    """
+    Convert a string from mediainfo or ffprobe to a number, or None.
+    """
+    if value is None:
+        return None
+    try:
+        return number_type(float(value))
+    except ValueError:
+        return None
+
+
+def to_ratio(value):
+    """
+    Convert a ratio from ffprobe (such as "16:9" or "24000/1001") to a float, or None.
+    """
+    if not value:
+        return None
+    match = re.match(r'^(\d+)[:/](\d+)$', value)
+    if match is None:
+        return to_number(value)
+    numerator = int(match.group(1))
+    denominator = int(match.group(2))
+    if numerator == 0 or denominator == 0:
+        return None
+    return numerator / denominator
+
+
+# Probe results, keyframe indexes, and bitrate profiles, by file identity
+PROBE_CACHE = DiskCache('probe', max_entries=config.MEDIAINFO_CACHE_SIZE)
+KEYFRAME_CACHE = DiskCache('keyframes')
+BITRATE_CACHE = DiskCache('bitrate')
+
+
 class VideoFileError(Exception):
     pass
\ No newline at end of file
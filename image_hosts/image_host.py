@@ -55,6 +55,15 @@ class BaseImageHost(object):
         """
         raise NotImplementedError
 
+    def upload_image(self, image_path, number=1):
+        """
+        Upload a single image file, and return its (URL, BBCode link).
+
+        Hosts that can upload images one at a time (without logging in again) should override this.
+        """
+        self.upload([image_path])
+        return self.urls[-1], self.bbcode_links[-1]
+
 
 class ImageHostError(Exception):
     pass
@@ -4,6 +4,7 @@ import io
 import os
 import sys
 import logging
+import threading
 
 try:
     from bs4 import BeautifulSoup
@@ -27,6 +28,8 @@ class ImageBam(BaseImageHost):
         self.thumbnail_size = '350'
         self.thumb_file_type = 'jpg'
         self.gallery_options = '1'
+        self.logged_in = False
+        self._login_lock = threading.Lock()
 
     def __repr__(self):
         return 'ImageBam.com'
@@ -50,6 +53,8 @@ class ImageBam(BaseImageHost):
                 logging.error(error_message.string.strip())
             raise ImageHostError('{site} login failed!'.format(site=self))
 
+        self.logged_in = True
+
     def upload(self, image_paths):
 
         if not image_paths:
@@ -62,6 +67,41 @@ class ImageBam(BaseImageHost):
 
         self.login()
 
+        logging.info('Uploading screenshots to ImageBam...')
+        (self.bbcode_links, self.html_links, self.urls) = self._post(image_paths)
+        logging.info('Screenshot upload completed: http://www.imagebam.com/gallery-organizer')
+
+        return True
+
+    def upload_image(self, image_path, number=1):
+        """
+        Upload one image, logging in only before the first one, and return its (URL, BBCode link).
+        """
+
+        if (not os.path.isfile(image_path)) or (not image_path.endswith('.png')):
+            msg = 'The file "{file}" does not exist or is not a PNG image.'
+            raise ImageHostError(msg.format(file=image_path))
+
+        # The same session may be uploading for several threads at once
+        with self._login_lock:
+            if not self.logged_in:
+                self.login()
+
+        (bbcode_links, html_links, urls) = self._post([image_path], first_number=number)
+        if not (urls and bbcode_links):
+            msg = 'Could not find the link to "{file}" after uploading it.'
+            raise ImageHostError(msg.format(file=image_path))
+
+        self.bbcode_links.extend(bbcode_links)
+        self.html_links.extend(html_links)
+        self.urls.extend(urls)
+        return urls[0], bbcode_links[0]
+
+    def _post(self, image_paths, first_number=1):
+        """
+        Send a set of images in one request, and return the (BBCode links, HTML links, URLs) from the response.
+        """
+
         # Upload files
         url = 'http://www.imagebam.com/sys/upload/save'
         data = {
@@ -76,7 +116,7 @@ class ImageBam(BaseImageHost):
         files = []
         file_objects = []
         for n in range(len(image_paths)):
-            img_num = str(n + 1).zfill(3)
+            img_num = str(first_number + n).zfill(3)
             file_objects.append(io.open(image_paths[n], mode='rb'))
             files.append((
                 'file[]',
@@ -86,23 +126,22 @@ class ImageBam(BaseImageHost):
                 )
             ))
 
-        logging.info('Uploading screenshots to ImageBam...')
-        response = self.session.post(url, data=data, files=files)
-        response.raise_for_status()
-        logging.info('Screenshot upload completed: http://www.imagebam.com/gallery-organizer')
-
-        for file_obj in file_objects:
-            file_obj.close()
+        try:
+            response = self.session.post(url, data=data, files=files)
+            response.raise_for_status()
+        finally:
+            for file_obj in file_objects:
+                file_obj.close()
 
         self._html = response.text
 
         table_regex = re.compile(r'(<table style=\'width:100%;\'>)((.|\s)*?)(</table>)')
         table_html = ''.join(table_regex.findall(self._html)[0])
         bbcode_regex = re.compile(r'\[URL=.*?\[/URL]')
-        self.bbcode_links = bbcode_regex.findall(table_html)
+        bbcode_links = bbcode_regex.findall(table_html)
         link_regex = re.compile(r'\<a href=.*?></a>')
-        self.html_links = link_regex.findall(table_html)
+        html_links = link_regex.findall(table_html)
         url_regex = re.compile(r'http://www.imagebam.com/.*?[a-z0-9]{12,18}(?=")')
-        self.urls = url_regex.findall(''.join(self.html_links))
+        urls = url_regex.findall(''.join(html_links))
 
-        return True
\ No newline at end of file
+        return bbcode_links, html_links, urls
@@ -1,7 +1,9 @@
 from __future__ import print_function, unicode_literals, division, absolute_import
 
 from .utils import *
+from .cache import DiskCache, file_identity, tool_version
 from .imdb import IMDb, IMDbError
 from .tmdb import TMDB, TMDBError
 from .mediainfo import Mediainfo, MediainfoError
-from .release_groups import p2p_groups, scene_groups
\ No newline at end of file
+from . import libmediainfo
+from .release_groups import ReleaseGroups, GroupSet, release_groups, p2p_groups, scene_groups
\ No newline at end of file
@@ -0,0 +1,224 @@
+from __future__ import print_function, unicode_literals, division, absolute_import
+import subprocess
+import threading
+import tempfile
+import hashlib
+import logging
+import json
+import time
+import io
+import os
+
+import config
+
+
+class DiskCache(object):
+    """
+    A small on-disk cache of JSON-serializable values, stored as one file per key under config.CACHE_DIR.
+
+    Keys are JSON-serializable too (usually built from file_identity()), so a cached value goes
+    stale by itself when the file it describes is modified.  If CACHE_DIR is None, nothing is cached.
+
+    Entries older than ttl seconds are ignored, and when there are more than max_entries (by a tenth,
+    so the directory isn't listed on every write), the least recently used ones are deleted.  Both
+    limits are optional.  If the cached values refer to other files, on_evict is called with the value of
+    every entry that expires or is evicted, so they can be deleted too.
+    """
+
+    def __init__(self, name, directory=None, ttl=None, max_entries=None, on_evict=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        if directory is None:
+            directory = config.CACHE_DIR
+        self.directory = None if directory is None else os.path.join(os.path.expanduser(directory), name)
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'DiskCache({directory})'.format(directory=self.directory)
+
+    def _path(self, key):
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.json')
+
+    def get(self, key, default=None):
+        """
+        Return the value cached under this key, or default.
+        """
+        if self.directory is None:
+            return default
+        path = self._path(key)
+        try:
+            with io.open(path, mode='r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return default
+
+        # Guard against (very unlikely) digest collisions
+        if entry.get('key') != json.loads(json.dumps(key)):
+            return default
+
+        if self.ttl is not None and time.time() - entry.get('time', 0) > self.ttl:
+            self.delete(key)
+            self._evicted(entry)
+            return default
+
+        # The modification time of an entry marks when it was last used
+        if self.max_entries is not None:
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+
+        return entry.get('value', default)
+
+    def set(self, key, value):
+        """
+        Cache a value under this key.  Failing to write the cache is not an error.
+        """
+        if self.directory is None:
+            return
+        path = self._path(key)
+        is_new = not os.path.exists(path)
+        temporary_path = None
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+
+            # Each write has its own temporary file, so threads writing the same key don't clash
+            (handle, temporary_path) = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+            with io.open(handle, mode='w', encoding='utf-8') as f:
+                entry = {'key': key, 'value': value, 'time': time.time()}
+                f.write(json.dumps(entry, sort_keys=True, ensure_ascii=False))
+            _replace(temporary_path, path)
+        except (IOError, OSError) as e:
+            msg = 'Could not write to cache "{path}": {error}'
+            logging.debug(msg.format(path=path, error=e))
+            if temporary_path is not None and os.path.exists(temporary_path):
+                try:
+                    os.unlink(temporary_path)
+                except OSError:
+                    pass
+            return
+
+        if self.max_entries is not None and is_new:
+            self._count_new_entry()
+
+    def _count_new_entry(self):
+        """
+        Keep count of the entries (the directory is only listed the first time), and evict some once
+        there are a tenth more than max_entries.
+        """
+        with self._lock:
+            if self._entries is None:
+                try:
+                    self._entries = len([name for name in os.listdir(self.directory) if name.endswith('.json')])
+                except OSError:
+                    return
+            else:
+                self._entries += 1
+
+            if self._entries > self.max_entries + max(self.max_entries // 10, 1):
+                self._entries = self._evict()
+
+    def _evict(self):
+        """
+        Delete the least recently used entries, until there are at most max_entries, and return how many
+        are left.
+        """
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, file_name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+
+        entries.sort()
+        evicted = entries[:max(len(entries) - self.max_entries, 0)]
+        for (mtime, path) in evicted:
+            msg = 'Evicting cache entry "{path}"'
+            logging.debug(msg.format(path=path))
+            entry = None
+            if self.on_evict is not None:
+                try:
+                    with io.open(path, mode='r', encoding='utf-8') as f:
+                        entry = json.load(f)
+                except (IOError, OSError, ValueError):
+                    pass
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            if entry is not None:
+                self._evicted(entry)
+        return len(entries) - len(evicted)
+
+    def _evicted(self, entry):
+        """
+        Pass the value of an expired or evicted entry to on_evict.
+        """
+        if self.on_evict is None or 'value' not in entry:
+            return
+        try:
+            self.on_evict(entry['value'])
+        except Exception as e:
+            msg = 'Could not clean up after cache entry: {error}'
+            logging.debug(msg.format(error=e))
+
+    def delete(self, key):
+        if self.directory is None:
+            return
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+
+def tool_version(tool_path, argument='--version'):
+    """
+    Return the version string printed by a command-line tool (such as mediainfo), or None if it can't
+    be run.  Each tool is only asked once per process.
+    """
+    key = (tool_path, argument)
+    with _tool_versions_lock:
+        if key not in _tool_versions:
+            command = '"{tool}" {argument}'.format(tool=tool_path, argument=argument)
+            try:
+                output = subprocess.check_output(command, stderr=subprocess.STDOUT, shell=True)
+            except (subprocess.CalledProcessError, OSError) as e:
+                msg = 'Could not get the version of {tool}: {error}'
+                logging.debug(msg.format(tool=tool_path, error=e))
+                _tool_versions[key] = None
+            else:
+                _tool_versions[key] = ' '.join(output.decode(encoding='utf-8', errors='replace').split())
+        return _tool_versions[key]
+
+
+def _replace(source, destination):
+    """
+    Rename a file over another one.  Python 2 has no os.replace, and os.rename can't do that on Windows.
+    """
+    if hasattr(os, 'replace'):
+        os.replace(source, destination)
+        return
+    if os.name == 'nt' and os.path.exists(destination):
+        os.unlink(destination)
+    os.rename(source, destination)
+
+
+def file_identity(path):
+    """
+    Return [path, size, mtime, inode] for a file, which changes whenever the file is replaced or modified.
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    stat = os.stat(path)
+    return [path, stat.st_size, stat.st_mtime, stat.st_ino]
+
+
+_tool_versions = dict()
+_tool_versions_lock = threading.Lock()
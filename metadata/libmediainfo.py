@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function, unicode_literals, division, absolute_import
+
+import ctypes
+import ctypes.util
+import logging
+import threading
+import sys
+
+import config
+
+
+def get_library():
+    """
+    Load libmediainfo (config.LIBMEDIAINFO_PATH, or wherever the system keeps it), and return it,
+    or None if it isn't installed.  The library is only looked for once.
+    """
+    with _lock:
+        if not _library:
+            _library.append(_load_library())
+        return _library[0]
+
+
+def is_available():
+    return get_library() is not None
+
+
+def version():
+    """
+    Return the version string of libmediainfo, such as "MediaInfoLib - v21.09".
+    """
+    library = _require_library()
+    handle = library.MediaInfo_New()
+    try:
+        return library.MediaInfo_Option(handle, 'Info_Version', '')
+    finally:
+        library.MediaInfo_Delete(handle)
+
+
+def inform(path, outputs=('JSON',)):
+    """
+    Read a file with libmediainfo, in this process, and return a list of its reports, one for each
+    output format ('JSON', 'XML', or '' for the text dump).  The file is only opened once.
+    """
+    library = _require_library()
+    handle = library.MediaInfo_New()
+    try:
+        if not library.MediaInfo_Open(handle, path):
+            msg = 'libmediainfo could not open "{path}"'
+            raise LibMediainfoError(msg.format(path=path))
+        reports = _inform(library, handle, outputs)
+        library.MediaInfo_Close(handle)
+        return reports
+    finally:
+        library.MediaInfo_Delete(handle)
+
+
+def inform_file_object(f, size, outputs=('JSON',), chunk_size=1 << 20):
+    """
+    Read a seekable binary file object (such as a RarMemberFile) with libmediainfo's buffer interface,
+    and return a list of its reports, like inform().  Only the parts of the file that libmediainfo asks
+    for are read.
+    """
+    library = _require_library()
+    handle = library.MediaInfo_New()
+    try:
+        library.MediaInfo_Open_Buffer_Init(handle, size, 0)
+        f.seek(0)
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            status = library.MediaInfo_Open_Buffer_Continue(handle, data, len(data))
+            if status & BUFFER_FINISHED:
+                break
+
+            # libmediainfo may want to skip ahead (or back), for example to an index at the end of the file
+            position = library.MediaInfo_Open_Buffer_Continue_GoTo_Get(handle)
+            if position != NO_SEEK:
+                f.seek(position)
+                library.MediaInfo_Open_Buffer_Init(handle, size, position)
+
+        library.MediaInfo_Open_Buffer_Finalize(handle)
+        reports = _inform(library, handle, outputs)
+        library.MediaInfo_Close(handle)
+        return reports
+    finally:
+        library.MediaInfo_Delete(handle)
+
+
+def _inform(library, handle, outputs):
+    """
+    Get the reports of an open handle.  The output format can be changed between reports, so the file
+    isn't parsed again for each one.
+    """
+    reports = []
+    for output in outputs:
+        library.MediaInfo_Option(handle, 'Inform', output)
+        reports.append(library.MediaInfo_Inform(handle, 0))
+    return reports
+
+
+def _require_library():
+    library = get_library()
+    if library is None:
+        raise LibMediainfoError('libmediainfo is not installed.')
+    return library
+
+
+def _load_library():
+    names = [config.LIBMEDIAINFO_PATH] if config.LIBMEDIAINFO_PATH else []
+    found = ctypes.util.find_library('mediainfo')
+    if found:
+        names.append(found)
+    if sys.platform == 'darwin':
+        names.append('libmediainfo.0.dylib')
+    elif sys.platform.startswith('win'):
+        names.append('MediaInfo.dll')
+    else:
+        names.append('libmediainfo.so.0')
+
+    for name in names:
+        try:
+            library = ctypes.CDLL(name)
+        except OSError:
+            continue
+        try:
+            _declare(library)
+        except AttributeError as e:
+            msg = 'Could not use libmediainfo from {name}: {error}'
+            logging.debug(msg.format(name=name, error=e))
+            continue
+        msg = 'Using libmediainfo from {name}'
+        logging.debug(msg.format(name=name))
+        return library
+
+    logging.debug('libmediainfo is not installed; running the mediainfo command instead.')
+    return None
+
+
+def _declare(library):
+    """
+    Declare the argument and return types of the (wide-character) functions we use.
+    """
+    handle = ctypes.c_void_p
+
+    library.MediaInfo_New.argtypes = []
+    library.MediaInfo_New.restype = handle
+    library.MediaInfo_Delete.argtypes = [handle]
+    library.MediaInfo_Delete.restype = None
+    library.MediaInfo_Open.argtypes = [handle, ctypes.c_wchar_p]
+    library.MediaInfo_Open.restype = ctypes.c_size_t
+    library.MediaInfo_Close.argtypes = [handle]
+    library.MediaInfo_Close.restype = None
+    library.MediaInfo_Option.argtypes = [handle, ctypes.c_wchar_p, ctypes.c_wchar_p]
+    library.MediaInfo_Option.restype = ctypes.c_wchar_p
+    library.MediaInfo_Inform.argtypes = [handle, ctypes.c_size_t]
+    library.MediaInfo_Inform.restype = ctypes.c_wchar_p
+    library.MediaInfo_Open_Buffer_Init.argtypes = [handle, ctypes.c_uint64, ctypes.c_uint64]
+    library.MediaInfo_Open_Buffer_Init.restype = ctypes.c_size_t
+    library.MediaInfo_Open_Buffer_Continue.argtypes = [handle, ctypes.c_char_p, ctypes.c_size_t]
+    library.MediaInfo_Open_Buffer_Continue.restype = ctypes.c_size_t
+    library.MediaInfo_Open_Buffer_Continue_GoTo_Get.argtypes = [handle]
+    library.MediaInfo_Open_Buffer_Continue_GoTo_Get.restype = ctypes.c_uint64
+    library.MediaInfo_Open_Buffer_Finalize.argtypes = [handle]
+    library.MediaInfo_Open_Buffer_Finalize.restype = ctypes.c_size_t
+
+
+class LibMediainfoError(Exception):
+    pass
+
+
+# Bit set in the status returned by MediaInfo_Open_Buffer_Continue once it has read enough
+BUFFER_FINISHED = 0x08
+
+# MediaInfo_Open_Buffer_Continue_GoTo_Get returns (uint64) -1 when it doesn't need to seek
+NO_SEEK = (1 << 64) - 1
+
+_library = []
+_lock = threading.Lock()
@@ -4,29 +4,56 @@ from __future__ import print_function, unicode_literals, division, absolute_impo
 
 import re
 import os
+import json
 import logging
 import subprocess
-from io import StringIO
+import multiprocessing
+from collections import OrderedDict
 
 from .utils import Containers, Codecs
+from .cache import DiskCache, file_identity, tool_version
+from . import libmediainfo
 import config
 
 
 class Mediainfo(object):
     """
-    Represents the key/value pairs output by the mediainfo command.
+    Represents the tracks reported by the mediainfo command.
 
-    A Mediainfo object can be treated like a dictionary.  For example,
-    to get the duration of the video stream:
+    The file is read with one run of the mediainfo command, or in this process by libmediainfo
+    if it is installed (see config.MEDIAINFO_BACKEND).  Every track (General, Video, each
+    Audio and Text track, Menu, ...) becomes a Track object, in order, in self.tracks.  The usual
+    text dump, for trackers, is mediainfo's own.  libmediainfo gives it along with the JSON output,
+    which the tracks are built from; the mediainfo command can only print one of them, so it prints
+    the text dump, and the tracks are parsed from that.
+
+    A Mediainfo object can also be treated like a dictionary of tracks, keyed by the section
+    headers of the text dump.  For example, to get the duration of the video stream:
 
     m = Mediainfo('/path/to/video_file.mkv')
+    m.parse()
     d = m['Video']['Duration']
 
-    This code will generate a KeyError if there is no 'Video' section in
-    the mediainfo output, or if 'Duration' is not present in that section.
+    When there are several tracks of a type, they are 'Audio #1', 'Audio #2', and so on, and 'Audio'
+    is the first one.  This code will generate a KeyError if there is no 'Video' track, or if
+    'Duration' is not one of its fields.
+
+    Unless use_cache is False, mediainfo's output for a file is cached on disk, until the file or the
+    installed version of mediainfo changes.
+
+    Files inside RAR archives can be read (with libmediainfo only) by Mediainfo.from_file_object().
     """
 
-    def __init__(self, path=None, base_path=None, text=None):
+    def __init__(self, path=None, base_path=None, text=None, use_cache=True):
+
+        self._text = None
+        self._data = None
+        self._tracks = None
+        self._command = ''
+        self._relative_path = None
+        self._use_library = False
+        self._cache_key = None
+        self.path = None
 
         if path:
             self.path = os.path.abspath(os.path.expanduser(path))
@@ -44,19 +71,32 @@ class Mediainfo(object):
                 command = ''
                 relative_path = self.path
 
-            # Run mediainfo on the path and store the result in self.text
-            command += '"{mediainfo}" "{file}"'
-            command = command.format(mediainfo=config.MEDIAINFO_PATH, file=relative_path)
-            try:
-                output = subprocess.check_output(command, shell=True).strip()
-            except subprocess.CalledProcessError as e:
-                output = e.output.decode(encoding='utf-8')
-                raise MediainfoError('Could not get mediainfo output: {output}'.format(output=output))
-            else:
-                self.text = output.decode(encoding='utf-8')
+            self._command = command
+            self._relative_path = relative_path
+            self._use_library = use_libmediainfo()
+
+            # The same file might have been read before, perhaps from another base path
+            if use_cache:
+                self._cache_key = ['mediainfo', get_version(self._use_library)] + file_identity(self.path)
+                cached = MEDIAINFO_CACHE.get(self._cache_key)
+                if cached is not None and cached['text'] is not None:
+                    # The output shows the path mediainfo was given
+                    self._data = cached['data']
+                    if self._data is not None:
+                        self._data['media']['@ref'] = relative_path
+                    self._text = set_complete_name(cached['text'], relative_path)
+
+            if self._text is None:
+                (self._data, self._text) = self._read()
+                self._save()
 
         elif text:
-            self.text = text.strip()
+            # Either mediainfo's JSON output, or its text dump
+            text = text.strip()
+            if text.startswith('{'):
+                self._data = self._load_json(text)
+            else:
+                self._text = text
 
         else:
             raise MediainfoError('No file path or text provided.')
@@ -79,50 +119,244 @@ class Mediainfo(object):
     def get(self, key, default=None):
         return self.contents.get(key, default)
 
-    def parse(self):
-        section = 'General'
-        self[section] = dict()
-
-        for line in StringIO(self.text):
-            line = line.strip()
+    def _read(self):
+        """
+        Read the file with libmediainfo or the mediainfo command, and return its parsed JSON output and
+        its text dump.  The mediainfo command can't print both at once, so it only gives the text dump
+        (and None for the JSON output).
+        """
 
-            if not line:
-                pass
+        if self._use_library:
 
-            if ':' not in line:
-                section = line
-                self[section] = dict()
+            # libmediainfo is given the absolute path, so put the relative one into its output
+            try:
+                (output, text) = libmediainfo.inform(self.path, outputs=('JSON', ''))
+            except libmediainfo.LibMediainfoError as e:
+                raise MediainfoError('Could not get mediainfo output: {error}'.format(error=e))
+            data = self._load_json(output)
+            data['media']['@ref'] = self._relative_path
+            return data, set_complete_name(text, self._relative_path)
+
+        return None, self._run()
+
+    def _save(self):
+        """
+        Cache mediainfo's output for the file.
+        """
+        if self._cache_key is not None:
+            MEDIAINFO_CACHE.set(self._cache_key, {'data': self._data, 'text': self._text})
+
+    def _run(self):
+        """
+        Run mediainfo on the file, from the base path if there is one, and return its text dump.
+        """
+        command = self._command + '"{mediainfo}" "{file}"'
+        command = command.format(mediainfo=config.MEDIAINFO_PATH, file=self._relative_path)
+        try:
+            output = subprocess.check_output(command, shell=True).strip()
+        except subprocess.CalledProcessError as e:
+            output = e.output.decode(encoding='utf-8')
+            raise MediainfoError('Could not get mediainfo output: {output}'.format(output=output))
+        return output.decode(encoding='utf-8')
+
+    @classmethod
+    def from_file_object(cls, f, size, name):
+        """
+        Read a seekable binary file object of a given size (such as a RarMemberFile) with libmediainfo.
+        name is shown as the Complete name.  Raises MediainfoError if libmediainfo isn't installed.
+        """
+        try:
+            (output, text) = libmediainfo.inform_file_object(f, size, outputs=('JSON', ''))
+        except libmediainfo.LibMediainfoError as e:
+            raise MediainfoError('Could not get mediainfo output: {error}'.format(error=e))
+        mediainfo = cls(text=output)
+        mediainfo._data['media']['@ref'] = name
+        mediainfo._text = set_complete_name(text, name)
+        return mediainfo
+
+    @classmethod
+    def batch(cls, paths, processes=None, group_size=200, use_cache=True):
+        """
+        Read many files, and return a list of Mediainfo objects in the same order, or None for each file
+        that could not be read.
+
+        Files that aren't cached are split into groups of group_size.  Each group is read by one run of
+        mediainfo with all of its paths (or by libmediainfo, one file after another), and the groups are
+        run on a pool of processes (one per CPU by default).  mediainfo's text dump for a group is then
+        split up by file.
+        """
+
+        paths = [os.path.abspath(os.path.expanduser(path)) for path in paths]
+        use_library = use_libmediainfo()
+        version = get_version(use_library) if use_cache else None
+
+        results = dict()
+        cache_keys = dict()
+        unread_paths = []
+        seen_paths = set()
+        for path in paths:
+            if path in seen_paths:
+                continue
+            seen_paths.add(path)
+            if use_cache:
+                try:
+                    cache_keys[path] = ['mediainfo', version] + file_identity(path)
+                except OSError as e:
+                    logging.debug(e)
+                    results[path] = None
+                    continue
+                cached = MEDIAINFO_CACHE.get(cache_keys[path])
+                if cached is not None and cached['text'] is not None:
+                    results[path] = cls._from_data(path, cached['data'], cached['text'], use_library)
+                    results[path]._cache_key = cache_keys[path]
+                    continue
+            unread_paths.append(path)
+
+        groups = [(unread_paths[i:i + group_size], use_library) for i in range(0, len(unread_paths), group_size)]
+        if processes is None:
+            try:
+                processes = multiprocessing.cpu_count()
+            except NotImplementedError:
+                processes = 1
 
+        if processes > 1 and len(groups) > 1:
+            pool = multiprocessing.Pool(min(processes, len(groups)))
+            try:
+                read_groups = list(pool.imap(_read_group, groups))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            read_groups = [_read_group(group) for group in groups]
+
+        for read_group in read_groups:
+            for (path, data, text) in read_group:
+                if text is None:
+                    msg = 'Could not get mediainfo output for "{path}"'
+                    logging.warning(msg.format(path=path))
+                    results[path] = None
+                    continue
+                results[path] = cls._from_data(path, data, text, use_library)
+                results[path]._cache_key = cache_keys.get(path)
+                results[path]._save()
+
+        return [results[path] for path in paths]
+
+    @classmethod
+    def _from_data(cls, path, data, text, use_library):
+        """
+        Make a Mediainfo object for a file from mediainfo's text dump, and its (already parsed) JSON
+        output if there is one.
+        """
+        mediainfo = cls(text=text)
+        if data is not None:
+            data['media']['@ref'] = path
+            mediainfo._data = data
+        mediainfo.path = path
+        mediainfo._relative_path = path
+        mediainfo._use_library = use_library
+        mediainfo._text = set_complete_name(mediainfo._text, path)
+        return mediainfo
+
+    @staticmethod
+    def _load_json(output):
+        try:
+            data = json.loads(output, object_pairs_hook=OrderedDict)
+            data['media']['track']
+        except (ValueError, KeyError, TypeError):
+            msg = 'Could not parse JSON output from mediainfo: {output}'
+            raise MediainfoError(msg.format(output=output))
+        return data
+
+    @property
+    def text(self):
+        """
+        mediainfo's text dump of the file, or None if only its JSON output was given.
+        """
+        return self._text
+
+    @property
+    def tracks(self):
+        """
+        The list of Track objects, built on first use.
+        """
+        if self._tracks is None:
+            if self._data is not None:
+                self._tracks = []
+                for fields in self._data['media']['track']:
+                    if not isinstance(fields, dict):
+                        continue
+                    track_type = fields.get('@type')
+
+                    # Like the text dump, start with the path mediainfo was given
+                    if track_type == 'General' and 'CompleteName' not in fields and '@ref' in self._data['media']:
+                        fields = OrderedDict([('CompleteName', self._data['media']['@ref'])] + list(fields.items()))
+
+                    self._tracks.append(make_track(track_type, fields))
             else:
-                try:
-                    partitioned = line.partition(':')
-                    key = partitioned[0].strip()
-                    value = partitioned[2].strip()
-                    self[section][key] = value
-                except AttributeError:
-                    msg = 'Could not parse line "{text}"'
-                    logging.error(msg.format(text=line))
+                self._tracks = parse_text(self._text)
+        return self._tracks
+
+    def get_tracks(self, track_type):
+        """
+        Return the list of tracks of one type ('Video', 'Audio', 'Text', ...).
+        """
+        return [track for track in self.tracks if track.type == track_type]
+
+    def get_track(self, track_type):
+        """
+        Return the first track of one type, or None.
+        """
+        return next((track for track in self.tracks if track.type == track_type), None)
+
+    @property
+    def general(self):
+        return self.get_track('General')
+
+    @property
+    def video(self):
+        return self.get_track('Video')
+
+    @property
+    def audio(self):
+        return self.get_tracks('Audio')
+
+    @property
+    def subtitles(self):
+        return self.get_tracks('Text')
+
+    def parse(self):
+        self.contents = dict()
+        for (header, track) in section_headers(self.tracks):
+            self[header] = track
+            if track.type not in self.contents:
+                self[track.type] = track
 
         logging.debug('Parsed mediainfo output.')
 
     def get_info(self):
 
+        general = self.general
+        video = self.video
+
         # Does it have chapters?
-        if self.get('Menu') and self['Menu'].keys():
-            self.has_chapters = True
+        self.has_chapters = any(track.keys() for track in self.get_tracks('Menu'))
 
         # Get container
-        try:
-            container = self['General']['Format']
-            self.container = CONTAINERS.get(container.lower())
-            logging.debug('Container: ' + container)
-        except KeyError:
+        container = general.format if general is not None else None
+        if container is None:
             msg = 'Unable to parse container from mediainfo.\n{text}'
             raise MediainfoError(msg.format(text=self.text))
+        self.container = CONTAINERS.get(container.lower())
+        logging.debug('Container: ' + container)
+
+        if video is None:
+            msg = 'Unable to find a video track in mediainfo.\n{text}'
+            raise MediainfoError(msg.format(text=self.text))
 
         # Get codec
-        try:
-            codec = self['Video']['Writing library']
+        codec = video.writing_library
+        if codec is not None:
             if codec.lower().startswith('x264'):
                 self.codec = Codecs.X264
             elif codec.lower().startswith('xvid'):
@@ -130,21 +364,17 @@ class Mediainfo(object):
             else:
                 msg = 'Did not recognize codec: {codec}'
                 raise MediainfoError(msg.format(codec=codec))
-        except KeyError:
-            # A hack to take care of H.264 that wasn't encoded with x264
-            # TODO: better handling of H.264; in particular, we might hit another KeyError here
-            video_format = self['Video']['Format']
-            if video_format == 'AVC':
-                self.codec = Codecs.H264
-            else:
-                msg = 'Unable to parse codec from mediainfo.\n{text}'
-                raise MediainfoError(msg.format(text=self.text))
+        elif video.format == 'AVC':
+            # H.264 that wasn't encoded with x264
+            self.codec = Codecs.H264
+        else:
+            msg = 'Unable to parse codec from mediainfo.\n{text}'
+            raise MediainfoError(msg.format(text=self.text))
 
         # Get width and height
-        try:
-            self.width = int(re.sub(r'\D', '', self['Video']['Width']))
-            self.height = int(re.sub(r'\D', '', self['Video']['Height']))
-        except KeyError:
+        self.width = video.width
+        self.height = video.height
+        if self.width is None or self.height is None:
             msg = 'Unable to parse width/height from mediainfo.\n{text}'
             raise MediainfoError(msg.format(text=self.text))
         else:
@@ -153,16 +383,331 @@ class Mediainfo(object):
 
         # Get encoding settings
         if self.codec == Codecs.X264:
-            try:
-                encoding_settings = self['Video']['Encoding settings'].split(' / ')
-                for setting in encoding_settings:
-                    (key, delimiter, value) = setting.partition('=')
-                    self.encoding_settings[key] = value
-            except (KeyError, ValueError):
+            self.encoding_settings = video.encoding_settings
+            if not self.encoding_settings:
                 msg = 'Unable to parse encoding settings from mediainfo.\n{text}'
                 logging.debug(msg.format(text=self.text))
 
 
+def _read_group(group):
+    """
+    Pool worker for Mediainfo.batch().  Reads a group of files, and returns a list of (path, JSON data,
+    text dump), where the text dump is None for files that could not be read.  Only libmediainfo gives
+    the JSON output along with the text dump; otherwise the data is None.
+    """
+    (paths, use_library) = group
+
+    if use_library:
+        results = []
+        for path in paths:
+            try:
+                (output, text) = libmediainfo.inform(path, outputs=('JSON', ''))
+                results.append((path, json.loads(output, object_pairs_hook=OrderedDict), set_complete_name(text, path)))
+            except (libmediainfo.LibMediainfoError, ValueError) as e:
+                logging.debug(e)
+                results.append((path, None, None))
+        return results
+
+    command = '"{mediainfo}" {files}'.format(
+        mediainfo=config.MEDIAINFO_PATH,
+        files=' '.join('"{path}"'.format(path=path) for path in paths),
+    )
+    try:
+        output = subprocess.check_output(command, shell=True)
+    except subprocess.CalledProcessError as e:
+        # mediainfo fails if any of the files can't be read, but still prints the others
+        logging.debug(e)
+        output = e.output
+
+    # Each file's dump starts with its General section, which shows the path it was given; unreadable
+    # files are left out
+    dumps = []
+    for line in output.decode(encoding='utf-8').splitlines():
+        if line.strip() == 'General':
+            dumps.append([])
+        if dumps:
+            dumps[-1].append(line)
+    by_path = dict()
+    for lines in dumps:
+        text = '\n'.join(lines).strip()
+        tracks = parse_text(text)
+        if tracks and tracks[0].get('CompleteName') is not None:
+            by_path[tracks[0].get('CompleteName')] = text
+    return [(path, None, by_path.get(path)) for path in paths]
+
+
+def use_libmediainfo():
+    """
+    Check whether to read files with libmediainfo, according to config.MEDIAINFO_BACKEND: 'cli' never
+    does, 'library' always does, and 'auto' does if libmediainfo is installed.
+    """
+    backend = config.MEDIAINFO_BACKEND
+    if backend == 'cli':
+        return False
+    if backend not in ('auto', 'library'):
+        msg = 'Unknown mediainfo backend: {backend}'
+        raise MediainfoError(msg.format(backend=backend))
+    if libmediainfo.is_available():
+        return True
+    if backend == 'library':
+        logging.warning('libmediainfo is not installed; running the mediainfo command instead.')
+    return False
+
+
+def get_version(use_library):
+    """
+    Return the version of mediainfo that reads files, for cache keys.
+    """
+    if use_library:
+        try:
+            return libmediainfo.version()
+        except libmediainfo.LibMediainfoError:
+            return None
+    return tool_version(config.MEDIAINFO_PATH, '--Version')
+
+
+class Track(object):
+    """
+    One track (section) of mediainfo output.  Fields are kept as the strings mediainfo reported, under
+    the names of its JSON output, and only converted when a property is used.
+    """
+
+    __slots__ = ('type', 'fields', '_cache')
+
+    def __init__(self, track_type, fields):
+        self.type = track_type
+        self.fields = fields
+        self._cache = None
+
+    def __repr__(self):
+        return '{name}({fields})'.format(name=self.__class__.__name__, fields=len(self.fields))
+
+    def __getitem__(self, key):
+        return self.fields[key]
+
+    def __contains__(self, key):
+        return key in self.fields
+
+    def get(self, key, default=None):
+        return self.fields.get(key, default)
+
+    def keys(self):
+        return [key for key in self.fields if not key.startswith('@')]
+
+    def get_number(self, key, number_type=float):
+        """
+        Return a field as a number, or None.  Digit groups in text dump values ("1 920 pixels") are joined.
+        """
+        value = self.fields.get(key)
+        if value is None:
+            return None
+        if not isinstance(value, (int, float)):
+            match = re.match(r'^\s*(-?\d[\d ]*(?:\.\d+)?)', value)
+            if match is None:
+                return None
+            value = match.group(1).replace(' ', '')
+        try:
+            return number_type(float(value))
+        except ValueError:
+            return None
+
+    def get_ratio(self, key):
+        """
+        Return a field as a number, or None.  Ratios in text dump values ("16:9", "2.40:1") are divided out.
+        """
+        value = self.fields.get(key)
+        if value is not None and not isinstance(value, (int, float)):
+            match = re.match(r'^\s*(\d+(?:\.\d+)?):(\d+(?:\.\d+)?)\s*$', value)
+            if match is not None:
+                denominator = float(match.group(2))
+                return float(match.group(1)) / denominator if denominator else None
+        return self.get_number(key)
+
+    @property
+    def format(self):
+        return self.fields.get('Format')
+
+    @property
+    def language(self):
+        return self.fields.get('Language')
+
+    @property
+    def title(self):
+        return self.fields.get('Title')
+
+    @property
+    def duration(self):
+        """
+        The duration in seconds, or None.  The text dump only shows its two largest units ("1 h 52 min"),
+        so a duration read from it is rounded down.
+        """
+        value = self.fields.get('Duration')
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        units = re.findall(r'(\d+(?:\.\d+)?)\s*(h|min|mn|ms|s)\b', value)
+        if not units:
+            return None
+        return sum(float(number) * DURATION_UNITS[unit] for (number, unit) in units)
+
+    @property
+    def bit_rate(self):
+        return self.get_number('BitRate', int)
+
+
+class GeneralTrack(Track):
+
+    __slots__ = ()
+
+    @property
+    def file_size(self):
+        return self.get_number('FileSize', int)
+
+    @property
+    def overall_bit_rate(self):
+        return self.get_number('OverallBitRate', int)
+
+
+class VideoTrack(Track):
+
+    __slots__ = ()
+
+    @property
+    def width(self):
+        return self.get_number('Width', int)
+
+    @property
+    def height(self):
+        return self.get_number('Height', int)
+
+    @property
+    def frame_rate(self):
+        return self.get_number('FrameRate')
+
+    @property
+    def pixel_aspect_ratio(self):
+        return self.get_ratio('PixelAspectRatio')
+
+    @property
+    def display_aspect_ratio(self):
+        return self.get_ratio('DisplayAspectRatio')
+
+    @property
+    def writing_library(self):
+        return self.fields.get('Encoded_Library')
+
+    @property
+    def encoding_settings(self):
+        """
+        The x264 (or other encoder) settings, as a dictionary.  Parsed on first use.
+        """
+        if self._cache is None:
+            self._cache = dict()
+            settings = self.fields.get('Encoded_Library_Settings')
+            if settings:
+                for setting in settings.split(' / '):
+                    (key, delimiter, value) = setting.partition('=')
+                    self._cache[key.strip()] = value.strip()
+        return self._cache
+
+
+class AudioTrack(Track):
+
+    __slots__ = ()
+
+    @property
+    def channels(self):
+        return self.get_number('Channels', int)
+
+    @property
+    def sampling_rate(self):
+        return self.get_number('SamplingRate', int)
+
+
+class TextTrack(Track):
+
+    __slots__ = ()
+
+
+def make_track(track_type, fields):
+    """
+    Build the right Track subclass for a type of track.
+    """
+    return TRACK_CLASSES.get(track_type, Track)(track_type, fields)
+
+
+def section_headers(tracks):
+    """
+    Yield (header, track) for each track, numbering the headers ('Audio #1', 'Audio #2') when there
+    are several tracks of the same type, like mediainfo's text dump.
+    """
+    totals = dict()
+    for track in tracks:
+        totals[track.type] = totals.get(track.type, 0) + 1
+
+    counts = dict()
+    for track in tracks:
+        counts[track.type] = counts.get(track.type, 0) + 1
+        if totals[track.type] > 1:
+            yield '{type} #{number}'.format(type=track.type, number=counts[track.type]), track
+        else:
+            yield track.type, track
+
+
+def parse_text(text):
+    """
+    Parse mediainfo's text dump into a list of Tracks.  Sections are separated by blank lines, and
+    start with a header line.  The field names that have a JSON equivalent are renamed to it.
+    """
+    tracks = []
+    fields = None
+    for line in text.splitlines():
+        line = line.strip()
+
+        # A blank line ends the section
+        if not line:
+            fields = None
+            continue
+
+        # The first line of a section is its header, such as 'Video' or 'Audio #2'
+        if fields is None:
+            fields = OrderedDict()
+            tracks.append(make_track(line.partition(' #')[0], fields))
+            continue
+
+        (key, delimiter, value) = line.partition(':')
+        if not delimiter:
+            msg = 'Could not parse line "{text}"'
+            logging.error(msg.format(text=line))
+            continue
+        key = key.strip()
+        fields[JSON_FIELD_NAMES.get(key, key)] = value.strip()
+
+    return tracks
+
+
+def set_complete_name(text, name):
+    """
+    Show a path as the Complete name in a text dump from libmediainfo, which is given the absolute path
+    (or no path at all, when it reads a file object) rather than the one the mediainfo command would show.
+    """
+    if not text:
+        return text
+    line = '{name:<41}: {value}'.format(name='Complete name', value=name)
+    lines = text.strip().splitlines()
+    for (i, existing) in enumerate(lines):
+        if existing.startswith('Complete name'):
+            lines[i] = line
+            break
+    else:
+        # The name goes right after the General header
+        lines.insert(1, line)
+    return '\n'.join(lines)
+
+
 class MediainfoError(Exception):
     pass
 
@@ -172,4 +717,57 @@ CONTAINERS = {
     'matroska': Containers.MKV,
     'avi': Containers.AVI,
     'mp4': Containers.MP4,
-}
\ No newline at end of file
+}
+
+# mediainfo's output (and its text dump) by file identity and mediainfo version
+MEDIAINFO_CACHE = DiskCache('mediainfo', max_entries=config.MEDIAINFO_CACHE_SIZE)
+
+# Seconds in each unit of durations in the text dump ('mn' is from older versions of mediainfo)
+DURATION_UNITS = {
+    'h': 3600,
+    'min': 60,
+    'mn': 60,
+    's': 1,
+    'ms': 0.001,
+}
+
+TRACK_CLASSES = {
+    'General': GeneralTrack,
+    'Video': VideoTrack,
+    'Audio': AudioTrack,
+    'Text': TextTrack,
+}
+
+# Names in mediainfo's text dump for fields of its JSON output
+TEXT_FIELD_NAMES = {
+    'CompleteName': 'Complete name',
+    'FileSize': 'File size',
+    'OverallBitRate': 'Overall bit rate',
+    'OverallBitRate_Mode': 'Overall bit rate mode',
+    'Encoded_Date': 'Encoded date',
+    'Encoded_Application': 'Writing application',
+    'Encoded_Library': 'Writing library',
+    'Encoded_Library_Settings': 'Encoding settings',
+    'Format_Profile': 'Format profile',
+    'Format_Settings': 'Format settings',
+    'CodecID': 'Codec ID',
+    'BitRate': 'Bit rate',
+    'BitRate_Mode': 'Bit rate mode',
+    'FrameRate': 'Frame rate',
+    'FrameRate_Mode': 'Frame rate mode',
+    'DisplayAspectRatio': 'Display aspect ratio',
+    'PixelAspectRatio': 'Pixel aspect ratio',
+    'ColorSpace': 'Color space',
+    'ChromaSubsampling': 'Chroma subsampling',
+    'BitDepth': 'Bit depth',
+    'ScanType': 'Scan type',
+    'StreamSize': 'Stream size',
+    'Channels': 'Channel(s)',
+    'ChannelPositions': 'Channel positions',
+    'SamplingRate': 'Sampling rate',
+    'Compression_Mode': 'Compression mode',
+    'UniqueID': 'Unique ID',
+    'Default': 'Default',
+    'Forced': 'Forced',
+}
+JSON_FIELD_NAMES = dict((name, key) for (key, name) in TEXT_FIELD_NAMES.items())
@@ -1,283 +1,184 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, unicode_literals, division, absolute_import
+import logging
+import io
+import os
 
-p2p_groups = {
-    'CHD',
-    'CRiSC',
-    'CtrlHD',
-    'D-Z0N3',
-    'de[42]',
-    'decibeL',
-    'DiRTY',
-    'DON',
-    'EA',
-    'EbP',
-    'ECI',
-    'ESiR',
-    'EuReKa',
-    'FoRM',
-    'FraMeSToR',
-    'FTW-HD',
-    'fty',
-    'H@M',
-    'h264iRMU',
-    'HaB',
-    'HANDJOB',
-    'HDC',
-    'HDCLUB',
-    'HDEncX',
-    'HDMaNiAcS',
-    'HiDt',
-    'iLL',
-    'MCR',
-    'MySiLU',
-    'PerfectionHD',
-    'RuDE',
-    'THORA',
-    'ViSTA™',
-    'WiKi',
-    'wsp®',
-    'xander',
-    'XTSF',
-}
-
-scene_groups = {
-    '0x539',
-    '420RipZ',
-    '7SinS',
-    '8BaLLRiPS',
-    'aAF',
-    'aBD',
-    'ADHD',
-    'AEN',
-    'AEROHOLiCS',
-    'AFO',
-    'aGGr0',
-    'AiHD',
-    'ALLiANCE',
-    'AMIABLE',
-    'AN0NYM0US',
-    'ANiHLS',
-    'ApL',
-    'ARC',
-    'ARiGOLD',
-    'ARROW',
-    'ARTHOUSE',
-    'AVCHD',
-    'AVS720',
-    'BAND1D0S',
-    'BELiAL',
-    'BeStDivX',
-    'BestHD',
-    'BiQ',
-    'BLOW',
-    'BRMP',
-    'CBGB',
-    'CCAT',
-    'CDDHD',
-    'CFH',
-    'CiNEFiLE',
-    'COCAIN',
-    'CONDITION',
-    'Counterfeit',
-    'CoWRY',
-    'CROSSBOW',
-    'CULTXviD',
-    'CYBERMEN',
-    'D3Si',
-    'DAA',
-    'DeBTXViD',
-    'DEFiNiTE',
-    'DEiTY',
-    'DEMENTED',
-    'DEPRAViTY',
-    'DEPRiVED',
-    'DERANGED',
-    'DiAMOND',
-    'DIMENSION',
-    'DioXidE',
-    'DOCUMENT',
-    'DOMiNO',
-    'DoNE',
-    'DvF',
-    'DVL',
-    'DVSKY',
-    'EFFECT',
-    'EPiSODE',
-    'ESPiSE',
-    'ETHOS',
-    'EVOLVE',
-    'EwDp',
-    'EXiLE',
-    'eXtaCY',
-    'EXViD',
-    'EXViDiNT',
-    'FAiLED',
-    'Felony',
-    'FFM',
-    'FiCO',
-    'FiHViD',
-    'FilmHD',
-    'FiNaLe',
-    'FLAiR',
-    'FLAiTE',
-    'FQM',
-    'FRAGMENT',
-    'FSiHD',
-    'GALT',
-    'GECKOS',
-    'GiMCHi',
-    'GxP',
-    'GZP',
-    'HAGGiS',
-    'HAiDEAF',
-    'HALCYON',
-    'HANGOVER',
-    'HCA',
-    'HD4U',
-    'HDCLASSiCS',
-    'HDDEViLS',
-    'HDEX',
-    'HDNORDiC',
-    'HLS',
-    'HUBRIS',
-    'hV',
-    'iBEX',
-    'iFPD',
-    'iGNiTiON',
-    'IGUANA',
-    'iKA',
-    'iLG',
-    'iLLUSiON',
-    'iLS',
-    'iMBT',
-    'iMMORTALs',
-    'iNCiTE',
-    'iND',
-    'iNFAMOUS',
-    'iNjECTiON',
-    'iNTiMiD',
-    'iNVANDRAREN',
-    'iTCH',
-    'Japhson',
-    'JETSET',
-    'JoLLyRoGeR',
-    'KAFFEREP',
-    'KaKa',
-    'KEBAP',
-    'KILLERS',
-    'KiNOBOX',
-    'LAP',
-    'Larceny',
-    'LCHD',
-    'LEVERAGE',
-    'LiNE',
-    'LiViDiTY',
-    'LOUNG3D',
-    'LPD',
-    'Ltu',
-    'MARGiN',
-    'MaxHD',
-    'MCHD',
-    'MELiTE',
-    'METH',
-    'METiS',
-    'MHD',
-    'MHQ',
-    'MoH',
-    'MOMENTUM',
-    'MOOVEE',
-    'MULTiPLY',
-    'nDn',
-    'NeDiVx',
-    'NewMov',
-    'NEPTUNE',
-    'NGB',
-    'NiLE',
-    'NODLABS',
-    'NORDiCHD',
-    'NOSCREENS',
-    'NOX',
-    'OBSiDiON',
-    'OEM1080',
-    'OSiRiS',
-    'Ouzo',
-    'PARASiTE',
-    'PARTiCLE',
-    'PFa',
-    'PHOBOS',
-    'PosTX',
-    'PROGRESS',
-    'PSYCHD',
-    'PUKKA',
-    'QCF',
-    'RAWNiTRO',
-    'RCDiVX',
-    'REACTOR',
-    'RedBlade',
-    'REFiNED',
-    'REVEiLLE',
-    'RiTALiN',
-    'RiTALiX',
-    'RoundRobin',
-    'ROVERS',
-    'RUBY',
-    'RUSTED',
-    'SAiMORNY',
-    'SAPHiRE',
-    'SCARED',
-    'SCREAM',
-    'SECTOR7',
-    'SEMTEX',
-    'SEPTiC',
-    'SiNNERS',
-    'SKiTFiSKE',
-    'SML',
-    'SMOKEY',
-    'SONiDO',
-    'SPARKS',
-    'SPLiTSViLLE',
-    'SPRiNTER',
-    'SUNSPOT',
-    'SViNTO',
-    'SWAGGERHD',
-    'TARGET',
-    'TASTE',
-    'TDF',
-    'TDM',
-    'THUGLiNE',
-    'TiDE',
-    'TiMELORDS',
-    'TiTANS',
-    'TLF',
-    'Trojan',
-    'TUSAHD',
-    'TWiST',
-    'TWiZTED',
-    'TXF',
-    'UbM',
-    'ULLA',
-    'UNDEAD',
-    'UNiT',
-    'UNTOUCHABLES',
-    'UNVEiL',
-    'USi',
-    'utL',
-    'VCDVaULT',
-    'VeDeTT',
-    'VETO',
-    'VH-PROD',
-    'ViSiON',
-    'VoMiT',
-    'W4F',
-    'WaLMaRT',
-    'WASTE',
-    'WHiSKEY',
-    'WiDE',
-    'WLM',
-    'WPi',
-    'WRD',
-    'xCZ',
-    'XPRESS',
-    'XSTREEM',
-}
+import config
+
+
+class ReleaseGroups(object):
+    """
+    Registry of known release groups, loaded from one or more data files (see release_groups.txt).
+
+    Group names are indexed case-insensitively, and alternative spellings resolve to the group's
+    canonical name.  The data files are only read the first time a lookup is made.
+    """
+
+    def __init__(self, paths):
+        self.paths = [path for path in paths if path]
+        self._groups = None
+        self._aliases = None
+
+    def __repr__(self):
+        return 'ReleaseGroups({paths})'.format(paths=self.paths)
+
+    def _load(self):
+        """
+        Build the index: normalized name -> (canonical name, category), and normalized alias -> normalized name.
+        """
+
+        groups = dict()
+        aliases = dict()
+
+        for path in self.paths:
+
+            path = os.path.expanduser(path)
+            try:
+                with io.open(path, mode='r', encoding='utf-8') as f:
+                    lines = f.readlines()
+            except IOError as e:
+                msg = 'Could not read release groups from "{path}": {error}'
+                logging.warning(msg.format(path=path, error=e))
+                continue
+
+            category = None
+            for line in lines:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+
+                if line.startswith('[') and line.endswith(']'):
+                    category = line[1:-1].strip().lower()
+                    continue
+
+                if category is None:
+                    msg = 'Ignoring release group "{group}" outside of a section in "{path}"'
+                    logging.warning(msg.format(group=line, path=path))
+                    continue
+
+                names = [name.strip() for name in line.split(',') if name.strip()]
+                key = normalize_group_name(names[0])
+                groups[key] = (names[0], category)
+                for alias in names[1:]:
+                    aliases[normalize_group_name(alias)] = key
+
+        self._groups = groups
+        self._aliases = aliases
+
+    def reload(self):
+        self._groups = None
+        self._aliases = None
+
+    def key(self, name):
+        """
+        Return the normalized name of a group, with aliases resolved.
+        """
+        if self._groups is None:
+            self._load()
+        key = normalize_group_name(name)
+        return self._aliases.get(key, key)
+
+    def resolve(self, name):
+        """
+        Return the canonical spelling of a known group name, or None.
+        """
+        if name is None:
+            return None
+        entry = self._groups_index().get(self.key(name))
+        return None if entry is None else entry[0]
+
+    def category(self, name):
+        """
+        Return the category of a group ('scene' or 'p2p'), or None if the group is unknown.
+        """
+        if name is None:
+            return None
+        entry = self._groups_index().get(self.key(name))
+        return None if entry is None else entry[1]
+
+    def categorize(self, names):
+        """
+        Return the category of each group name in a list, in order.
+        """
+        groups = self._groups_index()
+        aliases = self._aliases
+        categories = []
+        for name in names:
+            if name is None:
+                categories.append(None)
+                continue
+            key = normalize_group_name(name)
+            entry = groups.get(aliases.get(key, key))
+            categories.append(None if entry is None else entry[1])
+        return categories
+
+    def names(self, category):
+        """
+        Return the canonical names of all groups in a category.
+        """
+        return [name for (name, group_category) in self._groups_index().values() if group_category == category]
+
+    def _groups_index(self):
+        if self._groups is None:
+            self._load()
+        return self._groups
+
+
+class GroupSet(object):
+    """
+    A set of release group names with case-insensitive, alias-aware membership tests.
+
+    Either give it the names directly, or a category to take them from the registry on first use.
+    """
+
+    def __init__(self, names=(), category=None, registry=None):
+        self.registry = registry if registry is not None else release_groups
+        self.category = category
+        self._names = None
+        self._initial_names = list(names)
+
+    def __repr__(self):
+        return 'GroupSet({names})'.format(names=sorted(self._index().values()))
+
+    def _index(self):
+        if self._names is None:
+            names = list(self._initial_names)
+            if self.category is not None:
+                names += self.registry.names(self.category)
+            self._names = dict((self.registry.key(name), name) for name in names)
+        return self._names
+
+    def __contains__(self, name):
+        if name is None:
+            return False
+        return self.registry.key(name) in self._index()
+
+    def __iter__(self):
+        return iter(self._index().values())
+
+    def __len__(self):
+        return len(self._index())
+
+    def add(self, name):
+        self._index()[self.registry.key(name)] = name
+
+
+def normalize_group_name(name):
+    """
+    Normalize a group name for case-insensitive comparison.
+    """
+    name = name.strip()
+    try:
+        return name.casefold()
+    except AttributeError:
+        return name.lower()
+
+
+# The bundled data file, plus an optional user file with additions
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'release_groups.txt')
+
+release_groups = ReleaseGroups([DATA_FILE, config.RELEASE_GROUPS_FILE])
+
+p2p_groups = GroupSet(category='p2p')
+scene_groups = GroupSet(category='scene')
@@ -9,7 +9,9 @@ from __future__ import print_function, unicode_literals, division, absolute_impo
 
 import logging
 import argparse
+import sys
 import os
+from multiprocessing.pool import ThreadPool
 
 import files
 import image_hosts
@@ -46,37 +48,158 @@ parser.add_argument(
     action='store_false',
     help='do not upload; save screenshots and exit'
 )
+parser.add_argument(
+    '-j',
+    '--jobs',
+    type=int,
+    metavar='<number>',
+    dest='jobs',
+    default=1,
+    help='number of video files to process at once'
+)
+parser.add_argument(
+    '-c',
+    '--compare',
+    dest='compare',
+    default=False,
+    action='store_true',
+    help='treat the files as encodes of the same film, and take screenshots of each at the same time codes'
+)
+parser.add_argument(
+    '-s',
+    '--contact-sheet',
+    dest='contact_sheet',
+    default=False,
+    action='store_true',
+    help='also make (and upload) a contact sheet of each file'
+)
 args = parser.parse_args()
 
+# All files share one image host session
+shared_image_host = None
+if args.upload:
+    try:
+        shared_image_host = image_host()
+    except image_hosts.ImageHostError as e:
+        logging.error(e)
+        sys.exit(1)
 
-for path in args.file_list:
+# With several jobs, each file's log messages are held back and written out together when it's done
+log_buffer = files.LogBuffer() if args.jobs > 1 and not args.compare else None
+
+
+def process(path):
+    """
+    Take (and upload) the screenshots for one video file.  Returns the BBCode, or None.
+    """
 
     if isinstance(path, bytes):
         path = path.decode('utf-8')
-    logging.info('------------------------------------------------------------')
-    logging.info(os.path.basename(path))
-    logging.info('------------------------------------------------------------')
+
+    if log_buffer is not None:
+        log_buffer.begin()
 
     try:
 
+        logging.info('------------------------------------------------------------')
+        logging.info(os.path.basename(path))
+        logging.info('------------------------------------------------------------')
+
         screenshots = files.Screenshots(path)
-        screenshots.take(args.num_screenshots)
         if args.upload:
-            screenshots.upload(
-                image_host=image_host,
+            screenshots.take_and_upload(
+                args.num_screenshots,
+                image_host=shared_image_host,
                 delete_after_upload=config.DELETE_SCREENS_AFTER_UPLOAD,
             )
-            logging.info('BBCode:\n' + screenshots.bbcode)
+            bbcode = screenshots.bbcode
+            if args.contact_sheet:
+                contact_sheet_path = screenshots.take_contact_sheet()
+                try:
+                    (url, contact_sheet_bbcode) = shared_image_host.upload_image(contact_sheet_path)
+                finally:
+                    if config.DELETE_SCREENS_AFTER_UPLOAD:
+                        os.unlink(contact_sheet_path)
+                logging.info(url)
+                bbcode += '\n' + contact_sheet_bbcode
+            logging.info('BBCode:\n' + bbcode)
+            return bbcode
         else:
+            screenshots.take(args.num_screenshots)
             for screenshot_path in screenshots.files:
                 logging.info(screenshot_path)
+            if args.contact_sheet:
+                logging.info(screenshots.take_contact_sheet())
 
     except (files.ScreenshotsError, image_hosts.ImageHostError) as e:
 
         logging.error(e)
-        continue
 
     except Exception:
 
         logging.exception('An unexpected error occurred. Please report the following information to the developers:')
-        continue
\ No newline at end of file
+
+    finally:
+
+        if log_buffer is not None:
+            log_buffer.end()
+
+    return None
+
+
+def compare(paths):
+    """
+    Take (and upload) screenshots of several encodes of the same film, at the same time codes.
+    """
+
+    paths = [path.decode('utf-8') if isinstance(path, bytes) else path for path in paths]
+    for path in paths:
+        logging.info(os.path.basename(path))
+
+    try:
+
+        screenshots = [files.Screenshots(path) for path in paths]
+        screenshots[0].take_comparison(screenshots[1:], args.num_screenshots)
+        if args.upload:
+            bbcode = screenshots[0].upload_comparison(
+                screenshots[1:],
+                image_host=shared_image_host,
+                delete_after_upload=config.DELETE_SCREENS_AFTER_UPLOAD,
+            )
+            logging.info('BBCode:\n' + bbcode)
+        else:
+            for screenshot_paths in zip(*[s.files for s in screenshots]):
+                logging.info(' '.join(screenshot_paths))
+
+    except (files.ScreenshotsError, image_hosts.ImageHostError) as e:
+
+        logging.error(e)
+
+    except Exception:
+
+        logging.exception('An unexpected error occurred. Please report the following information to the developers:')
+
+
+if args.compare:
+    compare(args.file_list)
+    sys.exit(0)
+
+pool = ThreadPool(max(min(args.jobs, len(args.file_list)), 1))
+try:
+    results = pool.map(process, args.file_list)
+finally:
+    pool.close()
+    pool.join()
+    if log_buffer is not None:
+        log_buffer.remove()
+
+# Print the BBCode for every file together at the end
+if args.upload and len(args.file_list) > 1:
+    summary = []
+    for (path, bbcode) in zip(args.file_list, results):
+        if bbcode:
+            if isinstance(path, bytes):
+                path = path.decode('utf-8')
+            summary.append('{name}\n{bbcode}'.format(name=os.path.basename(path), bbcode=bbcode))
+    if summary:
+        logging.info('BBCode for all files:\n' + '\n\n'.join(summary))
@@ -76,7 +76,7 @@ class TehConnection(BaseTracker):
     }
 
     # Release groups specifically banned at TC
-    BANNED_GROUPS = {
+    BANNED_GROUPS = metadata.GroupSet([
         'aXXo',
         'DEViSE',
         'FLAWL3SS',
@@ -90,7 +90,7 @@ class TehConnection(BaseTracker):
         'VAMPS',
         'WHiiZz',
         'ERODELUXE',  # Softcore porn group
-    }
+    ])
 
     def __init__(self):
 
@@ -82,8 +82,8 @@ class BaseTracker(object):
         metadata.Codecs.VC1: 'VC-1',
     }
 
-    # The set of release groups specifically banned at the tracker
-    BANNED_GROUPS = set()
+    # The set of release groups specifically banned at the tracker (matched case-insensitively)
+    BANNED_GROUPS = metadata.GroupSet()
 
     def __init__(self):
 
@@ -1,4 +1,5 @@
 from __future__ import print_function, unicode_literals, division, absolute_import
+import os
 import sys
 import logging
 from io import StringIO
@@ -37,7 +38,8 @@ class Upload(object):
             imdb_link=None,
             take_screenshots=True,
             num_screenshots=0,
-            delete_unwanted_files=False
+            delete_unwanted_files=False,
+            staging_dir=None
     ):
 
         assert issubclass(tracker, trackers.BaseTracker)
@@ -51,6 +53,7 @@ class Upload(object):
             raise UploadInterruptedError(e)
 
         self.delete_unwanted_files = delete_unwanted_files
+        self.staging_dir = staging_dir
         self.take_screens = take_screenshots
         self.num_screens = num_screenshots
         self.use_nfo = True
@@ -108,36 +111,52 @@ class Upload(object):
                 if answer.lower() != 'y':
                     raise UploadInterruptedError('User aborted upload')
 
+        # A staged tree is only kept for seeding the torrent of a finished upload
+        try:
+            self.prepare_and_upload(dry_run=dry_run)
+        except BaseException:
+            self.release.unstage()
+            raise
+
+    def prepare_and_upload(self, dry_run=False):
+        """
+        Get the files of the release ready (extracting or staging them if needed), verify them, take
+        screenshots, make the .torrent file, and upload it.
+        """
+
+        # A stored (uncompressed) video file can be read straight out of its RAR volumes, for the technical
+        # checks, mediainfo, and screenshots, so extracting it can wait until the torrent is made
         try:
-
-            # Extract RAR archives, get rid of unwanted files
-            self.release.clean_up(
-                delete_unwanted_files=self.delete_unwanted_files,
-                extension_whitelist=self.tracker.FILE_EXTENSION_WHITELIST
-            )
-
-            # Find the video file so we can run mediainfo on it
             self.release.find_video_file()
-
         except files.ReleaseError as e:
-
             raise UploadInterruptedError(e)
+        if self.release.rar_member is not None and self.can_read_rar_member():
+            msg = 'Reading "{name}" from the RAR archive until the torrent is made.'
+            logging.info(msg.format(name=self.release.rar_member.name))
+        else:
+            self.prepare_files()
 
-        # Get mediainfo and cross-check technical details with the release name
-        self.get_mediainfo()
+        # Cross-check technical details with the release name (mediainfo is only run if the headers of the
+        # video file aren't enough)
         self.technical_is_verified = self.verify_technical()
 
         # Take screenshots
         if self.take_screens and self.num_screens > 0:
             try:
-                self.screenshots = files.Screenshots(self.release.video_file)
-                self.screenshots.take(self.num_screens)
-                self.screenshots.upload()
+                self.screenshots = files.Screenshots(self.get_video_path())
+                self.screenshots.take_and_upload(self.num_screens)
             except files.ScreenshotsError as e:
                 raise UploadInterruptedError(e)
         else:
             logging.info('Skipping screenshots')
 
+        # The tracker wants mediainfo's text dump, so that's the one mediainfo run we can't skip
+        self.get_mediainfo()
+
+        # The torrent lists the files the client will seed, so they have to be on disk
+        if self.release.rar_member is not None:
+            self.prepare_files()
+
         # Make the .torrent file
         try:
             self.torrent = files.Torrent(self.release, self.tracker)
@@ -290,18 +309,75 @@ class Upload(object):
         ]
         self.film_description = next(d for d in descriptions if d is not None and d.strip())
 
+    def prepare_files(self):
+        """
+        Stage the release, or clean it up in place, extracting any RAR archives, and find the video file.
+        """
+        try:
+
+            if self.staging_dir is not None:
+                # Link the whitelisted files into a staging tree, and extract RAR archives there
+                self.release.stage(
+                    self.staging_dir,
+                    extension_whitelist=self.tracker.FILE_EXTENSION_WHITELIST
+                )
+            else:
+                # Extract RAR archives, get rid of unwanted files
+                self.release.clean_up(
+                    delete_unwanted_files=self.delete_unwanted_files,
+                    extension_whitelist=self.tracker.FILE_EXTENSION_WHITELIST
+                )
+
+            # Find the (extracted) video file
+            self.release.find_video_file()
+
+        except files.ReleaseError as e:
+
+            raise UploadInterruptedError(e)
+
+        if self.release.rar_member is not None:
+            msg = 'Could not extract "{name}" from the RAR archive.'
+            raise UploadInterruptedError(msg.format(name=self.release.rar_member.name))
+
+    @staticmethod
+    def can_read_rar_member():
+        """
+        Check whether mediainfo can read a video file inside a RAR archive, which takes libmediainfo.
+        """
+        return config.MEDIAINFO_BACKEND != 'cli' and metadata.libmediainfo.is_available()
+
+    def get_video_path(self):
+        """
+        Return the path to give VideoFile: the video file, or the first RAR volume if it is read from one.
+        """
+        if self.release.rar_member is not None:
+            return self.release.rar_member.segments[0][0]
+        return self.release.video_file
+
     def get_mediainfo(self):
 
-        if self.release.path is not None:
+        if self.release.path is not None and self.mediainfo is None:
             # Get mediainfo, and parse it for codec, container, and resolution
             try:
-                self.mediainfo = metadata.Mediainfo(
-                    path=self.release.video_file,
-                    base_path=self.release.base_path
-                )
+                rar_member = self.release.rar_member
+                if rar_member is not None:
+                    f = rar_member.open()
+                    try:
+                        self.mediainfo = metadata.Mediainfo.from_file_object(
+                            f,
+                            rar_member.size,
+                            os.path.relpath(rar_member.path, self.release.base_path)
+                        )
+                    finally:
+                        f.close()
+                else:
+                    self.mediainfo = metadata.Mediainfo(
+                        path=self.release.video_file,
+                        base_path=self.release.base_path
+                    )
                 self.mediainfo.parse()
                 self.mediainfo.get_info()
-            except metadata.MediainfoError as e:
+            except (metadata.MediainfoError, files.RarError) as e:
                 raise UploadInterruptedError(e)
 
     def verify_metadata(self):
@@ -362,11 +438,37 @@ class Upload(object):
         # All checks passed
         return True
 
+    def get_technical(self):
+        """
+        Get the container, codec, and resolution of the video file, from its headers if they have
+        everything we need, or else from mediainfo.
+        """
+
+        if self.release.rar_member is not None:
+            try:
+                f = self.release.rar_member.open()
+            except files.RarError as e:
+                raise UploadInterruptedError(e)
+            with f:
+                header = files.read_video_header(f)
+        else:
+            header = files.read_video_header(self.release.video_file)
+        if header is not None and header.is_complete:
+            logging.debug('Read technical details from the headers of the video file.')
+            return header
+
+        msg = 'Could not read technical details from the headers of the video file; using mediainfo.'
+        logging.debug(msg)
+        self.get_mediainfo()
+        return self.mediainfo
+
     def verify_technical(self):
 
+        technical = self.get_technical()
+
         # Check to make sure the release resolution and the width/height match
-        w = self.mediainfo.width
-        h = self.mediainfo.height
+        w = technical.width
+        h = technical.height
         resolution = self.release.resolution
         if (
             (0 < h <= 576 and 0 < w <= 1024 and resolution not in ('Standard Def', '480p', '576p'))
@@ -381,22 +483,22 @@ class Upload(object):
             self.resolution = self.release.resolution
 
         # Check to make sure the codec from release name and mediainfo match
-        if self.release.codec != self.mediainfo.codec:
+        if self.release.codec != technical.codec:
             release_codec = self.tracker.CODEC_STRING[self.release.codec]
-            mediainfo_codec = self.tracker.CODEC_STRING[self.mediainfo.codec]
+            mediainfo_codec = self.tracker.CODEC_STRING[technical.codec]
             msg = 'Release codec "{r}" does not match mediainfo codec "{m}".'
             raise UploadInterruptedError(msg.format(r=release_codec, m=mediainfo_codec))
         else:
             logging.debug('Release name matches codec found in mediainfo.')
-            self.codec = self.mediainfo.codec
+            self.codec = technical.codec
 
         # Check to make sure the container from the file name and mediainfo match
-        if self.release.container != self.mediainfo.container:
+        if self.release.container != technical.container:
             msg = 'Release container "{r}" does not match mediainfo container "{m}".'
-            raise UploadInterruptedError(msg.format(r=self.release.container, m=self.mediainfo.container))
+            raise UploadInterruptedError(msg.format(r=self.release.container, m=technical.container))
         else:
             logging.debug('File name matches container found in mediainfo.')
-            self.container = self.mediainfo.container
+            self.container = technical.container
 
         # All checks passed
         return True
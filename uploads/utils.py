@@ -2,6 +2,7 @@
 
 from __future__ import print_function, unicode_literals, division, absolute_import
 from difflib import SequenceMatcher
+from multiprocessing.pool import ThreadPool
 import logging
 import string
 import sys
@@ -62,6 +63,13 @@ def years_match(year_a, year_b):
 
 
 def check_predb(release_name):
+    """
+    Returns True if the release name is listed on predb.me, False otherwise.
+
+    Successful lookups are cached, so each name is only ever requested once.
+    """
+    if release_name in _predb_cache:
+        return _predb_cache[release_name]
     msg = 'Checking predb.me for "{release_name}"'
     logging.debug(msg.format(release_name=release_name))
     params = {
@@ -73,7 +81,30 @@ def check_predb(release_name):
         response.raise_for_status()
         soup = BeautifulSoup(response.text, "html.parser")
         matches = set(link.text.strip() for link in soup.find_all('a', class_='p-title'))
-        return release_name in matches
+        _predb_cache[release_name] = release_name in matches
+        return _predb_cache[release_name]
     except Exception as e:
         logging.warning(e)
         return False
+
+
+def check_predb_batch(release_names, max_threads=8):
+    """
+    Check many release names on predb.me concurrently.
+
+    Returns a dictionary mapping each release name to the result of check_predb().
+    """
+    unique_names = list(set(release_names))
+    if not unique_names:
+        return dict()
+    pool = ThreadPool(min(max_threads, len(unique_names)))
+    try:
+        results = pool.map(check_predb, unique_names)
+    finally:
+        pool.close()
+        pool.join()
+    return dict(zip(unique_names, results))
+
+
+# Results of successful predb.me lookups, keyed by release name
+_predb_cache = dict()